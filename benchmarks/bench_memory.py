@@ -0,0 +1,122 @@
+"""
+Memory footprint of the address book.
+
+Builds N synthetic contacts and reports the bytes allocated per contact,
+measured with tracemalloc. The same contacts are also built in two
+baseline representations, so the numbers can be compared within one run:
+
+    records         AddressBook of Record objects (the current code)
+    dict records    the same classes with an instance __dict__ instead
+                    of __slots__ (the layout before slots were added)
+    plain dicts     one dict of plain values per contact
+
+Usage:
+    python benchmarks/bench_memory.py [N]
+"""
+
+import os
+import random
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from models import AddressBook, Record  # noqa: E402
+
+
+def contact_values(n, seed=42):
+    """Yields (name, phones, email, address, birthday) of n synthetic contacts."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        phones = ["+380" + str(rnd.randint(10**8, 10**9 - 1))]
+        if rnd.random() < 0.3:
+            phones.append("+48" + str(rnd.randint(10**8, 10**9 - 1)))
+        email = f"contact{i}@example.com" if rnd.random() < 0.7 else None
+        address = None
+        if rnd.random() < 0.5:
+            address = f"Kyiv, Khreshchatyk {rnd.randint(1, 200)}"
+        birthday = None
+        if rnd.random() < 0.6:
+            birthday = date(1970, 1, 1) + timedelta(days=rnd.randint(0, 18000))
+        yield f"Contact{i}", phones, email, address, birthday
+
+
+def build_book(n, seed=42):
+    book = AddressBook()
+    for name, phones, email, address, birthday in contact_values(n, seed):
+        record = Record(name)
+        for phone in phones:
+            record.add_phone(phone)
+        if email:
+            record.set_email(email)
+        if address:
+            record.set_address(address)
+        if birthday:
+            record.set_birthday(birthday)
+        book.add_record(record)
+    return book
+
+
+class _DictField:
+    def __init__(self, value):
+        self.value = value
+
+
+class _DictRecord:
+    def __init__(self, name, phones, email, address, birthday):
+        self.name = _DictField(name)
+        self.phones = [_DictField(phone) for phone in phones]
+        self.email = _DictField(email) if email else None
+        self.address = _DictField(address) if address else None
+        self.birthday = _DictField(birthday) if birthday else None
+
+
+def build_dict_records(n, seed=42):
+    return {
+        values[0].lower(): _DictRecord(*values) for values in contact_values(n, seed)
+    }
+
+
+def build_plain_dicts(n, seed=42):
+    return {
+        name.lower(): {
+            "name": name,
+            "phones": phones,
+            "email": email,
+            "address": address,
+            "birthday": birthday,
+        }
+        for name, phones, email, address, birthday in contact_values(n, seed)
+    }
+
+
+REPRESENTATIONS = {
+    "records": build_book,
+    "dict records": build_dict_records,
+    "plain dicts": build_plain_dicts,
+}
+
+
+def measure(build, n):
+    """Bytes still allocated after build(n), with its result alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(n)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(result) == n
+    return after - before
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"contacts: {n}")
+    print(f"{'representation':<16} {'MiB':>8} {'bytes/contact':>14}")
+    for name, build in REPRESENTATIONS.items():
+        size = measure(build, n)
+        print(f"{name:<16} {size / 1024 / 1024:>8.1f} {size / n:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Throughput of the server mode.
+
+Starts `main.py --serve` on a Unix socket in a temporary directory with N
+synthetic contacts, opens SESSIONS concurrent connections and has each
+send lookups (by phone, then by name) one after another, waiting for every
+answer. Reports lookups per second and the latency percentiles. Client
+and server share the machine, so on one core the server gets about half
+of it.
+
+Usage:
+    python benchmarks/bench_server.py [N] [SESSIONS] [REQUESTS_PER_SESSION]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from datagen import make_book  # noqa: E402
+from binformat import write_book  # noqa: E402
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "main.py"))
+
+
+async def session(path, requests, latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    for i, request in enumerate(requests):
+        started = time.perf_counter()
+        writer.write(json.dumps(dict(request, id=i)).encode() + b"\n")
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - started)
+        assert response["ok"], response
+    writer.close()
+
+
+async def load(path, workload, sessions):
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(session(path, workload[i::sessions], latencies) for i in range(sessions))
+    )
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    per_session = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    book = make_book(n)
+    records = list(book.values())
+    workload = []
+    for i in range(sessions * per_session):
+        record = records[(i * 7919) % len(records)]
+        if i % 2:
+            workload.append({"op": "get", "name": record.name.value})
+        else:
+            workload.append({"op": "lookup", "value": record.phones[0].value})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_book(book, os.path.join(tmp, "addressbook.bin"))
+        del book, records
+        path = os.path.join(tmp, "assistant.sock")
+        server = subprocess.Popen(
+            [sys.executable, MAIN, "--serve", f"unix:{path}"],
+            cwd=tmp,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            server.stdout.readline()  # "Serving on ..."
+            elapsed, latencies = asyncio.run(load(path, workload, sessions))
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"contacts: {n}, sessions: {sessions}, lookups: {len(latencies)}")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} lookups/s")
+    print(
+        f"latency ms: p50 {statistics.median(latencies) * 1000:.1f}, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}, "
+        f"max {latencies[-1] * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup time of the assistant.
+
+Measures, in fresh interpreters run in a temporary directory holding N
+contacts:
+  - time to first prompt: from launch until ">>> " is printed;
+  - time to first result: the one-shot `main.py <command>` for a command
+    that needs no book (hello) and one that loads the address book (all);
+and lists the slowest imports of the one-shot path as reported by
+`python -X importtime`.
+
+Usage:
+    python benchmarks/bench_startup.py [N] [RUNS]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from bench_memory import build_book  # noqa: E402
+from binformat import write_book  # noqa: E402
+
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src", "main.py"))
+PROMPT = b">>> "
+
+
+def first_prompt(cwd):
+    """Seconds until the interactive loop shows its first prompt."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, MAIN],
+        cwd=cwd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    seen = b""
+    while PROMPT not in seen:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("the assistant exited before its prompt")
+        seen += chunk
+    elapsed = time.perf_counter() - start
+    process.communicate(b"exit\n")
+    return elapsed
+
+
+def run_time(cwd, argv):
+    """Seconds for a process to run to completion."""
+    start = time.perf_counter()
+    subprocess.run(
+        argv,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def first_result(cwd, *args):
+    """Seconds for a one-shot command to print its result and exit."""
+    return run_time(cwd, [sys.executable, MAIN, *args])
+
+
+def slowest_imports(cwd, *args, top=10):
+    """[(cumulative ms, module)] of the top-level imports, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, *args],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        # nested imports are indented; their time is in their parent's
+        if not module[1:].startswith(" "):
+            imports.append((int(cumulative) / 1000, module.strip()))
+    imports.sort(reverse=True)
+    return imports[:top]
+
+
+def median_ms(func, runs, *args):
+    return statistics.median(func(*args) for _ in range(runs)) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        write_book(build_book(n), os.path.join(tmp, "addressbook.bin"))
+        baseline = median_ms(run_time, runs, tmp, [sys.executable, "-c", "pass"])
+
+        print(f"contacts: {n}, median of {runs} runs")
+        print(f"{'python -c pass':32}{baseline:>8.1f} ms")
+        for label, ms in (
+            ("first prompt", median_ms(first_prompt, runs, tmp)),
+            ("first result: hello", median_ms(first_result, runs, tmp, "hello")),
+            ("first result: all", median_ms(first_result, runs, tmp, "all")),
+        ):
+            print(f"{label:32}{ms:>8.1f} ms")
+
+        print("\nslowest imports (main.py hello):")
+        for ms, module in slowest_imports(tmp, "hello"):
+            print(f"  {module:30}{ms:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
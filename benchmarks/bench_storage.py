@@ -0,0 +1,64 @@
+"""
+Save/load speed of the binary container compared with pickle.
+
+Usage:
+    python benchmarks/bench_storage.py [N]
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from bench_memory import build_book  # noqa: E402
+from binformat import read_book, write_book  # noqa: E402
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def pickle_save(book, path):
+    with open(path, "wb") as f:
+        pickle.dump(book, f)
+
+
+def pickle_load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    book = build_book(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl_path = os.path.join(tmp, "addressbook.pkl")
+        bin_path = os.path.join(tmp, "addressbook.bin")
+
+        _, pickle_save_time = timed(pickle_save, book, pkl_path)
+        _, pickle_load_time = timed(pickle_load, pkl_path)
+        _, bin_save_time = timed(write_book, book, bin_path)
+        loaded, bin_load_time = timed(read_book, bin_path)
+        assert len(loaded) == len(book)
+
+        print(f"contacts: {n}")
+        print(f"{'':8}{'save, s':>10}{'load, s':>10}{'size, MiB':>12}")
+        for label, save, load, path in (
+            ("pickle", pickle_save_time, pickle_load_time, pkl_path),
+            ("binary", bin_save_time, bin_load_time, bin_path),
+        ):
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{label:8}{save:>10.2f}{load:>10.2f}{size:>12.1f}")
+        print(
+            f"speed-up: save x{pickle_save_time / bin_save_time:.1f}, "
+            f"load x{pickle_load_time / bin_load_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Benchmark suite for models, storage, formatters and commands.
+
+Runs every benchmark at each scale on seeded synthetic data (datagen.py)
+and writes the timings as JSON; `compare` diffs two such files and exits
+with 1 when something got slower than the threshold allows.
+
+Usage:
+    python benchmarks/bench_suite.py run [--scales 1k,100k,1M] [--only NAME,...]
+                                         [--repeat 5] [--seed 42] [-o results.json]
+    python benchmarks/bench_suite.py compare BASE.json NEW.json [--threshold 0.20]
+
+Benchmarks too slow to repeat at the largest scales (format_contacts,
+search_index_build) are skipped above their `limit` unless --no-limits
+is given.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+# the searches themselves, not hits of the result cache (cache.py)
+os.environ["ASSISTANT_CACHE_MB"] = "0"
+
+from datagen import make_book, make_notebook, make_tags  # noqa: E402
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DEFAULT_SCALES = "1k,100k,1M"
+
+# name -> (function(data) returning a callable to time, needs, limit);
+# benchmarks using the same data are kept together, the data is built once.
+# Storage comes first: a loaded copy next to a book with all its indexes
+# built does not fit in memory at 1M contacts.
+BENCHMARKS = {}
+
+
+def benchmark(name, needs=("book",), limit=None):
+    """
+    Registers a benchmark. The function gets the prepared data (a dict
+    with "book", "notebook", "n", ...) and returns the callable to time.
+    """
+
+    def register(func):
+        BENCHMARKS[name] = (func, needs, limit)
+        return func
+
+    return register
+
+
+# ----------- Benchmarks -------------------
+
+
+@benchmark("save_data")
+def bench_save_data(data):
+    from storage import save_data
+
+    book = data["book"]
+    return lambda: save_data(book)
+
+
+@benchmark("load_data")
+def bench_load_data(data):
+    from storage import load_data, save_data
+
+    save_data(data["book"])
+    return load_data
+
+
+@benchmark("format_contacts", limit=100_000)
+def bench_format_contacts(data):
+    from formatters import format_contacts
+
+    book = data["book"]
+    return lambda: format_contacts(book)
+
+
+def _search_index(book):
+    """The book's search index, once the background build started by the first search is done."""
+    while (index := book._get_search_index()) is None:
+        time.sleep(0.05)
+    return index
+
+
+@benchmark("search_index_build", limit=100_000)
+def bench_search_index_build(data):
+    book = data["book"]
+    return lambda: book._build_search_index(book)
+
+
+@benchmark("search")
+def bench_search(data):
+    book = data["book"]
+    _search_index(book)
+    queries = ["kateryna", "shevchenko", "+38067", "gmail", "kyiv, khresh"]
+    return lambda: [book.search(query) for query in queries]
+
+
+@benchmark("search_common")
+def bench_search_common(data):
+    # queries found in most contacts: the cost is the size of the result
+    book = data["book"]
+    _search_index(book)
+    return lambda: [book.search(query) for query in ("+380", "com", "an", "a")]
+
+
+@benchmark("get_upcoming_birthdays")
+def bench_upcoming_birthdays(data):
+    book = data["book"]
+    return lambda: book.get_upcoming_birthdays(7)
+
+
+@benchmark("search_notes", needs=("notebook",))
+def bench_search_notes(data):
+    notebook = data["notebook"]
+    queries = ["meeting", "deploy", make_tags()[300]]
+    return lambda: [notebook.search_notes(query) for query in queries]
+
+
+@benchmark("sort_notes_by_tag", needs=("notebook",))
+def bench_sort_notes_by_tag(data):
+    notebook = data["notebook"]
+    tags = make_tags()
+    return lambda: [notebook.sort_notes_by_tag(tag) for tag in (tags[0], tags[100])]
+
+
+@benchmark("suggest_command", needs=())
+def bench_suggest_command(data):
+    from commands import suggest_command
+
+    queries = ["ad", "fnd", "hepl", "del-nte", "birtday", "xyz", "notse", "sort"]
+    # the uncached function: a cache hit would measure nothing
+    suggest = suggest_command.__wrapped__
+    return lambda: [suggest(query) for query in queries]
+
+
+# ----------- Runner -------------------
+
+
+def time_callable(func, repeat):
+    """
+    Times func like timeit: calls per sample grow until a sample takes at
+    least 0.2 s (or one call is slower than that), and the cyclic GC is
+    paused while timing. Returns per-call seconds.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        return _time_samples(func, repeat)
+    finally:
+        gc.enable()
+
+
+def _time_samples(func, repeat):
+    started = time.perf_counter()
+    func()
+    first = time.perf_counter() - started
+
+    loops = 1
+    if first < 0.2:
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            elapsed = time.perf_counter() - started
+            if elapsed >= 0.2:
+                break
+            loops *= 10 if elapsed < 0.02 else 2
+    samples = []
+    for _ in range(repeat if first < 5 else 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return first, loops, samples
+
+
+def _prepare(n, seed, needs, cache):
+    # at 1M contacts there is no room for both books and a loaded copy
+    for name in list(cache):
+        if name not in needs:
+            del cache[name]
+    gc.collect()
+    for name in needs:
+        if name not in cache:
+            started = time.perf_counter()
+            if name == "book":
+                cache[name] = make_book(n, seed)
+            else:
+                cache[name] = make_notebook(n, seed)
+            print(
+                f"  generated {name} of {n} in {time.perf_counter() - started:.1f} s",
+                file=sys.stderr,
+            )
+    return dict(cache, n=n)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(scales, names, repeat, seed, no_limits=False):
+    from config import STORAGE_MODE
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    # storage reads and writes its files in the current directory
+    os.chdir(workdir)
+    try:
+        for scale in scales:
+            n = SCALES[scale]
+            cache = {}
+            print(f"scale {scale}", file=sys.stderr)
+            for name in names:
+                func, needs, limit = BENCHMARKS[name]
+                entry = {"name": name, "scale": scale, "n": n}
+                if limit is not None and n > limit and not no_limits:
+                    entry["skipped"] = f"above the limit of {limit}"
+                    results.append(entry)
+                    continue
+                data = _prepare(n, seed, needs, cache)
+                first, loops, samples = time_callable(func(data), repeat)
+                entry.update(
+                    first=first,
+                    loops=loops,
+                    min=min(samples),
+                    median=statistics.median(samples),
+                    mean=statistics.fmean(samples),
+                    stdev=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                )
+                results.append(entry)
+                print(
+                    f"  {name:24}{_format_time(entry['median']):>12}", file=sys.stderr
+                )
+    finally:
+        os.chdir(cwd)
+        for filename in os.listdir(workdir):
+            os.remove(os.path.join(workdir, filename))
+        os.rmdir(workdir)
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage_mode": STORAGE_MODE,
+            "seed": seed,
+            "hash_seed": os.environ.get("PYTHONHASHSEED"),
+            "repeat": repeat,
+            "today": date.today().isoformat(),
+        },
+        "results": results,
+    }
+
+
+# ----------- Comparison -------------------
+
+
+def _format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+def compare(base, new, threshold):
+    """
+    Prints the change of the best time per benchmark (the least noisy
+    statistic, as with timeit); returns the regressions.
+    """
+    before = {(r["name"], r["scale"]): r for r in base["results"] if "min" in r}
+    regressions = []
+    print(f"{'benchmark':24}{'scale':>6}{'base':>12}{'new':>12}{'change':>10}")
+    for result in new["results"]:
+        key = (result["name"], result["scale"])
+        if "min" not in result or key not in before:
+            continue
+        old, current = before[key]["min"], result["min"]
+        change = current / old - 1
+        mark = ""
+        if change > threshold:
+            mark = "  slower"
+            regressions.append((key, change))
+        elif change < -threshold:
+            mark = "  faster"
+        print(
+            f"{key[0]:24}{key[1]:>6}{_format_time(old):>12}"
+            f"{_format_time(current):>12}{change:>+10.1%}{mark}"
+        )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--scales", default=DEFAULT_SCALES)
+    run_parser.add_argument("--only", help="comma-separated benchmark names")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--no-limits", action="store_true")
+    run_parser.add_argument("-o", "--output", help="JSON file (default: stdout)")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.20,
+        help="relative slowdown reported as a regression (default 0.20)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.command == "compare":
+        with open(options.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(options.new, encoding="utf-8") as f:
+            new = json.load(f)
+        regressions = compare(base, new, options.threshold)
+        print(f"\n{len(regressions)} regression(s) above {options.threshold:.0%}.")
+        sys.exit(1 if regressions else 0)
+
+    if "PYTHONHASHSEED" not in os.environ:
+        # set and dict iteration order, and with it the speed of some
+        # lookups, depends on the hash seed: fix it so runs are comparable
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+
+    scales = options.scales.split(",")
+    selected = options.only.split(",") if options.only else list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            sys.exit(f"unknown benchmark {name!r}; known: {', '.join(BENCHMARKS)}")
+    names = [name for name in BENCHMARKS if name in selected]
+    for scale in scales:
+        if scale not in SCALES:
+            sys.exit(f"unknown scale {scale!r}; known: {', '.join(SCALES)}")
+
+    report = run(scales, names, options.repeat, options.seed, options.no_limits)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Round trip of every export format: exports a book and a notebook,
+imports the files into empty ones and compares. The notes include text
+that looks like the Markdown structure (headings, "Tags:" lines,
+backslashes), which the Markdown writer has to escape.
+
+Usage:
+    python benchmarks/check_transfer.py [CONTACTS]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ["ASSISTANT_STORAGE"] = "binary"
+
+from datagen import make_book, make_notebook  # noqa: E402
+from models import AddressBook, Note, NoteBook  # noqa: E402
+from transfer import (  # noqa: E402
+    CONTACT_WRITERS,
+    NOTE_WRITERS,
+    export_contacts,
+    export_notes,
+    import_contacts,
+    import_notes,
+)
+
+EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "vcard": ".vcf", "markdown": ".md"}
+
+TRICKY_NOTES = [
+    Note("Tags: not a tag line\n## not heading"),
+    Note("## heading-like first line\nTags: x", ["real"]),
+    Note("\\ leading backslash\n\\## escaped already\n##no space"),
+    Note("first\n\nTags:\n## \nlast", ["a", "b"]),
+]
+
+
+def _contacts(book):
+    return {record.name.value: record.to_dict() for record in book.values()}
+
+
+def _notes(notebook):
+    return {key: (note.text, note.tags) for key, note in notebook.items()}
+
+
+def check(size, directory):
+    book = make_book(size)
+    notebook = make_notebook(size // 10)
+    for note in TRICKY_NOTES:
+        notebook.add_note(notebook._generate_id(), note)
+
+    failed = []
+    for fmt in CONTACT_WRITERS:
+        path = os.path.join(directory, "contacts" + EXTENSIONS[fmt])
+        export_contacts(book, path, fmt)
+        copy = AddressBook()
+        imported, rejected = import_contacts(copy, path, fmt)
+        ok = not rejected and _contacts(copy) == _contacts(book)
+        print(f"contacts {fmt:<9} {imported:>7} imported  {rejected} rejected")
+        if not ok:
+            failed.append(f"contacts/{fmt}")
+    for fmt in NOTE_WRITERS:
+        path = os.path.join(directory, "notes" + EXTENSIONS[fmt])
+        export_notes(notebook, path, fmt)
+        copy = NoteBook()
+        imported, rejected = import_notes(copy, path, fmt)
+        ok = not rejected and _notes(copy) == _notes(notebook)
+        print(f"notes    {fmt:<9} {imported:>7} imported  {rejected} rejected")
+        if not ok:
+            failed.append(f"notes/{fmt}")
+    return failed
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        # imports save the books into the current directory
+        os.chdir(directory)
+        failed = check(size, directory)
+    if failed:
+        print("round trip changed: " + ", ".join(failed))
+        sys.exit(1)
+    print("all formats round-trip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Seeded synthetic data for the benchmarks.
+
+make_book(n) builds an AddressBook whose contacts look like real ones:
+Ukrainian names (a few names are very common), mobile numbers of the
+Ukrainian operators with some second phones and foreign numbers, emails
+on popular mail services, Kyiv/Lviv/... addresses and birthdays of adults.
+make_notebook(n) builds a NoteBook whose tags and words follow a Zipfian
+distribution, like tags in real notes: a handful are everywhere, most
+are rare. The same seed always gives the same data.
+"""
+
+import os
+import random
+import sys
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from models import AddressBook, NoteBook, Note, Record  # noqa: E402
+
+FIRST_NAMES = (
+    "Oleksandr Andrii Dmytro Serhii Mykola Ivan Volodymyr Yurii Taras Oleh "
+    "Vitalii Bohdan Maksym Roman Petro Olena Kateryna Iryna Nataliia Oksana "
+    "Tetiana Svitlana Yuliia Anna Mariia Halyna Viktoriia Larysa Sofiia Daryna"
+).split()
+LAST_NAMES = (
+    "Melnyk Shevchenko Boiko Kovalenko Bondarenko Tkachenko Kovalchuk Kravchenko "
+    "Oliinyk Shevchuk Koval Polishchuk Bondar Tkachuk Moroz Marchenko Lysenko "
+    "Rudenko Savchenko Petrenko Klymenko Pavlenko Savchuk Kuzmenko Ponomarenko"
+).split()
+MOBILE_CODES = ("50", "66", "95", "99", "67", "68", "96", "97", "98", "63", "73", "93")
+MAIL_DOMAINS = ("gmail.com", "ukr.net", "i.ua", "meta.ua", "outlook.com", "proton.me")
+CITIES = ("Kyiv", "Lviv", "Kharkiv", "Odesa", "Dnipro", "Vinnytsia", "Poltava")
+STREETS = (
+    "Khreshchatyk Shevchenka Franka Hrushevskoho Sahaidachnoho Bandery "
+    "Lesi Ukrainky Sichovykh Striltsiv Zelena Sadova Shkilna Tsentralna"
+).split()
+WORDS = (
+    "meeting call buy send check project report review plan idea book read "
+    "write fix deploy test release invoice pay order ticket doctor gym trip "
+    "birthday gift family weekend budget code design draft email contract"
+).split()
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative weights of ranks 1..n with P(k) proportional to 1/k**s."""
+    return list(accumulate(1 / k**s for k in range(1, n + 1)))
+
+
+def zipf_choice(rnd, items, cumulative):
+    return items[bisect(cumulative, rnd.random() * cumulative[-1])]
+
+
+def _phone(rnd):
+    if rnd.random() < 0.05:
+        return "+48" + str(rnd.randint(5 * 10**8, 8 * 10**8 - 1))
+    return "+380" + rnd.choice(MOBILE_CODES) + str(rnd.randint(10**6, 10**7 - 1))
+
+
+def _birthday(rnd, today):
+    age_days = int(rnd.gauss(38, 12) * 365.25)
+    age_days = min(max(age_days, 18 * 365), 90 * 365)
+    return today - timedelta(days=age_days + rnd.randint(0, 364))
+
+
+def make_records(n, seed=42, today=None):
+    """Yields n contacts with unique names."""
+    rnd = random.Random(seed)
+    today = today or date(2025, 1, 1)
+    first_weights = zipf_weights(len(FIRST_NAMES), 0.8)
+    last_weights = zipf_weights(len(LAST_NAMES), 0.8)
+    seen = set()
+    for i in range(n):
+        first = zipf_choice(rnd, FIRST_NAMES, first_weights)
+        last = zipf_choice(rnd, LAST_NAMES, last_weights)
+        name = f"{first} {last}"
+        if name.lower() in seen:
+            name = f"{name} {i}"
+        seen.add(name.lower())
+
+        phones = [_phone(rnd)]
+        if rnd.random() < 0.25:
+            phones.append(_phone(rnd))
+        email = None
+        if rnd.random() < 0.7:
+            email = f"{first}.{last}{i}@{rnd.choice(MAIL_DOMAINS)}".lower()
+        address = None
+        if rnd.random() < 0.5:
+            address = (
+                f"{rnd.choice(CITIES)}, {rnd.choice(STREETS)} St, {rnd.randint(1, 150)}"
+            )
+        birthday = _birthday(rnd, today) if rnd.random() < 0.6 else None
+        yield Record.from_values(name, phones, email, birthday, address)
+
+
+def make_book(n, seed=42):
+    book = AddressBook()
+    for record in make_records(n, seed):
+        book.add_record(record)
+    return book
+
+
+def make_tags(count=500):
+    """Tag vocabulary; the first tags are the most popular ones."""
+    return [
+        WORDS[i % len(WORDS)] + (str(i // len(WORDS)) if i >= len(WORDS) else "")
+        for i in range(count)
+    ]
+
+
+def make_notebook(n, seed=42, tag_count=500):
+    rnd = random.Random(seed)
+    tags = make_tags(tag_count)
+    tag_weights = zipf_weights(len(tags))
+    word_weights = zipf_weights(len(WORDS))
+    notebook = NoteBook()
+    for _ in range(n):
+        text = " ".join(
+            zipf_choice(rnd, WORDS, word_weights) for _ in range(rnd.randint(3, 15))
+        )
+        note_tags = sorted(
+            {zipf_choice(rnd, tags, tag_weights) for _ in range(rnd.randint(0, 3))}
+        )
+        notebook.add_note(notebook._generate_id(), Note(text, note_tags))
+    return notebook
@@ -0,0 +1,125 @@
+"""
+Several processes changing one address book and notebook at once.
+
+Seeds a book in a temporary directory, then starts PROCESSES workers on
+it. Each worker, STEPS times: adds a contact and a note of its own,
+moves one of its seeded contacts to a new address, saves both books
+and now and then refreshes them from disk, like an interactive session
+between commands. At the end the files must hold every contact, note
+and last address of every worker; anything missing is a lost update.
+
+Usage:
+    python benchmarks/stress_storage.py [PROCESSES] [STEPS] [SEED_CONTACTS]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ["ASSISTANT_STORAGE"] = "binary"
+
+from datagen import make_book  # noqa: E402
+from models import Note, Record  # noqa: E402
+
+
+def _own_contacts(names, worker, processes):
+    return names[worker::processes]
+
+
+def worker(directory, worker_id, processes, steps, names):
+    os.chdir(directory)
+    from storage import load_data, load_notebook, refresh, save_data
+
+    book = load_data()
+    notebook = load_notebook()
+    own = _own_contacts(names, worker_id, processes)
+    for step in range(steps):
+        if step % 3 == 0:
+            refresh(book)
+            refresh(notebook)
+        phone = f"+38050{worker_id:03d}{step:04d}"
+        book.add_record(
+            Record.from_values(f"Worker {worker_id} Contact {step}", [phone])
+        )
+        book.get_record(own[step % len(own)]).set_address(
+            f"Worker {worker_id} step {step}"
+        )
+        notebook.add_note(
+            notebook._generate_id(), Note(f"worker {worker_id} note {step}", ["stress"])
+        )
+        save_data(book)
+        save_data(notebook)
+
+
+def check(directory, processes, steps, names):
+    """Returns the list of lost updates."""
+    os.chdir(directory)
+    from storage import load_data, load_notebook
+
+    book = load_data()
+    notes = {note.text for note in load_notebook().values()}
+    lost = []
+    for worker_id in range(processes):
+        for step in range(steps):
+            if book.get_record(f"Worker {worker_id} Contact {step}") is None:
+                lost.append(f"contact {step} of worker {worker_id}")
+            if f"worker {worker_id} note {step}" not in notes:
+                lost.append(f"note {step} of worker {worker_id}")
+        own = _own_contacts(names, worker_id, processes)
+        for i, name in enumerate(own):
+            last = max((s for s in range(steps) if s % len(own) == i), default=None)
+            if last is None:
+                continue
+            address = book.get_record(name).address
+            if address is None or address.value != f"Worker {worker_id} step {last}":
+                lost.append(f"address of {name} (worker {worker_id})")
+    return lost
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    seed_contacts = int(sys.argv[3]) if len(sys.argv) > 3 else 10_000
+
+    with tempfile.TemporaryDirectory() as directory:
+        book = make_book(seed_contacts)
+        names = [record.name.value for record in book.values()][: processes * 4]
+        os.chdir(directory)
+        from storage import save_data
+
+        save_data(book)
+        del book
+
+        started = time.perf_counter()
+        workers = [
+            multiprocessing.Process(
+                target=worker, args=(directory, i, processes, steps, names)
+            )
+            for i in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - started
+        failed = [process for process in workers if process.exitcode != 0]
+
+        lost = check(directory, processes, steps, names)
+        os.chdir(os.path.dirname(directory))
+
+    saves = processes * steps * 2
+    print(f"processes: {processes}, steps: {steps}, seed contacts: {seed_contacts}")
+    print(f"{saves} saves in {elapsed:.1f} s ({saves / elapsed:,.0f} saves/s)")
+    if failed:
+        print(f"{len(failed)} workers failed")
+    print(f"lost updates: {len(lost)}")
+    for item in lost[:20]:
+        print(f"  {item}")
+    sys.exit(1 if lost or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
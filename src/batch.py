@@ -0,0 +1,271 @@
+"""
+Non-interactive batch mode for scripted bulk changes:
+
+    python src/main.py --batch commands.jsonl
+
+Every line of the file is one JSON object with an "op" and its arguments:
+
+    {"op": "add", "name": "Alice", "phones": ["+380931112233"], "birthday": "01.02.1990"}
+    {"op": "add-phone", "name": "Alice", "phone": "+380501112233"}
+    {"op": "add-note", "text": "Call Alice", "tags": ["work"]}
+
+Blank lines and lines starting with # are skipped. The whole file is
+checked before anything is changed, values (phones, emails, birthdays)
+in bulk through validators.validate_columns; an operation that fails while
+running (unknown contact, invalid phone, ...) is reported and skipped.
+Both books are saved once, at the end.
+"""
+
+import json
+import sys
+import time
+from models import Record, Note
+from storage import bulk
+from validators import validate_columns
+
+
+def _contact(book, name):
+    record = book.get_record(name)
+    if record is None:
+        raise KeyError(f"Contact '{name}' not found.")
+    return record
+
+
+def _note_key(notebook, key):
+    if key not in notebook.data:
+        raise KeyError(f"Note '{key}' not found.")
+    return key
+
+
+# ----------- Contacts -------------------
+
+
+def add_contact(book, notebook, args):
+    phones = args.get("phones") or []
+    if len(set(phones)) != len(phones):
+        raise ValueError("The same phone is listed twice.")
+    record = Record.from_values(
+        args["name"],
+        phones,
+        args.get("email"),
+        args.get("birthday"),
+        args.get("address"),
+    )
+    book.add_record(record)
+    return record.name.value
+
+
+def add_phone(book, notebook, args):
+    _contact(book, args["name"]).add_phone(args["phone"])
+
+
+def change_phone(book, notebook, args):
+    _contact(book, args["name"]).edit_phone(args["old"], args["new"])
+
+
+def remove_phone(book, notebook, args):
+    _contact(book, args["name"]).remove_phone(args["phone"])
+
+
+def set_email(book, notebook, args):
+    _contact(book, args["name"]).set_email(args["email"])
+
+
+def remove_email(book, notebook, args):
+    _contact(book, args["name"]).remove_email()
+
+
+def set_birthday(book, notebook, args):
+    _contact(book, args["name"]).set_birthday(args["birthday"])
+
+
+def set_address(book, notebook, args):
+    _contact(book, args["name"]).set_address(args["address"])
+
+
+def rename_contact(book, notebook, args):
+    _contact(book, args["name"]).set_name(args["new_name"])
+
+
+def delete_contact(book, notebook, args):
+    book.remove_record(args["name"])
+
+
+# ----------- Notes -------------------
+
+
+def add_note(book, notebook, args):
+    key = args.get("key") or notebook._generate_id()
+    if key in notebook.data:
+        raise ValueError(f"Note '{key}' already exists.")
+    notebook.add_note(key, Note(args["text"], list(args.get("tags") or [])))
+    return key
+
+
+def edit_note(book, notebook, args):
+    notebook.edit_note(
+        _note_key(notebook, args["key"]), args.get("text"), args.get("tags")
+    )
+
+
+def delete_note(book, notebook, args):
+    notebook.delete_note(_note_key(notebook, args["key"]))
+
+
+# op -> (handler, required arguments, optional arguments)
+OPERATIONS = {
+    "add": (add_contact, ("name",), ("phones", "email", "birthday", "address")),
+    "add-phone": (add_phone, ("name", "phone"), ()),
+    "change-phone": (change_phone, ("name", "old", "new"), ()),
+    "remove-phone": (remove_phone, ("name", "phone"), ()),
+    "add-email": (set_email, ("name", "email"), ()),
+    "remove-email": (remove_email, ("name",), ()),
+    "add-birthday": (set_birthday, ("name", "birthday"), ()),
+    "add-address": (set_address, ("name", "address"), ()),
+    "rename": (rename_contact, ("name", "new_name"), ()),
+    "del": (delete_contact, ("name",), ()),
+    "add-note": (add_note, ("text",), ("tags", "key")),
+    "edit-note": (edit_note, ("key",), ("text", "tags")),
+    "del-note": (delete_note, ("key",), ()),
+}
+
+LIST_ARGUMENTS = ("phones", "tags")
+
+
+def validate_operation(entry):
+    """Checks an operation's shape; returns an error message or None."""
+    if not isinstance(entry, dict):
+        return "expected a JSON object"
+    op = entry.get("op")
+    if op not in OPERATIONS:
+        return f"unknown op {op!r}"
+    _, required, optional = OPERATIONS[op]
+    for name in required:
+        if name not in entry:
+            return f"'{op}' needs '{name}'"
+    for name, value in entry.items():
+        if name == "op":
+            continue
+        if name not in required and name not in optional:
+            return f"'{op}' does not take '{name}'"
+        if name in LIST_ARGUMENTS:
+            if value is not None and not (
+                isinstance(value, list) and all(isinstance(v, str) for v in value)
+            ):
+                return f"'{name}' must be a list of strings"
+        elif value is not None and not isinstance(value, str):
+            return f"'{name}' must be a string"
+    return None
+
+
+# argument -> bulk validator kind (see validators.VALIDATORS)
+VALUE_KINDS = {
+    "phone": "phone",
+    "phones": "phone",
+    "old": "phone",
+    "new": "phone",
+    "email": "email",
+    "birthday": "birthday",
+    "address": "address",
+    "new_name": "name",
+}
+
+
+def validate_values(operations):
+    """
+    Checks phones, emails, birthdays, ... of all operations at once with
+    the bulk validators and replaces them with their normalized values
+    (birthdays become dates). Returns a list of (line number, error).
+    """
+    columns = {}
+    owners = {}
+    for index, (_, entry) in enumerate(operations):
+        for arg, value in entry.items():
+            if arg == "name" and entry["op"] == "add":
+                kind = "name"
+            elif arg in VALUE_KINDS and value is not None:
+                kind = VALUE_KINDS[arg]
+            else:
+                continue
+            items = enumerate(value) if isinstance(value, list) else [(None, value)]
+            for position, raw in items:
+                columns.setdefault(kind, []).append(raw)
+                owners.setdefault(kind, []).append((index, arg, position))
+
+    errors = {}
+    for kind, (values, failed) in validate_columns(columns).items():
+        for (index, arg, position), value, error in zip(owners[kind], values, failed):
+            if error:
+                errors.setdefault(index, error)
+            elif position is None:
+                operations[index][1][arg] = value
+            else:
+                operations[index][1][arg][position] = value
+    return [(operations[index][0], errors[index]) for index in sorted(errors)]
+
+
+def parse_operations(lines):
+    """Parses JSON lines into (line number, operation) pairs and a list of errors."""
+    operations, errors = [], []
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            errors.append((lineno, f"invalid JSON: {e}"))
+            continue
+        error = validate_operation(entry)
+        if error:
+            errors.append((lineno, error))
+        else:
+            operations.append((lineno, entry))
+    return operations, errors
+
+
+def execute(entry, book, notebook):
+    """Runs one already validated operation against the books."""
+    handler = OPERATIONS[entry["op"]][0]
+    return handler(book, notebook, entry)
+
+
+def run_operations(operations, book, notebook):
+    """Applies operations in order; returns (applied count, errors)."""
+    applied, errors = 0, []
+    for lineno, entry in operations:
+        try:
+            execute(entry, book, notebook)
+            applied += 1
+        except (KeyError, ValueError, TypeError) as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            errors.append((lineno, message))
+    return applied, errors
+
+
+def run_batch(path, book, notebook, out=sys.stdout):
+    """Runs a JSON Lines command file; returns the number of failed lines."""
+    with open(path, encoding="utf-8") as f:
+        operations, errors = parse_operations(f)
+    if not errors:
+        errors = validate_values(operations)
+    if errors:
+        for lineno, message in errors:
+            print(f"{path}:{lineno}: {message}", file=out)
+        print(f"Nothing was changed: {len(errors)} invalid line(s).", file=out)
+        return len(errors)
+
+    started = time.perf_counter()
+    with bulk(book, notebook):
+        applied, errors = run_operations(operations, book, notebook)
+    elapsed = time.perf_counter() - started
+
+    for lineno, message in errors:
+        print(f"{path}:{lineno}: {message}", file=out)
+    rate = len(operations) / elapsed if elapsed else float("inf")
+    print(
+        f"Applied {applied} of {len(operations)} operations "
+        f"in {elapsed:.2f} s ({rate:,.0f} ops/s), {len(errors)} failed.",
+        file=out,
+    )
+    return len(errors)
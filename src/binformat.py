@@ -0,0 +1,535 @@
+"""
+Versioned binary container for AddressBook and NoteBook.
+
+Layout (all integers little-endian):
+
+    header      magic b"PABK" | version u16 | kind u8 (1 contacts, 2 notes)
+                | meta length u32 | meta (UTF-8 JSON object)
+    blocks      block length u32 | block payload      (repeated)
+    end         u32 zero, then total record count u64
+    index       (notes, if meta "fulltext" is set) length u32 | the
+                FullTextIndex, so that it is not rebuilt at startup
+
+Every block holds up to BLOCK_SIZE records stored column by column.
+A block payload starts with the record count (u32) and a string table:
+the distinct strings of the block, NUL-separated, as one UTF-8 blob
+(u32 length first). All string fields are u32 references into that
+table, so repeated strings (tags, cities, ...) are stored once and
+shared after loading. Optional strings use 0 for "missing" and i + 1
+for table entry i. Dates are stored as u32 ordinals (0 = no date).
+
+Contacts block columns:   name, phone count (u16; u8 in version 1),
+                          phones, email, address, birthday
+Notes block columns:      key, text, tag count (u16), tags
+Index section columns:    (a string table as in blocks, then)
+                          document key, document length, term,
+                          document count per term, document number
+                          and position count per (term, document),
+                          positions
+
+Each column is an array prefixed by its byte length (u32). Version 2
+stored the index pickled; such a section is skipped and the index is
+rebuilt on the first search instead.
+"""
+
+import gc
+import json
+import os
+import pickle
+import struct
+import sys
+from array import array
+from datetime import date
+from fulltext import FullTextIndex
+from models import (
+    AddressBook,
+    NoteBook,
+    Record,
+    Note,
+    Name,
+    Phone,
+    Email,
+    Birthday,
+    Address,
+)
+
+MAGIC = b"PABK"
+VERSION = 3
+KIND_CONTACTS = 1
+KIND_NOTES = 2
+BLOCK_SIZE = 4096
+
+HEADER = struct.Struct("<4sHBI")
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+# phone and tag counts are stored as u16
+MAX_COUNT = 0xFFFF
+
+
+def _pack_array(typecode, values):
+    arr = array(typecode, values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    data = arr.tobytes()
+    return U32.pack(len(data)) + data
+
+
+def _unpack_array(typecode, buf, pos):
+    (length,) = U32.unpack_from(buf, pos)
+    pos += U32.size
+    arr = array(typecode)
+    arr.frombytes(buf[pos : pos + length])
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr, pos + length
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+
+    def ref(self, value):
+        ref = self.ids.get(value)
+        if ref is None:
+            if "\0" in value:
+                raise ValueError("Strings with NUL characters cannot be stored.")
+            ref = self.ids[value] = len(self.ids)
+        return ref
+
+    def optional(self, value):
+        return 0 if value is None else self.ref(value) + 1
+
+    def pack(self):
+        blob = "\0".join(self.ids).encode("utf-8")
+        return U32.pack(len(self.ids)) + U32.pack(len(blob)) + blob
+
+
+def _unpack_table(buf, pos):
+    (count,) = U32.unpack_from(buf, pos)
+    (length,) = U32.unpack_from(buf, pos + U32.size)
+    pos += 2 * U32.size
+    strings = buf[pos : pos + length].decode("utf-8").split("\0") if count else []
+    return strings, pos + length
+
+
+# ----------- Encoding -------------------
+
+
+def _encode_contacts(records):
+    table = _StringTable()
+    names, phone_counts, phones = [], [], []
+    emails, addresses, birthdays = [], [], []
+    for record in records:
+        if len(record.phones) > MAX_COUNT:
+            raise ValueError(
+                f"Contact '{record.name.value}' has more than {MAX_COUNT} phones."
+            )
+        names.append(table.ref(record.name.value))
+        phone_counts.append(len(record.phones))
+        phones.extend(table.ref(p.value) for p in record.phones)
+        emails.append(table.optional(record.email.value if record.email else None))
+        addresses.append(
+            table.optional(record.address.value if record.address else None)
+        )
+        birthdays.append(record.birthday.value.toordinal() if record.birthday else 0)
+    return b"".join(
+        [
+            U32.pack(len(names)),
+            table.pack(),
+            _pack_array("I", names),
+            _pack_array("H", phone_counts),
+            _pack_array("I", phones),
+            _pack_array("I", emails),
+            _pack_array("I", addresses),
+            _pack_array("I", birthdays),
+        ]
+    )
+
+
+def _encode_notes(items):
+    table = _StringTable()
+    keys, texts, tag_counts, tags = [], [], [], []
+    for key, note in items:
+        if len(note.tags) > MAX_COUNT:
+            raise ValueError(f"Note '{key}' has more than {MAX_COUNT} tags.")
+        keys.append(table.ref(key))
+        texts.append(table.ref(note.text))
+        tag_counts.append(len(note.tags))
+        tags.extend(table.ref(tag) for tag in note.tags)
+    return b"".join(
+        [
+            U32.pack(len(keys)),
+            table.pack(),
+            _pack_array("I", keys),
+            _pack_array("I", texts),
+            _pack_array("H", tag_counts),
+            _pack_array("I", tags),
+        ]
+    )
+
+
+# ----------- Decoding -------------------
+# Data read back from the container was validated when it was written,
+# so fields are restored directly instead of going through __init__.
+
+
+def _decode_contacts(buf, version=VERSION):
+    (count,) = U32.unpack_from(buf, 0)
+    strings, pos = _unpack_table(buf, U32.size)
+    names, pos = _unpack_array("I", buf, pos)
+    phone_counts, pos = _unpack_array("B" if version == 1 else "H", buf, pos)
+    phones, pos = _unpack_array("I", buf, pos)
+    emails, pos = _unpack_array("I", buf, pos)
+    addresses, pos = _unpack_array("I", buf, pos)
+    birthdays, pos = _unpack_array("I", buf, pos)
+
+    # The hot loop below runs once per contact; Field objects are built
+    # inline with object.__new__ to avoid a function call per field.
+    new = object.__new__
+    from_ordinal = date.fromordinal
+    phone_pos = 0
+    records = []
+    for i in range(count):
+        record = new(Record)
+        field = new(Name)
+        field.value = strings[names[i]]
+        record.name = field
+
+        record_phones = []
+        for ref in phones[phone_pos : phone_pos + phone_counts[i]]:
+            field = new(Phone)
+            field.value = strings[ref]
+            record_phones.append(field)
+        phone_pos += phone_counts[i]
+        record.phones = record_phones
+
+        ref = emails[i]
+        if ref:
+            field = new(Email)
+            field.value = strings[ref - 1]
+            record.email = field
+        else:
+            record.email = None
+
+        ref = addresses[i]
+        if ref:
+            field = new(Address)
+            field.value = strings[ref - 1]
+            record.address = field
+        else:
+            record.address = None
+
+        ordinal = birthdays[i]
+        if ordinal:
+            field = new(Birthday)
+            field.value = from_ordinal(ordinal)
+            record.birthday = field
+        else:
+            record.birthday = None
+
+        record._book = None
+        record._row = None
+        records.append(record)
+    return records
+
+
+def _decode_notes(buf, version=VERSION):
+    (count,) = U32.unpack_from(buf, 0)
+    strings, pos = _unpack_table(buf, U32.size)
+    keys, pos = _unpack_array("I", buf, pos)
+    texts, pos = _unpack_array("I", buf, pos)
+    tag_counts, pos = _unpack_array("H", buf, pos)
+    tags, pos = _unpack_array("I", buf, pos)
+
+    tag_pos = 0
+    items = []
+    for i in range(count):
+        note = Note.__new__(Note)
+        note.text = strings[texts[i]]
+        n_tags = tag_counts[i]
+        note.tags = [strings[ref] for ref in tags[tag_pos : tag_pos + n_tags]]
+        tag_pos += n_tags
+        note._book = None
+        note._key = None
+        note._row = None
+        items.append((strings[keys[i]], note))
+    return items
+
+
+def _encode_fulltext(index):
+    table = _StringTable()
+    doc_numbers = {key: i for i, key in enumerate(index._doc_len)}
+    keys = [table.ref(key) for key in index._doc_len]
+    terms, doc_counts, docs, position_counts, positions = [], [], [], [], []
+    for term, postings in index._postings.items():
+        terms.append(table.ref(term))
+        doc_counts.append(len(postings))
+        for key, term_positions in postings.items():
+            docs.append(doc_numbers[key])
+            position_counts.append(len(term_positions))
+            positions.extend(term_positions)
+    return b"".join(
+        [
+            table.pack(),
+            _pack_array("I", keys),
+            _pack_array("I", list(index._doc_len.values())),
+            _pack_array("I", terms),
+            _pack_array("I", doc_counts),
+            _pack_array("I", docs),
+            _pack_array("I", position_counts),
+            _pack_array("I", positions),
+        ]
+    )
+
+
+def _decode_fulltext(buf):
+    strings, pos = _unpack_table(buf, 0)
+    columns = []
+    for _ in range(7):
+        column, pos = _unpack_array("I", buf, pos)
+        columns.append(column)
+    keys, lengths, terms, doc_counts, docs, position_counts, positions = columns
+    if len(keys) != len(lengths) or len(docs) != sum(doc_counts):
+        raise ValueError("Book file is truncated or corrupted.")
+
+    doc_keys = [strings[ref] for ref in keys]
+    postings = {}
+    doc = position = 0
+    for term, count in zip(terms, doc_counts):
+        term_postings = {}
+        for _ in range(count):
+            n = position_counts[doc]
+            term_postings[doc_keys[docs[doc]]] = positions[
+                position : position + n
+            ].tolist()
+            doc += 1
+            position += n
+        postings[strings[term]] = term_postings
+    if position != len(positions):
+        raise ValueError("Book file is truncated or corrupted.")
+
+    index = FullTextIndex()
+    index._postings = postings
+    index._doc_len = dict(zip(doc_keys, lengths))
+    index._total_len = sum(lengths)
+    index._vocabulary = sorted(postings)
+    return index
+
+
+# ----------- Streaming reader / writer -------------------
+
+
+class BookWriter:
+    """
+    Streams records into a container file.
+
+    Usage:
+        with BookWriter(path, KIND_CONTACTS) as writer:
+            for record in records:
+                writer.write(record)
+    For notes, write() takes (key, note) pairs.
+    The file is written under a temporary name and moved into place on close.
+    """
+
+    def __init__(self, path, kind, meta=None):
+        self.path = path
+        self.kind = kind
+        self.count = 0
+        self._pending = []
+        self._section = None
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        meta_blob = json.dumps(meta or {}).encode("utf-8")
+        self._file.write(HEADER.pack(MAGIC, VERSION, kind, len(meta_blob)))
+        self._file.write(meta_blob)
+
+    def write(self, item):
+        self._pending.append(item)
+        if len(self._pending) >= BLOCK_SIZE:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._pending:
+            return
+        if self.kind == KIND_CONTACTS:
+            payload = _encode_contacts(self._pending)
+        else:
+            payload = _encode_notes(self._pending)
+        self._file.write(U32.pack(len(payload)))
+        self._file.write(payload)
+        self.count += len(self._pending)
+        self._pending = []
+
+    def write_section(self, blob):
+        """Adds a blob after the records (see BookReader.read_section)."""
+        self._section = blob
+
+    def close(self):
+        self._flush_block()
+        self._file.write(U32.pack(0))
+        self._file.write(U64.pack(self.count))
+        if self._section is not None:
+            self._file.write(U32.pack(len(self._section)))
+            self._file.write(self._section)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BookReader:
+    """Reads a container file block by block; see iter_records()."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        header = self._file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError(f"{path} is not a book file")
+        magic, version, kind, meta_length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a book file")
+        if version > VERSION:
+            raise ValueError(
+                f"{path} was written by a newer version (format {version})"
+            )
+        self.version = version
+        self.kind = kind
+        self.meta = json.loads(self._file.read(meta_length))
+
+    def iter_blocks(self):
+        decode = _decode_contacts if self.kind == KIND_CONTACTS else _decode_notes
+        count = 0
+        while True:
+            (length,) = U32.unpack(self._file.read(U32.size))
+            if not length:
+                break
+            block = decode(self._file.read(length), self.version)
+            count += len(block)
+            yield block
+        (expected,) = U64.unpack(self._file.read(U64.size))
+        if expected != count:
+            raise ValueError("Book file is truncated or corrupted.")
+
+    def read_section(self):
+        """The blob written by BookWriter.write_section, once all blocks are read."""
+        (length,) = U32.unpack(self._file.read(U32.size))
+        blob = self._file.read(length)
+        if len(blob) != length:
+            raise ValueError("Book file is truncated or corrupted.")
+        return blob
+
+    def iter_records(self):
+        """Yields Records (contacts) or (key, Note) pairs, one block in memory at a time."""
+        for block in self.iter_blocks():
+            yield from block
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ----------- Whole books -------------------
+
+
+def write_book(book, path):
+    if isinstance(book, AddressBook):
+        kind, items = KIND_CONTACTS, book.values()
+        meta = {}
+    elif isinstance(book, NoteBook):
+        kind, items = KIND_NOTES, book.items()
+        meta = {"counter": book.counter}
+    else:
+        raise TypeError("Unsupported object type for saving")
+    if hasattr(book, "_journal_seq"):
+        meta["journal_seq"] = book._journal_seq
+    if hasattr(book, "_generation"):
+        meta["generation"] = book._generation
+    fulltext = getattr(book, "_fulltext", None)
+    if fulltext is not None:
+        meta["fulltext"] = True
+
+    with BookWriter(path, kind, meta) as writer:
+        for item in items:
+            writer.write(item)
+        if fulltext is not None:
+            writer.write_section(_encode_fulltext(fulltext))
+
+
+def read_book(path):
+    # Loading creates millions of small objects and none of them are garbage;
+    # pausing the cyclic GC meanwhile roughly halves the load time.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _read_book(path)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _read_book(path):
+    with BookReader(path) as reader:
+        if reader.kind == KIND_CONTACTS:
+            book = AddressBook()
+            data = book.data
+            for block in reader.iter_blocks():
+                for record in block:
+                    record._book = book
+                    data[record.name.value.lower()] = record
+        else:
+            book = NoteBook()
+            book.counter = reader.meta.get("counter", 1)
+            data = book.data
+            for block in reader.iter_blocks():
+                for key, note in block:
+                    note._book = book
+                    note._key = key
+                    data[key] = note
+            # version 2 pickled the index: it is rebuilt instead
+            if reader.meta.get("fulltext") and reader.version >= 3:
+                book._fulltext = _decode_fulltext(reader.read_section())
+                book.subscribe(book._update_fulltext)
+        if "journal_seq" in reader.meta:
+            book._journal_seq = reader.meta["journal_seq"]
+        if "generation" in reader.meta:
+            book._generation = reader.meta["generation"]
+    return book
+
+
+def read_meta(path):
+    """The header metadata of a container file, without reading its records."""
+    with BookReader(path) as reader:
+        return reader.meta
+
+
+def migrate_pickle(pickle_path, path=None):
+    """One-shot conversion of an existing .pkl file; returns the new file's path."""
+    path = path or os.path.splitext(pickle_path)[0] + ".bin"
+    with open(pickle_path, "rb") as f:
+        book = pickle.load(f)
+    write_book(book, path)
+    return path
+
+
+if __name__ == "__main__":
+    # python src/binformat.py addressbook.pkl notebook.pkl
+    for name in sys.argv[1:]:
+        print(f"{name} -> {migrate_pickle(name)}")
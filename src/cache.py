@@ -0,0 +1,100 @@
+"""
+Cache of search results and rendered tables.
+
+Every entry is stored under a key naming the book and the query, together
+with the stamp it was computed for: the generations of the book fields
+the result depends on (see AddressBook.generation). Each change bumps
+the generations of the fields it touches, so an entry is served only as
+long as none of its fields has changed since. A new birthday keeps the
+cached name searches, a renamed contact drops them; adding or removing
+an entry touches every field.
+
+Stale entries are dropped when they are looked up, the least recently
+used ones when the cache grows past CACHE_BYTES. Sizes are estimates:
+the characters of a rendered table, a pointer per item of a result.
+"""
+
+import threading
+from collections import OrderedDict
+from config import CACHE_BYTES
+
+
+def estimate_size(value):
+    if isinstance(value, str):
+        return len(value) + 49
+    return 8 * len(value) + 56
+
+
+class ResultCache:
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        # one huge table should not push out everything else
+        self.max_entry = max_bytes // 4
+        self._entries = OrderedDict()  # key -> (stamp, value, size)
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, stamp):
+        """The value cached under `key` for `stamp`, or None."""
+        if not self.max_bytes:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != stamp:
+                self._drop(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, stamp, value, size=None):
+        if size is None:
+            size = estimate_size(value)
+        if not self.max_bytes or size > self.max_entry:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (stamp, value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def cached(self, key, stamp, compute):
+        """compute(), or its result from the last call with the same key and stamp."""
+        value = self.get(key, stamp)
+        if value is None:
+            value = compute()
+            self.put(key, stamp, value)
+        return value
+
+    def _drop(self, key):
+        self.size -= self._entries.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self.size,
+            }
+
+
+results = ResultCache()
@@ -1,136 +1,173 @@
-from colorama import Fore, Style, init
-from tabulate import tabulate
-import difflib
-from handlers import (
-    add_contact_interactive,
-    add_birthday_interactive,
-    add_email_interactive,
-    add_address_interactive,
-    add_phone_interactive,
-    find_contact_interactive,
-    show_all,
-    birthdays_interactive,
-    change_contact_interactive,
-    show_phone_interactive,
-    show_birthday_interactive,
-    find_note_interactive,
-    delete_note_interactive,
-    delete_contact_interactive,
-    edit_note_interactive,
-    add_note_interactive,
-    sort_notes_by_tag_interactive,
-    show_notes,
-)
+import importlib
+from colorama import Fore, Style
+from functools import lru_cache
+from heapq import nlargest
+from config import PLUGINS
+from metrics import instrumented
+
+# name -> {"func": callable(args, book, notebook), "desc": ..., "color": ...}
+COMMANDS = {}
+
+EXIT_COMMANDS = ("exit", "close")
+EXIT_DESC = "Exit the assistant"
+
+
+# Which books a command works with; only those are loaded before it runs
+CONTACTS = ("book",)
+NOTES = ("notebook",)
+BOTH = ("book", "notebook")
+NO_BOOKS = ()
+
+
+def command(name, desc, color=Fore.YELLOW, uses=BOTH):
+    """
+    Registers the decorated function as a command. Plugin modules use the
+    same decorator; registering invalidates the compiled lookup tables.
+    """
+
+    def register(func):
+        COMMANDS[name] = {
+            "func": instrumented(name, func),
+            "desc": desc,
+            "color": color,
+            "uses": uses,
+        }
+        _invalidate()
+        return func
+
+    return register
+
+
+def lazy_command(name, target, desc=None, color=Fore.YELLOW):
+    """
+    Registers a command implemented in another module ("module:function")
+    without importing it. The module is imported on first use; if it
+    registers `name` itself with @command, that entry replaces this one.
+    """
+    module_name, _, func_name = target.partition(":")
+
+    def load(args, book, notebook):
+        module = importlib.import_module(module_name)
+        action = COMMANDS.get(name)
+        if action is None or action["func"] is load:
+            action = dict(
+                COMMANDS[name],
+                func=instrumented(
+                    name, getattr(module, func_name or name.replace("-", "_"))
+                ),
+            )
+            COMMANDS[name] = action
+            _invalidate()
+        return action["func"](args, book, notebook)
+
+    COMMANDS[name] = {
+        "func": load,
+        "desc": desc or f"Plugin command ({module_name})",
+        "color": color,
+        "uses": BOTH,
+    }
+    _invalidate()
+
+
+def load_plugins(spec=PLUGINS):
+    """Registers the "name=module:function" commands from ASSISTANT_PLUGINS."""
+    for item in spec.split(","):
+        name, _, target = item.strip().partition("=")
+        if name and target:
+            lazy_command(name.strip().lower(), target.strip())
+
+
+def get_command(name):
+    """The registry entry for a command, or None."""
+    return COMMANDS.get(name)
+
+
+# ----------- Compiled registry -------------------
+
+
+class CommandTrie:
+    """Prefix tree of command names; every node lists the names below it."""
+
+    def __init__(self, names):
+        self.root = {"names": []}
+        for name in names:
+            node = self.root
+            node["names"].append(name)
+            for char in name:
+                node = node.setdefault(char, {"names": []})
+                node["names"].append(name)
+
+    def complete(self, prefix):
+        """Names starting with `prefix`, in registration order."""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node["names"]
+
+
+class _Compiled:
+    """Lookup tables derived from COMMANDS, rebuilt only after it changes."""
+
+    def __init__(self):
+        import difflib
+
+        names = list(COMMANDS) + list(EXIT_COMMANDS)
+        self.descriptions = {
+            name: COMMANDS[name]["desc"] if name in COMMANDS else EXIT_DESC
+            for name in names
+        }
+        self.trie = CommandTrie(names)
+        # SequenceMatcher caches what it learns about its second sequence:
+        # one matcher per command (for the shown percentage) is reused for
+        # every query, like get_close_matches reuses one per query
+        self.matchers = {}
+        for name in names:
+            matcher = difflib.SequenceMatcher(None)
+            matcher.set_seq2(name)
+            self.matchers[name] = matcher
+
+    def close_matches(self, word, n=3, cutoff=0.3):
+        """difflib.get_close_matches over the commands, with their similarity."""
+        import difflib
+
+        scorer = difflib.SequenceMatcher(None)
+        scorer.set_seq2(word)
+        scored = []
+        for name in self.matchers:
+            scorer.set_seq1(name)
+            if scorer.real_quick_ratio() >= cutoff and scorer.quick_ratio() >= cutoff:
+                ratio = scorer.ratio()
+                if ratio >= cutoff:
+                    scored.append((ratio, name))
+        matches = []
+        for _, name in nlargest(n, scored):
+            matcher = self.matchers[name]
+            matcher.set_seq1(word)
+            matches.append((matcher.ratio(), name))
+        return matches
+
 
-init(autoreset=True)
-
-COMMANDS = {
-    # ----- Contacts -----
-    "add": {
-        "func": lambda args, book, notebook: add_contact_interactive(book),
-        "desc": "Add a new contact",
-        "color": Fore.GREEN,
-    },
-    "add-phone": {
-        "func": lambda args, book, notebook: add_phone_interactive(book),
-        "desc": "Add phone to contact",
-        "color": Fore.GREEN,
-    },
-    "add-email": {
-        "func": lambda args, book, notebook: add_email_interactive(book),
-        "desc": "Add email to contact",
-        "color": Fore.GREEN,
-    },
-    "add-birthday": {
-        "func": lambda args, book, notebook: add_birthday_interactive(book),
-        "desc": "Add birthday to contact",
-        "color": Fore.GREEN,
-    },
-    "add-address": {
-        "func": lambda args, book, notebook: add_address_interactive(book),
-        "desc": "Add address to contact",
-        "color": Fore.GREEN,
-    },
-    "find": {
-        "func": lambda args, book, notebook: find_contact_interactive(book),
-        "desc": "Search contacts",
-        "color": Fore.YELLOW,
-    },
-    "phone": {
-        "func": lambda args, book, notebook: show_phone_interactive(book),
-        "desc": "Show phone numbers for contact",
-        "color": Fore.YELLOW,
-    },
-    "show-birthday": {
-        "func": lambda args, book, notebook: show_birthday_interactive(book),
-        "desc": "Show contact's birthday",
-        "color": Fore.YELLOW,
-    },
-    "change": {
-        "func": lambda args, book, notebook: change_contact_interactive(book),
-        "desc": "Change contact's name, phone number, email, birthday, address",
-        "color": Fore.GREEN,
-    },
-    "del": {
-        "func": lambda args, book, notebook: delete_contact_interactive(book),
-        "desc": "Delete contact",
-        "color": Fore.RED,
-    },
-    "all": {
-        "func": lambda args, book, notebook: show_all(book),
-        "desc": "Show all contacts",
-        "color": Fore.YELLOW,
-    },
-    "birthdays": {
-        "func": lambda args, book, notebook: birthdays_interactive(book),
-        "desc": "Show upcoming birthdays",
-        "color": Fore.YELLOW,
-    },
-    # ----- Notes -----
-    "add-note": {
-        "func": lambda args, book, notebook: add_note_interactive(notebook),
-        "desc": "Add a note",
-        "color": Fore.GREEN,
-    },
-    "find-note": {
-        "func": lambda args, book, notebook: find_note_interactive(notebook),
-        "desc": "Find a note",
-        "color": Fore.YELLOW,
-    },
-    "edit-note": {
-        "func": lambda args, book, notebook: edit_note_interactive(notebook),
-        "desc": "Edit a note",
-        "color": Fore.GREEN,
-    },
-    "sort-note": {
-        "func": lambda args, book, notebook: sort_notes_by_tag_interactive(notebook),
-        "desc": "Sort notes by tag",
-        "color": Fore.YELLOW,
-    },
-    "del-note": {
-        "func": lambda args, book, notebook: delete_note_interactive(notebook),
-        "desc": "Delete a note",
-        "color": Fore.RED,
-    },
-    "notes": {
-        "func": lambda args, book, notebook: show_notes(notebook),
-        "desc": "Show all notes",
-        "color": Fore.YELLOW,
-    },
-    # ----- General -----
-    "hello": {
-        "func": lambda args, book, notebook: "👋 Hello! How can I assist you today?",
-        "desc": "Greeting",
-        "color": Fore.CYAN,
-    },
-    "help": {
-        "func": lambda args, book, notebook: show_help(),
-        "desc": "Show help message",
-        "color": Fore.YELLOW,
-    },
-}
+_compiled = None
 
 
+def _registry():
+    global _compiled
+    if _compiled is None:
+        _compiled = _Compiled()
+    return _compiled
+
+
+def _invalidate():
+    global _compiled
+    _compiled = None
+    suggest_command.cache_clear()
+    show_help.cache_clear()
+    commands_table.cache_clear()
+
+
+@lru_cache(maxsize=None)
 def show_help():
     result = ["\n📘 Available commands:"]
     for cmd, data in COMMANDS.items():
@@ -148,32 +185,34 @@ def greet():
     )
 
 
+@lru_cache(maxsize=256)
 def suggest_command(user_input):
     """
     Пропонує найбільш схожі команди до введеного тексту
     """
-    all_commands = list(COMMANDS.keys()) + ["exit", "close"]
+    registry = _registry()
 
-    prefix_matches = [cmd for cmd in all_commands if cmd.startswith(user_input)]
+    prefix_matches = registry.trie.complete(user_input)
 
     if prefix_matches:
         result = [f"{Fore.MAGENTA}Можливо ви мали на увазі (префікс):{Style.RESET_ALL}"]
         for cmd in prefix_matches:
-            desc = COMMANDS[cmd]["desc"] if cmd in COMMANDS else "Exit the assistant"
+            desc = registry.descriptions[cmd]
             result.append(f"{Fore.GREEN}- {cmd}:{Style.RESET_ALL} {desc}")
         return "\n".join(result)
 
-    matches = difflib.get_close_matches(user_input, all_commands, n=3, cutoff=0.3)
+    matches = registry.close_matches(user_input)
 
     if matches:
         result = [
             f"{Fore.MAGENTA}Можливо ви мали на увазі (схожість):{Style.RESET_ALL}"
         ]
-        for idx, cmd in enumerate(matches):
-            ratio = int(difflib.SequenceMatcher(None, user_input, cmd).ratio() * 100)
+        for idx, (ratio, cmd) in enumerate(matches):
             color = Fore.GREEN if idx == 0 else Fore.YELLOW
-            desc = COMMANDS[cmd]["desc"] if cmd in COMMANDS else "Exit the assistant"
-            result.append(f"{color}- {cmd} ({ratio}%):{Style.RESET_ALL} {desc}")
+            desc = registry.descriptions[cmd]
+            result.append(
+                f"{color}- {cmd} ({int(ratio * 100)}%):{Style.RESET_ALL} {desc}"
+            )
         return "\n".join(result)
 
     return (
@@ -182,13 +221,229 @@ def suggest_command(user_input):
     )
 
 
+@lru_cache(maxsize=None)
+def commands_table():
+    from formatters import grid
+
+    rows = [[command, info["desc"]] for command, info in COMMANDS.items()]
+    colors = [(info["color"], "") for info in COMMANDS.values()]
+    return grid(["Command", "Description"], rows, colors)
+
+
 def show_commands_table():
-    table_data = []
-    for command, info in COMMANDS.items():
-        desc = info["desc"]
-        color = info["color"]
-        colored_command = f"{color}{command}{Style.RESET_ALL}"
-        table_data.append([colored_command, desc])
-
-    headers = ["Command", "Description"]
-    print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
+    print(commands_table())
+
+
+# ----------- Built-in commands -------------------
+
+# ----- Contacts -----
+
+
+@command("add", "Add a new contact", Fore.GREEN, CONTACTS)
+def _add(args, book, notebook):
+    from handlers import add_contact_interactive
+
+    return add_contact_interactive(book)
+
+
+@command("add-phone", "Add phone to contact", Fore.GREEN, CONTACTS)
+def _add_phone(args, book, notebook):
+    from handlers import add_phone_interactive
+
+    return add_phone_interactive(book)
+
+
+@command("add-email", "Add email to contact", Fore.GREEN, CONTACTS)
+def _add_email(args, book, notebook):
+    from handlers import add_email_interactive
+
+    return add_email_interactive(book)
+
+
+@command("add-birthday", "Add birthday to contact", Fore.GREEN, CONTACTS)
+def _add_birthday(args, book, notebook):
+    from handlers import add_birthday_interactive
+
+    return add_birthday_interactive(book)
+
+
+@command("add-address", "Add address to contact", Fore.GREEN, CONTACTS)
+def _add_address(args, book, notebook):
+    from handlers import add_address_interactive
+
+    return add_address_interactive(book)
+
+
+@command("find", "Search contacts", Fore.YELLOW, CONTACTS)
+def _find(args, book, notebook):
+    from handlers import find_contact_interactive
+
+    return find_contact_interactive(book)
+
+
+@command("lookup", "Find who owns a phone number or email", Fore.YELLOW, CONTACTS)
+def _lookup(args, book, notebook):
+    from handlers import lookup_contact_interactive
+
+    return lookup_contact_interactive(book)
+
+
+@command(
+    "duplicates", "Show phone numbers shared by several contacts", Fore.YELLOW, CONTACTS
+)
+def _duplicates(args, book, notebook):
+    from handlers import duplicate_phones_interactive
+
+    return duplicate_phones_interactive(book)
+
+
+@command("phone", "Show phone numbers for contact", Fore.YELLOW, CONTACTS)
+def _phone(args, book, notebook):
+    from handlers import show_phone_interactive
+
+    return show_phone_interactive(book)
+
+
+@command("show-birthday", "Show contact's birthday", Fore.YELLOW, CONTACTS)
+def _show_birthday(args, book, notebook):
+    from handlers import show_birthday_interactive
+
+    return show_birthday_interactive(book)
+
+
+@command(
+    "change",
+    "Change contact's name, phone number, email, birthday, address",
+    Fore.GREEN,
+    CONTACTS,
+)
+def _change(args, book, notebook):
+    from handlers import change_contact_interactive
+
+    return change_contact_interactive(book)
+
+
+@command("del", "Delete contact", Fore.RED, CONTACTS)
+def _del(args, book, notebook):
+    from handlers import delete_contact_interactive
+
+    return delete_contact_interactive(book)
+
+
+@command("all", "Show all contacts", Fore.YELLOW, CONTACTS)
+def _all(args, book, notebook):
+    from handlers import show_all
+
+    return show_all(book)
+
+
+@command("birthdays", "Show upcoming birthdays", Fore.YELLOW, CONTACTS)
+def _birthdays(args, book, notebook):
+    from handlers import birthdays_interactive
+
+    return birthdays_interactive(book)
+
+
+# ----- Notes -----
+
+
+@command("add-note", "Add a note", Fore.GREEN, NOTES)
+def _add_note(args, book, notebook):
+    from handlers import add_note_interactive
+
+    return add_note_interactive(notebook)
+
+
+@command("find-note", "Find a note", Fore.YELLOW, NOTES)
+def _find_note(args, book, notebook):
+    from handlers import find_note_interactive
+
+    return find_note_interactive(notebook)
+
+
+@command("edit-note", "Edit a note", Fore.GREEN, NOTES)
+def _edit_note(args, book, notebook):
+    from handlers import edit_note_interactive
+
+    return edit_note_interactive(notebook)
+
+
+@command("find-tag", "Find notes by one or more tags", Fore.YELLOW, NOTES)
+def _find_tag(args, book, notebook):
+    from handlers import find_notes_by_tags_interactive
+
+    return find_notes_by_tags_interactive(notebook)
+
+
+@command("sort-note", "Sort notes by tag", Fore.YELLOW, NOTES)
+def _sort_note(args, book, notebook):
+    from handlers import sort_notes_by_tag_interactive
+
+    return sort_notes_by_tag_interactive(notebook)
+
+
+@command("del-note", "Delete a note", Fore.RED, NOTES)
+def _del_note(args, book, notebook):
+    from handlers import delete_note_interactive
+
+    return delete_note_interactive(notebook)
+
+
+@command("notes", "Show all notes", Fore.YELLOW, NOTES)
+def _notes(args, book, notebook):
+    from handlers import show_notes
+
+    return show_notes(notebook)
+
+
+# ----- Import / export -----
+
+
+@command(
+    "import",
+    "Import contacts (CSV, JSONL, vCard) or notes (JSONL, Markdown)",
+    Fore.GREEN,
+)
+def _import(args, book, notebook):
+    from handlers import import_interactive
+
+    return import_interactive(book, notebook)
+
+
+@command("export", "Export contacts or notes to a file", Fore.YELLOW)
+def _export(args, book, notebook):
+    from handlers import export_interactive
+
+    return export_interactive(book, notebook)
+
+
+# ----- General -----
+
+
+@command("stats", "Show command latencies and storage timings", Fore.YELLOW, NO_BOOKS)
+def _stats(args, book, notebook):
+    from handlers import stats_interactive
+
+    return stats_interactive()
+
+
+@command(
+    "profile", "Profile a command (cProfile or tracemalloc)", Fore.YELLOW, NO_BOOKS
+)
+def _profile(args, book, notebook):
+    from handlers import profile_interactive
+
+    return profile_interactive()
+
+
+@command("hello", "Greeting", Fore.CYAN, NO_BOOKS)
+def _hello(args, book, notebook):
+    return "👋 Hello! How can I assist you today?"
+
+
+@command("help", "Show help message", Fore.YELLOW, NO_BOOKS)
+def _help(args, book, notebook):
+    return show_help()
+
+
+load_plugins()
@@ -0,0 +1,45 @@
+import os
+
+# Storage mode:
+#   "binary"  - the whole book is rewritten to its .bin file (binformat)
+#               after every change (default; "pickle", the old name of
+#               this mode, is still accepted)
+#   "journal" - every change is appended to a log, the log is folded into
+#               the snapshot once it grows past JOURNAL_COMPACT_THRESHOLD
+#   "lazy"    - contacts live in a memory-mapped addressbook.dat and are
+#               read only when touched; at most LAZY_CACHE_SIZE untouched
+#               records stay in memory
+#   "sqlite"  - contacts and notes live in the SQLite database SQLITE_PATH;
+#               every change is committed on its own, there is no full save
+STORAGE_MODE = os.environ.get("ASSISTANT_STORAGE", "binary")
+if STORAGE_MODE == "pickle":
+    STORAGE_MODE = "binary"
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("ASSISTANT_JOURNAL_COMPACT", "1000"))
+LAZY_CACHE_SIZE = int(os.environ.get("ASSISTANT_LAZY_CACHE", "1024"))
+SQLITE_PATH = os.environ.get("ASSISTANT_SQLITE", "assistant.db")
+
+# Background autosave: changes are written at most every AUTOSAVE_INTERVAL_MS
+# milliseconds, or as soon as AUTOSAVE_MAX_CHANGES changes have piled up
+AUTOSAVE_INTERVAL_MS = int(os.environ.get("ASSISTANT_AUTOSAVE_MS", "500"))
+AUTOSAVE_MAX_CHANGES = int(os.environ.get("ASSISTANT_AUTOSAVE_CHANGES", "100"))
+
+# Rows per page in the `all`, `notes`, `find` and `sort-note` tables
+PAGE_SIZE = int(os.environ.get("ASSISTANT_PAGE_SIZE", "20"))
+
+# Extra commands from other modules, loaded on first use:
+#   ASSISTANT_PLUGINS="weather=my_plugins:weather,todo=todo_plugin:run"
+PLUGINS = os.environ.get("ASSISTANT_PLUGINS", "")
+
+# Command latency and storage/formatting timings (the `stats` command);
+# ASSISTANT_METRICS=0 turns the instrumentation off. If ASSISTANT_METRICS_FILE
+# is set the metrics are written there on exit (Prometheus text for .prom, JSON otherwise).
+METRICS_ENABLED = os.environ.get("ASSISTANT_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("ASSISTANT_METRICS_FILE", "")
+# Commands run under a profiler: "find=cpu,all=memory" (cProfile / tracemalloc);
+# the reports go to PROFILE_DIR
+PROFILE = os.environ.get("ASSISTANT_PROFILE", "")
+PROFILE_DIR = os.environ.get("ASSISTANT_PROFILE_DIR", "profiles")
+
+# Cached search results and rendered tables (see cache.py), in megabytes;
+# ASSISTANT_CACHE_MB=0 turns the cache off
+CACHE_BYTES = int(float(os.environ.get("ASSISTANT_CACHE_MB", "32")) * (1 << 20))
@@ -1,60 +1,385 @@
-from tabulate import tabulate
-from colorama import Fore, Style, init
+import sys
+import textwrap
+from itertools import islice
+from colorama import Fore, Style
+from cache import results
+from config import PAGE_SIZE
+from metrics import timed
 
-init(autoreset=True)
+CONTACT_HEADERS = ("Name", "Phones", "Emails", "Addresses", "Birthday")
+NOTE_HEADERS = ("ID", "Text", "Tags")
 
+# Wider cells are wrapped in the paged tables
+MAX_COLUMN_WIDTH = 40
 
+
+def contact_row(record):
+    # memoized on the record until it changes
+    return record.display_row()
+
+
+def note_row(note_id, note):
+    return note.display_row(note_id)
+
+
+def _colored(headers, color):
+    return [color + header + Style.RESET_ALL for header in headers]
+
+
+@timed("format")
 def format_contacts(book):
     """Форматує контакти у кольорову таблицю"""
-    headers = [
-        Fore.CYAN + "Name" + Style.RESET_ALL,
-        Fore.CYAN + "Phones" + Style.RESET_ALL,
-        Fore.CYAN + "Emails" + Style.RESET_ALL,
-        Fore.CYAN + "Addresses" + Style.RESET_ALL,
-        Fore.CYAN + "Birthday" + Style.RESET_ALL,
-    ]
-    table = []
-
-    for record in book.values():
-        phones = (
-            ", ".join(phone.value for phone in record.phones) if record.phones else "-"
-        )
-        email = record.email.value if record.email else "-"
-        address = record.address.value if record.address else "-"
-        birthday = (
-            record.birthday.value.strftime("%d.%m.%Y") if record.birthday else "-"
-        )
-        table.append([record.name.value.capitalize(), phones, email, address, birthday])
+    from tabulate import tabulate
 
-    return tabulate(table, headers=headers, tablefmt="fancy_grid")
+    table = [contact_row(record) for record in book.values()]
+    return tabulate(
+        table, headers=_colored(CONTACT_HEADERS, Fore.CYAN), tablefmt="fancy_grid"
+    )
 
 
 def format_notes(notebook):
     """Форматує нотатки у кольорову таблицю"""
-    headers = [
-        Fore.MAGENTA + "ID" + Style.RESET_ALL,
-        Fore.MAGENTA + "Text" + Style.RESET_ALL,
-        Fore.MAGENTA + "Tags" + Style.RESET_ALL,
-    ]
-    table = []
+    return format_notes_list(notebook.data.items())
 
-    for note_id, note in notebook.data.items():
-        tags_str = ", ".join(note.tags) if note.tags else "-"
-        table.append([note_id, note.text, tags_str])
 
-    return tabulate(table, headers=headers, tablefmt="fancy_grid")
+@timed("format")
+def format_notes_list(notes):
+    from tabulate import tabulate
 
+    table = [note_row(note_id, note) for note_id, note in notes]
+    return tabulate(
+        table, headers=_colored(NOTE_HEADERS, Fore.MAGENTA), tablefmt="fancy_grid"
+    )
 
-def format_notes_list(notes):
-    headers = [
-        Fore.MAGENTA + "ID" + Style.RESET_ALL,
-        Fore.MAGENTA + "Text" + Style.RESET_ALL,
-        Fore.MAGENTA + "Tags" + Style.RESET_ALL,
+
+# ----------- Paged tables -------------------
+
+
+class PagedTable:
+    """
+    Table drawn page by page in the fancy_grid style.
+
+    Rows are pulled from an iterator only when their page is needed, and
+    column widths are sampled from the first page (capped at
+    MAX_COLUMN_WIDTH, longer cells wrap), so showing the first page costs
+    the same for ten rows or a million. A table of a whole book can take
+    the book's `widths` instead (AddressBook.column_widths, kept up to
+    date as the book changes, None until built), which fit every page.
+
+    With `cache=(key, stamp)` (see cache.py) rendered pages and streamed
+    tables are kept in the result cache, and a table shown again for the
+    same stamp is written without pulling its rows at all.
+    """
+
+    def __init__(
+        self,
+        headers,
+        rows,
+        color,
+        page_size=PAGE_SIZE,
+        total=None,
+        max_width=MAX_COLUMN_WIDTH,
+        cache=None,
+        widths=None,
+    ):
+        self.headers = headers
+        self.color = color
+        self.page_size = page_size
+        self.total = total
+        self.max_width = max_width
+        self.cache = cache
+        self._rows = iter(rows)
+        self._pages = []
+        self._exhausted = False
+        self.widths = None
+        # pages drawn with the book's widths and with sampled ones differ
+        self._preset = widths is not None
+        if widths is not None:
+            self.widths = [
+                max(len(header), width if max_width is None else min(width, max_width))
+                for header, width in zip(headers, widths)
+            ]
+
+    def page(self, number):
+        """Rows of the page (0-based), or None past the end."""
+        while len(self._pages) <= number and not self._exhausted:
+            rows = list(islice(self._rows, self.page_size))
+            if rows:
+                self._pages.append(rows)
+            if len(rows) < self.page_size:
+                self._exhausted = True
+        if number < len(self._pages):
+            return self._pages[number]
+        return None
+
+    def page_count(self):
+        """Known number of pages, or None while the rows are still streaming."""
+        if self.total is not None:
+            return max(1, -(-self.total // self.page_size))
+        return len(self._pages) if self._exhausted else None
+
+    def _sample_widths(self, rows):
+        widths = [len(header) for header in self.headers]
+        for row in rows:
+            for i, cell in enumerate(row):
+                longest = max(len(line) for line in str(cell).split("\n"))
+                if self.max_width is not None:
+                    longest = min(longest, self.max_width)
+                widths[i] = max(widths[i], longest)
+        return widths
+
+    def _line(self, left, fill, middle, right):
+        return left + middle.join(fill * (w + 2) for w in self.widths) + right
+
+    def _cells(self, row, color=""):
+        """`color` applies to every cell, or is a sequence of per-cell colors."""
+        colors = [color] * len(row) if isinstance(color, str) else color
+        columns = []
+        for cell, width in zip(row, self.widths):
+            lines = []
+            for line in str(cell).split("\n"):
+                lines.extend(textwrap.wrap(line, width) or [""])
+            columns.append(lines)
+        height = max(len(lines) for lines in columns)
+        out = []
+        for i in range(height):
+            parts = []
+            for lines, width, cell_color in zip(columns, self.widths, colors):
+                text = lines[i] if i < len(lines) else ""
+                padded = text.ljust(width)
+                parts.append(
+                    cell_color + padded + Style.RESET_ALL if cell_color else padded
+                )
+            out.append("│ " + " │ ".join(parts) + " │")
+        return out
+
+    def header(self):
+        return [
+            self._line("╒", "═", "╤", "╕"),
+            *self._cells(self.headers, self.color),
+            self._line("╞", "═", "╪", "╡"),
+        ]
+
+    def body(self, rows, colors=None):
+        lines = []
+        for i, row in enumerate(rows):
+            if i:
+                lines.append(self._line("├", "─", "┼", "┤"))
+            lines.extend(self._cells(row, colors[i] if colors else ""))
+        return lines
+
+    def footer(self):
+        return [self._line("╘", "═", "╧", "╛")]
+
+    def _cache_key(self, *parts):
+        key, stamp = self.cache
+        return key + (self.page_size, self._preset, *parts), stamp
+
+    @timed("format")
+    def render(self, number):
+        if self.cache is not None:
+            key, stamp = self._cache_key("page", number)
+            text = results.get(key, stamp)
+            if text is not None:
+                return text
+        rows = self.page(number)
+        if rows is None:
+            return None
+        if self.widths is None:
+            # the same widths whichever page is rendered first
+            self.widths = self._sample_widths(self.page(0))
+        text = "\n".join(self.header() + self.body(rows) + self.footer())
+        if self.cache is not None:
+            results.put(key, stamp, text)
+        return text
+
+    @timed("format")
+    def stream(self, out=sys.stdout):
+        """Writes every row as one continuous table, a page at a time."""
+        if self.cache is None:
+            return self._stream(out)
+        key, stamp = self._cache_key("stream")
+        cached = results.get(key, stamp)
+        if cached is not None:
+            text, shown = cached
+            out.write(text)
+            return shown
+        recorder = _Recorder(out, results.max_entry)
+        shown = self._stream(recorder)
+        if recorder.parts is not None:
+            text = "".join(recorder.parts)
+            results.put(key, stamp, (text, shown), len(text))
+        return shown
+
+    def _stream(self, out):
+        number = 0
+        rows = self.page(0)
+        if rows is None:
+            return 0
+        if self.widths is None:
+            self.widths = self._sample_widths(rows)
+        out.write("\n".join(self.header()) + "\n")
+        shown = 0
+        while rows is not None:
+            if shown:
+                out.write(self._line("├", "─", "┼", "┤") + "\n")
+            out.write("\n".join(self.body(rows)) + "\n")
+            shown += len(rows)
+            # earlier pages are not needed again
+            self._pages[number] = None
+            number += 1
+            rows = self.page(number)
+        out.write("\n".join(self.footer()) + "\n")
+        return shown
+
+
+class _Recorder:
+    """Writes through to `out`, keeping a copy while it stays under `limit` characters."""
+
+    def __init__(self, out, limit):
+        self.out = out
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.out.write(text)
+        if self.parts is None:
+            return
+        self.size += len(text)
+        if self.size > self.limit:
+            self.parts = None
+        else:
+            self.parts.append(text)
+
+
+@timed("format")
+def grid(headers, rows, colors=None, max_width=None):
+    """
+    Whole table in the fancy_grid style without importing tabulate;
+    `colors` holds per-cell colors for each row.
+    """
+    rows = list(rows)
+    table = PagedTable(headers, rows, "", max(1, len(rows)), max_width=max_width)
+    table.widths = table._sample_widths(rows)
+    return "\n".join(table.header() + table.body(rows, colors) + table.footer())
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+def format_stats(data):
+    """Tables of metrics.Metrics.to_dict(): command latencies, then sections."""
+    breakdown = data["breakdown"]
+    rows = []
+    for command, histogram in sorted(data["commands"].items()):
+        sections = breakdown.get(command, {})
+        storage = sum(
+            entry["seconds"]
+            for name, entry in sections.items()
+            if name.startswith("storage.")
+        )
+        formatting = sections.get("format", {}).get("seconds", 0.0)
+        rows.append(
+            [
+                command,
+                histogram["count"],
+                _ms(histogram["p50"]),
+                _ms(histogram["p95"]),
+                _ms(histogram["max"]),
+                _ms(storage),
+                _ms(formatting),
+            ]
+        )
+    headers = (
+        "Command",
+        "Calls",
+        "p50 ms",
+        "p95 ms",
+        "Max ms",
+        "Storage ms",
+        "Format ms",
+    )
+    parts = [grid(headers, rows) if rows else "No commands recorded yet."]
+
+    rows = [
+        [name, entry["calls"], _ms(entry["seconds"]), entry["bytes"]]
+        for name, entry in sorted(data["sections"].items())
     ]
-    table = []
+    if rows:
+        parts.append(grid(("Section", "Calls", "Total ms", "Bytes"), rows))
+    for title, key in (("Autosave", "autosave"), ("Cache", "cache")):
+        counters = data.get(key)
+        if counters:
+            parts.append(
+                f"{title}: "
+                + ", ".join(
+                    f"{name.replace('_', ' ')} {value}"
+                    for name, value in counters.items()
+                )
+            )
+    return "\n".join(parts)
+
+
+PAGER_HELP = "Enter - next page, p - previous, <number> - go to page, q - quit"
+
+
+def show_paged(table, interactive=None):
+    """
+    Shows a PagedTable. On a terminal this is an interactive pager;
+    otherwise (pipes, scripts) all pages are streamed to stdout.
+    Returns a one-line summary for the command output.
+    """
+    if interactive is None:
+        interactive = sys.stdin.isatty() and sys.stdout.isatty()
+    if not interactive:
+        shown = table.stream()
+        return f"{shown} row(s)."
+
+    number = 0
+    while True:
+        text = table.render(number)
+        if text is None:
+            if not number:
+                return "Nothing to show."
+            number -= 1
+            continue
+        print(text)
+        pages = table.page_count()
+        print(
+            f"Page {number + 1}" + (f" of {pages}" if pages else "") + f". {PAGER_HELP}"
+        )
+        try:
+            answer = input(": ").strip().lower()
+        except EOFError:
+            answer = "q"
+        if answer == "q":
+            return f"Page {number + 1}" + (f" of {pages}." if pages else ".")
+        if answer == "p":
+            number = max(0, number - 1)
+        elif answer.isdigit() and int(answer) > 0:
+            number = int(answer) - 1
+            if table.page(number) is None:
+                print(f"There is no page {answer}.")
+                number = len(table._pages) - 1
+        elif table.page(number + 1) is None:
+            return "End of the list."
+        else:
+            number += 1
+
+
+def page_contacts(records, total=None, interactive=None, cache=None, widths=None):
+    rows = (contact_row(record) for record in records)
+    table = PagedTable(
+        CONTACT_HEADERS, rows, Fore.CYAN, total=total, cache=cache, widths=widths
+    )
+    return show_paged(table, interactive)
 
-    for note_id, note in notes:
-        tags = ", ".join(note.tags) if note.tags else "-"
-        table.append([note_id, note.text, tags])
 
-    return tabulate(table, headers=headers, tablefmt="fancy_grid")
+def page_notes(notes, total=None, interactive=None, cache=None, widths=None):
+    rows = (note_row(note_id, note) for note_id, note in notes)
+    table = PagedTable(
+        NOTE_HEADERS, rows, Fore.MAGENTA, total=total, cache=cache, widths=widths
+    )
+    return show_paged(table, interactive)
@@ -0,0 +1,143 @@
+import math
+import re
+from bisect import bisect_left, insort
+from heapq import nlargest
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.casefold())
+
+
+class FullTextIndex:
+    """
+    Positional inverted index with BM25 ranking.
+
+    Query syntax:
+        word            documents containing the word
+        "two words"     documents containing the exact phrase
+        wor*            documents containing a word starting with "wor"
+    All parts of a query must match; results are ordered by BM25 score.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term -> {key: [positions]}
+        self._doc_len = {}
+        self._total_len = 0
+        self._vocabulary = []  # sorted terms, for prefix queries
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, key, text):
+        if key in self._doc_len:
+            self.remove(key)
+        tokens = tokenize(text)
+        self._doc_len[key] = len(tokens)
+        self._total_len += len(tokens)
+        for pos, term in enumerate(tokens):
+            docs = self._postings.get(term)
+            if docs is None:
+                docs = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            docs.setdefault(key, []).append(pos)
+
+    def remove(self, key, text=None):
+        length = self._doc_len.pop(key, None)
+        if length is None:
+            return
+        self._total_len -= length
+        terms = set(tokenize(text)) if text is not None else list(self._postings)
+        for term in terms:
+            docs = self._postings.get(term)
+            if docs is None or docs.pop(key, None) is None:
+                continue
+            if not docs:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _expand(self, prefix):
+        i = bisect_left(self._vocabulary, prefix)
+        terms = []
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            terms.append(self._vocabulary[i])
+            i += 1
+        return terms
+
+    def _parse(self, query):
+        """Splits a query into clauses, each a (kind, terms) pair."""
+        clauses = []
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                terms = tokenize(phrase)
+                if len(terms) > 1:
+                    clauses.append(("phrase", terms))
+                elif terms:
+                    clauses.append(("term", terms))
+            elif word.endswith("*") and tokenize(word):
+                clauses.append(("prefix", self._expand(tokenize(word)[0])))
+            else:
+                clauses.extend(("term", [term]) for term in tokenize(word))
+        return clauses
+
+    def _phrase_docs(self, terms):
+        postings = [self._postings.get(term) for term in terms]
+        if not all(postings):
+            return set()
+        docs = set(min(postings, key=len))
+        matched = set()
+        for key in docs:
+            if all(key in p for p in postings):
+                starts = set(postings[0][key])
+                for offset, p in enumerate(postings[1:], 1):
+                    starts &= {pos - offset for pos in p[key]}
+                    if not starts:
+                        break
+                if starts:
+                    matched.add(key)
+        return matched
+
+    def _clause_docs(self, kind, terms):
+        if kind == "phrase":
+            return self._phrase_docs(terms)
+        docs = set()
+        for term in terms:
+            docs.update(self._postings.get(term, ()))
+        return docs
+
+    def _score(self, key, terms):
+        n_docs = len(self._doc_len)
+        avg_len = self._total_len / n_docs if n_docs else 0
+        norm = K1 * (1 - B + B * self._doc_len[key] / avg_len) if avg_len else K1
+        score = 0.0
+        for term in terms:
+            docs = self._postings.get(term)
+            if not docs or key not in docs:
+                continue
+            tf = len(docs[key])
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            score += idf * tf * (K1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query, limit=10):
+        """Returns up to `limit` (key, score) pairs, best match first."""
+        clauses = self._parse(query)
+        if not clauses:
+            return []
+
+        matched = None
+        for kind, terms in sorted(clauses, key=lambda c: len(c[1])):
+            docs = self._clause_docs(kind, terms)
+            matched = docs if matched is None else matched & docs
+            if not matched:
+                return []
+
+        terms = [term for _, clause_terms in clauses for term in clause_terms]
+        scored = ((key, self._score(key, terms)) for key in matched)
+        return nlargest(limit, scored, key=lambda item: item[1])
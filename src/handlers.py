@@ -1,27 +1,58 @@
-from utils import input_error, normalize_phone, autosave
+import os
+from utils import input_error, normalize_phone, autosave, ask
+from cache import results
 from models import AddressBook, Record, Birthday, Email, Address, NoteBook, Note
-from formatters import format_contacts, format_notes, format_notes_list
+from formatters import (
+    format_contacts,
+    format_notes_list,
+    format_stats,
+    page_contacts,
+    page_notes,
+)
+
+FIND_NOTE_LIMIT = 10
+
+
+def _not_found(book, name, message="Contact was not found."):
+    """Not-found message with a "did you mean" hint for near-miss names."""
+    similar = book.find_similar(name, limit=3) if name else []
+    if not similar:
+        return message
+    names = ", ".join(record.name.value for record in similar)
+    return f"{message} Did you mean: {names}?"
 
 
 @input_error
 def show_all(book):
-    if not book.values():
+    if not len(book):
         return "Your address book is currently empty."
-    return format_contacts(book)
+    # pages are shown as the book was when the command started
+    contacts = book.snapshot()
+    cache = (contacts.cache_key("all"), contacts.generation())
+    return page_contacts(
+        contacts.values(),
+        total=len(contacts),
+        cache=cache,
+        widths=contacts.column_widths(),
+    )
 
 
 @input_error
 def show_notes(notebook):
-    if not notebook.data:
+    if not len(notebook.data):
         return "There are no notes available."
-    return format_notes(notebook)
+    notes = notebook.snapshot()
+    cache = (notes.cache_key("notes"), notes.generation())
+    return page_notes(
+        notes.items(), total=len(notes), cache=cache, widths=notes.column_widths()
+    )
 
 
 @input_error
 @autosave
 def add_contact_interactive(book: AddressBook):
     """Interactively collects contact info and adds it to the address book."""
-    name = input("Enter contact name: ").strip()
+    name = ask("Enter contact name: ").strip()
     if not name:
         raise ValueError("Name is required.")
 
@@ -35,7 +66,7 @@ def add_contact_interactive(book: AddressBook):
 
     # Add phones
     while True:
-        phone = input("Enter a phone number (or press Enter to skip): ").strip()
+        phone = ask("Enter a phone number (or press Enter to skip): ").strip()
         if not phone:
             break
         try:
@@ -47,7 +78,7 @@ def add_contact_interactive(book: AddressBook):
 
     # Add email
     while True:
-        email = input("Enter email (press Enter to skip): ").strip()
+        email = ask("Enter email (press Enter to skip): ").strip()
         if not email:
             break
         try:
@@ -58,7 +89,7 @@ def add_contact_interactive(book: AddressBook):
             print(f"{e} (expected format: name@example.com)")
 
     # Add address
-    address = input("Enter address (press Enter to skip): ").strip()
+    address = ask("Enter address (press Enter to skip): ").strip()
     if address:
         try:
             record.set_address(address)
@@ -68,7 +99,7 @@ def add_contact_interactive(book: AddressBook):
 
     # Add birthday
     while True:
-        birthday = input("Enter birthday (DD.MM.YYYY, press Enter to skip): ").strip()
+        birthday = ask("Enter birthday (DD.MM.YYYY, press Enter to skip): ").strip()
         if not birthday:
             break
         try:
@@ -86,17 +117,17 @@ def add_contact_interactive(book: AddressBook):
 @input_error
 @autosave
 def change_contact_interactive(book: AddressBook):
-    name = input("Enter the name of the contact to change: ").strip()
+    name = ask("Enter the name of the contact to change: ").strip()
     record = book.get_record(name)
     if not record:
-        return f"Contact '{name}' not found."
+        return _not_found(book, name, f"Contact '{name}' not found.")
 
     print(f"\nWhat would you like to change for {record.name.value}?")
     options = ["name", "phone", "email", "birthday", "address"]
     print("Options:", ", ".join(options))
 
     while True:
-        field = input("Field to change (or type 'esc' to cancel): ").strip().lower()
+        field = ask("Field to change (or type 'esc' to cancel): ").strip().lower()
 
         if field == "esc":
             return "Change cancelled."
@@ -116,7 +147,7 @@ def change_contact_interactive(book: AddressBook):
             old_phone = record.phones[0].value
             print(f"Current phone: {old_phone}")
             while True:
-                new_phone = input(
+                new_phone = ask(
                     "Enter a new phone number (or 'esc' to cancel): "
                 ).strip()
 
@@ -135,7 +166,7 @@ def change_contact_interactive(book: AddressBook):
                 print(f"{idx}. {p.value}")
 
             while True:
-                index_input = input(
+                index_input = ask(
                     "Enter the number of the phone to change (or 'esc' to cancel): "
                 ).strip()
 
@@ -153,7 +184,7 @@ def change_contact_interactive(book: AddressBook):
 
                 old_phone = record.phones[index - 1].value
                 while True:
-                    new_phone = input(
+                    new_phone = ask(
                         "Enter new phone number (or 'esc' to cancel): "
                     ).strip()
                     if new_phone.lower() == "esc":
@@ -172,7 +203,7 @@ def change_contact_interactive(book: AddressBook):
         old = record.email.value
         print(f"Current email: {old}")
         while True:
-            new_email = input("Enter new email (or 'esc' to cancel): ").strip()
+            new_email = ask("Enter new email (or 'esc' to cancel): ").strip()
 
             if new_email.lower() == "esc":
                 return "Email change cancelled."
@@ -190,7 +221,7 @@ def change_contact_interactive(book: AddressBook):
         old = record.birthday.value.strftime("%d.%m.%Y")
         print(f"Current birthday: {old}")
         while True:
-            new_birthday = input("Enter new birthday (or 'esc' to cancel): ").strip()
+            new_birthday = ask("Enter new birthday (or 'esc' to cancel): ").strip()
 
             if new_birthday.lower() == "esc":
                 return "Birthday change cancelled."
@@ -206,7 +237,7 @@ def change_contact_interactive(book: AddressBook):
             return "No address found for this contact. Use the 'add-address' command to add one"
         old = record.address.value
         print(f"Current address: {old}")
-        new_address = input("Enter new address (or 'esc' to cancel): ").strip()
+        new_address = ask("Enter new address (or 'esc' to cancel): ").strip()
         if new_address.lower() == "esc":
             return "Address change cancelled."
         record.set_address(new_address)
@@ -215,7 +246,7 @@ def change_contact_interactive(book: AddressBook):
     elif field == "name":
         old = record.name.value
         print(f"Current name: {old}")
-        new_name = input("Enter new name (or 'esc' to cancel): ").strip()
+        new_name = ask("Enter new name (or 'esc' to cancel): ").strip()
         if new_name.lower() == "esc":
             return "Name change cancelled."
 
@@ -235,10 +266,10 @@ def change_contact_interactive(book: AddressBook):
 
 @input_error
 def show_phone_interactive(book):
-    name = input("Enter the name of the contact: ").strip()
+    name = ask("Enter the name of the contact: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     if not record.phones:
         return f"No phone numbers found for {name.capitalize()}."
@@ -250,16 +281,16 @@ def show_phone_interactive(book):
 @input_error
 @autosave
 def add_birthday_interactive(book):
-    name = input("Enter the name of the contact: ").strip()
+    name = ask("Enter the name of the contact: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     if record.birthday:
         return "This contact already has a bitrthday. To change it, use the 'change' command."
 
     while True:
-        date_str = input("Enter birthday (DD.MM.YYYY): ").strip()
+        date_str = ask("Enter birthday (DD.MM.YYYY): ").strip()
         if not date_str:
             return "Birthday is required."
         try:
@@ -271,10 +302,10 @@ def add_birthday_interactive(book):
 
 @input_error
 def show_birthday_interactive(book):
-    name = input("Enter the name of the contact: ").strip()
+    name = ask("Enter the name of the contact: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     if not record.birthday:
         return f"Birthday for {name} is not set."
@@ -286,7 +317,7 @@ def show_birthday_interactive(book):
 @input_error
 def birthdays_interactive(book):
     try:
-        days_str = input(
+        days_str = ask(
             "Enter number of days to look ahead for birthdays (default is 7): "
         ).strip()
         days = int(days_str) if days_str else 7
@@ -295,26 +326,27 @@ def birthdays_interactive(book):
     except ValueError:
         return "Please enter a valid non-negative integer for days."
 
-    upcoming = book.get_upcoming_birthdays(days)
-    if not upcoming:
+    lines = (
+        f"• {user['name']} - 🎂 {user['congratulation_date']}"
+        for user in book.snapshot().iter_upcoming_birthdays(days)
+    )
+    first = next(lines, None)
+    if first is None:
         return f"There are no upcoming birthdays in the next {days} day(s)."
 
-    result = f"Upcoming birthdays within {days} day(s):\n"
-    for user in upcoming:
-        result += f"• {user['name']} - 🎂 {user['congratulation_date']}\n"
-    return result.strip()
+    return "\n".join([f"Upcoming birthdays within {days} day(s):", first, *lines])
 
 
 @input_error
 @autosave
 def add_phone_interactive(book):
-    name = input("Enter the contact name: ").strip()
+    name = ask("Enter the contact name: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     while True:
-        phone = input("Enter the new phone number (or press Enter to cancel): ").strip()
+        phone = ask("Enter the new phone number (or press Enter to cancel): ").strip()
         if not phone:
             return "Phone number not provided."
         try:
@@ -327,10 +359,10 @@ def add_phone_interactive(book):
 @input_error
 @autosave
 def add_email_interactive(book):
-    name = input("Enter the name of the contact: ").strip()
+    name = ask("Enter the name of the contact: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     if record.email:
         return (
@@ -338,7 +370,7 @@ def add_email_interactive(book):
         )
 
     while True:
-        email = input("Enter email address: ").strip()
+        email = ask("Enter email address: ").strip()
         if not email:
             return "Email is required."
         try:
@@ -351,16 +383,16 @@ def add_email_interactive(book):
 @input_error
 @autosave
 def add_address_interactive(book):
-    name = input("Enter the name of the contact: ").strip()
+    name = ask("Enter the name of the contact: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     if record.address:
         return "This contact already has an address. To change it, use the 'change' command."
 
     while True:
-        address = input("Enter address: ").strip()
+        address = ask("Enter address: ").strip()
         if not address:
             print("Address cannot be empty.")
             continue
@@ -374,17 +406,17 @@ def add_address_interactive(book):
 @input_error
 @autosave
 def delete_contact_interactive(book):
-    name = input("Enter the name of the contact to delete: ").strip()
+    name = ask("Enter the name of the contact to delete: ").strip()
     record = book.get_record(name)
     if not record:
-        return "Contact was not found."
+        return _not_found(book, name)
 
     print("\nHere is the contact info:")
     print(record.get_info())
 
     while True:
         confirm = (
-            input(f"Are you sure you want to delete '{name.capitalize()}'? (y/n): ")
+            ask(f"Are you sure you want to delete '{name.capitalize()}'? (y/n): ")
             .strip()
             .lower()
         )
@@ -404,38 +436,65 @@ def find_contact_interactive(book):
     The user enters a keyword, and the program displays matching contacts.
     """
     query = (
-        input("Enter a keyword to search (name, phone, email, or address): ")
+        ask("Enter a keyword to search (name, phone, email, or address): ")
         .strip()
         .lower()
     )
     if not query:
         return "Search query cannot be empty."
 
-    matches = []
-    for record in book.values():
-        if query in record.name.value.lower():
-            matches.append(record)
-        elif any(query in phone.value.lower() for phone in record.phones):
-            matches.append(record)
-        elif record.email and query in record.email.value.lower():
-            matches.append(record)
-        elif record.address and query in record.address.value.lower():
-            matches.append(record)
+    contacts = book.snapshot()
+    matches = contacts.search(query)
+    if not matches:
+        similar = book.find_similar(query)
+        if not similar:
+            return "No contacts matched your search."
+        return "No exact matches. Did you mean:\n" + format_contacts(
+            {r.name.value: r for r in similar}
+        )
 
+    cache = (contacts.cache_key("find", query), contacts.generation())
+    return page_contacts(matches, total=len(matches), cache=cache)
+
+
+@input_error
+def lookup_contact_interactive(book):
+    """Reverse lookup: who owns this phone number or email address?"""
+    value = ask("Enter a phone number or email: ").strip()
+    if not value:
+        return "Phone number or email is required."
+
+    if "@" in value:
+        matches = book.find_by_email(value)
+    else:
+        matches = book.find_by_phone(value)
     if not matches:
-        return "No contacts matched your search."
+        return f"Nobody has {value}."
 
     return format_contacts({r.name.value: r for r in matches})
 
 
+@input_error
+def duplicate_phones_interactive(book):
+    duplicates = book.snapshot().duplicate_phones()
+    if not duplicates:
+        return "No phone number is shared by several contacts."
+
+    lines = []
+    for phone, records in sorted(duplicates.items()):
+        names = ", ".join(record.name.value for record in records)
+        lines.append(f"{phone}: {names}")
+    return "\n".join(lines)
+
+
 @input_error
 @autosave
 def add_note_interactive(notebook):
-    text = input("Enter the note text: ").strip()
+    text = ask("Enter the note text: ").strip()
     if not text:
         return "Note text cannot be empty."
 
-    tags_input = input("Enter tags (comma-separated, or press Enter to skip): ").strip()
+    tags_input = ask("Enter tags (comma-separated, or press Enter to skip): ").strip()
     tags = (
         [tag.strip() for tag in tags_input.split(",") if tag.strip()]
         if tags_input
@@ -450,35 +509,82 @@ def add_note_interactive(notebook):
 
 @input_error
 def find_note_interactive(notebook):
-    query = input("Enter a search keyword (text or tag): ").strip()
-    results = notebook.search_notes(query)
-    if not results:
+    query = ask('Enter search words (text or tag; "exact phrase", prefix*): ').strip()
+    if not query:
+        return "Search query cannot be empty."
+
+    return results.cached(
+        notebook.cache_key("find-note", query),
+        notebook.generation(),
+        lambda: _find_notes(notebook, query),
+    )
+
+
+def _find_notes(notebook, query):
+    ranked = notebook.search_ranked(query, limit=FIND_NOTE_LIMIT)
+    if ranked:
+        return format_notes_list([(key, note) for key, note, _ in ranked])
+
+    # Nothing matched whole words - fall back to a plain substring search
+    found = notebook.search_notes(query)
+    if not found:
         return "No notes matched your search."
 
-    return format_notes_list(list(results.items()))
+    return format_notes_list(list(found.items())[:FIND_NOTE_LIMIT])
+
+
+@input_error
+def find_notes_by_tags_interactive(notebook):
+    tags_input = ask("Enter tags (comma-separated): ").strip()
+    tags = [tag.strip() for tag in tags_input.split(",") if tag.strip()]
+    if not tags:
+        return "At least one tag is required."
+
+    mode = "all"
+    if len(tags) > 1:
+        mode = (
+            ask("Match all tags or any of them? (all/any, default is all): ")
+            .strip()
+            .lower()
+            or "all"
+        )
+        if mode not in ("all", "any"):
+            return "Please enter 'all' or 'any'."
+
+    notes = notebook.find_by_tags(tags, match_all=mode == "all")
+    if not notes:
+        return "No notes matched these tags."
+
+    return format_notes_list(notes)
 
 
 @input_error
 def sort_notes_by_tag_interactive(notebook):
-    tag = input("Enter a tag to sort notes by: ").strip()
-    sorted_notes = notebook.sort_notes_by_tag(tag)
+    tag = ask("Enter a tag to sort notes by: ").strip()
+    notes = notebook.snapshot()
+    sorted_notes = notes.sort_notes_by_tag(tag)
     if not sorted_notes:
         return "No notes to show."
 
-    return format_notes_list(sorted_notes)
+    cache = (notes.cache_key("sort-note", tag), notes.generation())
+    # every note is listed, so the notebook's widths fit
+    return page_notes(
+        sorted_notes,
+        total=len(sorted_notes),
+        cache=cache,
+        widths=notes.column_widths(),
+    )
 
 
 @input_error
 @autosave
 def edit_note_interactive(notebook):
-    key = input("Enter the note id of the note to edit: ").strip()
+    key = ask("Enter the note id of the note to edit: ").strip()
     if key not in notebook.data:
         return f"Note '{key}' not found."
 
-    new_text = input(
-        "Enter new text (Press 'Enter' for skip and keep current): "
-    ).strip()
-    tags_input = input(
+    new_text = ask("Enter new text (Press 'Enter' for skip and keep current): ").strip()
+    tags_input = ask(
         "Enter new tags (comma-separated, Press 'Enter' for skip and keep current): "
     ).strip()
     new_tags = [t.strip() for t in tags_input.split(",")] if tags_input else None
@@ -490,6 +596,93 @@ def edit_note_interactive(notebook):
 @input_error
 @autosave
 def delete_note_interactive(notebook):
-    key = input("Enter the ID of the note to delete: ").strip()
+    key = ask("Enter the ID of the note to delete: ").strip()
     notebook.delete_note(key)
     return f"Note '{key}' deleted successfully."
+
+
+def _ask_kind(action):
+    kind = (
+        ask(f"What to {action}? (contacts/notes, default is contacts): ")
+        .strip()
+        .lower()
+        or "contacts"
+    )
+    if kind not in ("contacts", "notes"):
+        raise ValueError("Please enter 'contacts' or 'notes'.")
+    return kind
+
+
+@input_error
+def import_interactive(book, notebook):
+    from transfer import import_contacts, import_notes, errors_path
+
+    kind = _ask_kind("import")
+    path = ask("Enter the file path (.csv, .jsonl, .vcf or .md for notes): ").strip()
+    if not os.path.isfile(path):
+        return f"File '{path}' was not found."
+
+    if kind == "contacts":
+        imported, rejected = import_contacts(book, path)
+    else:
+        imported, rejected = import_notes(notebook, path)
+    result = f"Imported {imported} {kind}."
+    if rejected:
+        result += f" {rejected} rows were rejected, see {errors_path(path)}"
+    return result
+
+
+@input_error
+def export_interactive(book, notebook):
+    from transfer import export_contacts, export_notes
+
+    kind = _ask_kind("export")
+    path = ask("Enter the file path (.csv, .jsonl, .vcf or .md for notes): ").strip()
+    if not path:
+        return "File path is required."
+
+    if kind == "contacts":
+        count = export_contacts(book, path)
+    else:
+        count = export_notes(notebook, path)
+    return f"Exported {count} {kind} to {path}."
+
+
+@input_error
+def stats_interactive():
+    from config import METRICS_ENABLED
+    from metrics import metrics, write_metrics
+
+    if not METRICS_ENABLED:
+        return "Metrics are turned off (ASSISTANT_METRICS=0)."
+    print(format_stats(metrics.to_dict()))
+    path = ask(
+        "Export to a file (.prom for Prometheus, .json) or press Enter to skip: "
+    ).strip()
+    if not path:
+        return "Statistics since the start of the session."
+    write_metrics(path)
+    return f"Metrics written to {path}."
+
+
+@input_error
+def profile_interactive():
+    from commands import get_command
+    from config import METRICS_ENABLED, PROFILE_DIR
+    from metrics import metrics, set_profile
+
+    if not METRICS_ENABLED:
+        return "Profiling needs metrics, which are turned off (ASSISTANT_METRICS=0)."
+    if metrics.profiles:
+        print(
+            "Profiled now: "
+            + ", ".join(f"{name} ({mode})" for name, mode in metrics.profiles.items())
+        )
+    command = ask("Enter the command to profile: ").strip().lower()
+    if get_command(command) is None:
+        return f"Unknown command '{command}'."
+    mode = ask("Mode (cpu, memory or off, default is cpu): ").strip().lower() or "cpu"
+    set_profile(command, None if mode == "off" else mode)
+    if mode == "off":
+        return f"Profiling of '{command}' is off."
+    return f"'{command}' will be profiled ({mode}); reports go to {PROFILE_DIR}/."
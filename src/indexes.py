@@ -0,0 +1,454 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+
+# Sorts after any real key, used as an inclusive upper bound in bisect
+MAX_KEY = chr(0x10FFFF)
+
+
+class NgramIndex:
+    """
+    Inverted n-gram index for case-insensitive substring search.
+
+    Every key owns a list of texts (already lowercased by the caller),
+    kept joined by SEPARATOR, and a number in the order it was first
+    indexed. Every substring of 1 to ``n`` characters of a text has a
+    posting: a sorted array of the numbers of the keys that contain it.
+    A query is answered from the smallest posting among its n-grams (the
+    query itself when it is at most ``n`` characters long), checking each
+    key in it with a plain ``in`` test, so results match a full linear
+    scan exactly and come out in key order without sorting.
+
+    Postings only grow: a removed key and an n-gram a key no longer has
+    stay behind as stale entries, which the ``in`` test skips, until they
+    outnumber the live ones and the postings are compacted.
+    """
+
+    SEPARATOR = "\x00"
+
+    def __init__(self, n=3):
+        self.n = n
+        self._postings = {}  # n-gram -> array of key numbers, ascending
+        self._numbers = {}  # key -> number
+        self._keys = []  # number -> key (None once removed)
+        self._texts = []  # number -> joined texts ("" once removed)
+        self._live = 0  # posting entries of the current texts
+        self._stale = 0
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, key):
+        return key in self._numbers
+
+    def _grams(self, texts):
+        n = self.n
+        return {
+            text[i : i + size]
+            for text in texts
+            for size in range(1, n + 1)
+            for i in range(len(text) - size + 1)
+        }
+
+    def add(self, key, texts):
+        """Indexes ``key``; re-adding an existing key keeps its position."""
+        postings = self._postings
+        new_grams = self._grams(texts)
+        number = self._numbers.get(key)
+        if number is None:
+            number = self._numbers[key] = len(self._keys)
+            self._keys.append(key)
+            self._texts.append(self.SEPARATOR.join(texts))
+            # the newest number sorts last: appending keeps postings sorted
+            for gram in new_grams:
+                numbers = postings.get(gram)
+                if numbers is None:
+                    postings[gram] = array("I", (number,))
+                else:
+                    numbers.append(number)
+            self._live += len(new_grams)
+            return
+
+        old_grams = self._grams(self._texts[number].split(self.SEPARATOR))
+        self._texts[number] = self.SEPARATOR.join(texts)
+        for gram in new_grams - old_grams:
+            numbers = postings.get(gram)
+            if numbers is None:
+                postings[gram] = array("I", (number,))
+                continue
+            # the number may still be there from an earlier text
+            i = bisect_left(numbers, number)
+            if i == len(numbers) or numbers[i] != number:
+                numbers.insert(i, number)
+        lost = len(old_grams - new_grams)
+        self._live += len(new_grams) - len(old_grams)
+        self._stale += lost
+        self._compact_if_stale()
+
+    def remove(self, key):
+        number = self._numbers.pop(key, None)
+        if number is None:
+            return
+        grams = len(self._grams(self._texts[number].split(self.SEPARATOR)))
+        self._keys[number] = None
+        self._texts[number] = ""
+        self._live -= grams
+        self._stale += grams
+        self._compact_if_stale()
+
+    def _compact_if_stale(self):
+        if self._stale > max(self._live, 1 << 16):
+            self._compact()
+
+    def _compact(self):
+        """Drops the stale posting entries and renumbers the live keys."""
+        texts = self._texts
+        renumber = {}
+        for number, key in enumerate(self._keys):
+            if key is not None:
+                renumber[number] = self._numbers[key] = len(renumber)
+        postings = {}
+        for gram, numbers in self._postings.items():
+            # n-grams never span SEPARATOR, so the joined text can be tested
+            kept = array(
+                "I", (renumber[number] for number in numbers if gram in texts[number])
+            )
+            if kept:
+                postings[gram] = kept
+        self._postings = postings
+        self._keys = [key for key in self._keys if key is not None]
+        self._texts = [texts[number] for number in renumber]
+        self._stale = 0
+
+    def search(self, query):
+        query = query.lower()
+        if not query:
+            return list(self._numbers)
+        if self.SEPARATOR in query:
+            return []
+        n = self.n
+        smallest = None
+        for gram in {query[i : i + n] for i in range(max(len(query) - n, 0) + 1)}:
+            numbers = self._postings.get(gram)
+            if numbers is None:
+                return []
+            if smallest is None or len(numbers) < len(smallest):
+                smallest = numbers
+        keys, texts = self._keys, self._texts
+        return [keys[number] for number in smallest if query in texts[number]]
+
+
+class BirthdayIndex:
+    """
+    Keys sorted by (month, day) of their birthday.
+
+    A window of upcoming days maps to at most two contiguous slices of
+    the sorted list (two when it wraps past New Year), found with bisect;
+    see models.birthday_ranges.
+    """
+
+    def __init__(self):
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, birthday):
+        insort(self._entries, (birthday.month, birthday.day, key))
+
+    def remove(self, key, birthday):
+        entry = (birthday.month, birthday.day, key)
+        i = bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def iter_range(self, start, end):
+        """Yields keys with start <= (month, day) <= end."""
+        entries = self._entries
+        lo = bisect_left(entries, start)
+        hi = bisect_right(entries, end + (MAX_KEY,))
+        for i in range(lo, hi):
+            yield entries[i][2]
+
+
+class TagIndex:
+    """
+    Case-folded tag -> keys posting index.
+
+    Keys remember the order in which they were added so that lookups can
+    return them in the same order as the underlying dict.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._order = {}
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._order)
+
+    @staticmethod
+    def _fold(tags):
+        return {tag.casefold() for tag in tags}
+
+    def add(self, key, tags):
+        self._order[key] = next(self._counter)
+        for tag in self._fold(tags):
+            self._postings.setdefault(tag, set()).add(key)
+
+    def remove(self, key, tags):
+        self._order.pop(key, None)
+        self._discard(key, self._fold(tags))
+
+    def retag(self, key, old_tags, new_tags):
+        old, new = self._fold(old_tags), self._fold(new_tags)
+        self._discard(key, old - new)
+        for tag in new - old:
+            self._postings.setdefault(tag, set()).add(key)
+
+    def _discard(self, key, tags):
+        for tag in tags:
+            keys = self._postings.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[tag]
+
+    def tags(self):
+        return self._postings.keys()
+
+    def _ordered(self, keys):
+        return sorted(keys, key=self._order.__getitem__)
+
+    def lookup(self, tag):
+        """Keys carrying exactly this tag (case-insensitive), in insertion order."""
+        return self._ordered(self._postings.get(tag.casefold(), ()))
+
+    def lookup_all(self, tags):
+        """Keys carrying every one of the tags."""
+        postings = [self._postings.get(tag, set()) for tag in self._fold(tags)]
+        if not postings:
+            return []
+        postings.sort(key=len)
+        return self._ordered(postings[0].intersection(*postings[1:]))
+
+    def lookup_any(self, tags):
+        """Keys carrying at least one of the tags."""
+        keys = set()
+        for tag in self._fold(tags):
+            keys.update(self._postings.get(tag, ()))
+        return self._ordered(keys)
+
+    def lookup_substring(self, query):
+        """Keys with a tag containing the query, scanning distinct tags only."""
+        query = query.casefold()
+        keys = set()
+        for tag, tagged in self._postings.items():
+            if query in tag:
+                keys.update(tagged)
+        return keys
+
+
+class ValueIndex:
+    """
+    Exact-match hash index: normalized value -> keys that have it.
+
+    Callers normalize values themselves (normalized phone, case-folded
+    email). Values owned by more than one key are tracked as they come
+    and go, so duplicates can be listed without a scan.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._shared = set()
+
+    def __len__(self):
+        return len(self._postings)
+
+    def add(self, value, key):
+        # key -> how many times the key has the value (e.g. the same phone
+        # written in two different ways)
+        keys = self._postings.setdefault(value, {})
+        keys[key] = keys.get(key, 0) + 1
+        if len(keys) > 1:
+            self._shared.add(value)
+
+    def remove(self, value, key):
+        keys = self._postings.get(value)
+        if keys is None or key not in keys:
+            return
+        keys[key] -= 1
+        if not keys[key]:
+            del keys[key]
+        if len(keys) < 2:
+            self._shared.discard(value)
+        if not keys:
+            del self._postings[value]
+
+    def lookup(self, value):
+        """Keys having the value, in the order they got it."""
+        return list(self._postings.get(value, ()))
+
+    def duplicates(self):
+        """{value: keys} for values shared by several keys."""
+        return {value: list(self._postings[value]) for value in self._shared}
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Optimal string alignment distance: insertions, deletions, substitutions
+    and swaps of two adjacent characters each cost 1. With `limit`, stops
+    early and returns limit + 1 once the distance is known to exceed it.
+    """
+    if a == b:
+        return 0
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant lookup of keys (SymSpell-style deletes).
+
+    A key within ``max_distance`` edits of the query shares a delete
+    (the string left after removing up to ``max_distance`` characters)
+    with the query both in its first and in its last ``affix_length``
+    characters. Each key is therefore indexed twice: under the deletes
+    of its head and under those of its tail. A lookup generates the query's deletes,
+    takes the keys behind whichever side is more selective (names share
+    first names far more often than whole heads and tails) and checks
+    only those with edit_distance.
+    """
+
+    def __init__(self, max_distance=1, affix_length=6):
+        self.max_distance = max_distance
+        self.affix_length = affix_length
+        # delete -> key, or a set of keys once several keys share it
+        self._heads = {}
+        self._tails = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _deletes(self, word):
+        deletes = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+            deletes |= frontier
+        return deletes
+
+    def _affixes(self, key):
+        n = self.affix_length
+        return (
+            (self._heads, self._deletes(key[:n])),
+            (self._tails, self._deletes(key[-n:])),
+        )
+
+    def add(self, key):
+        for postings, deletes in self._affixes(key):
+            for delete in deletes:
+                keys = postings.get(delete)
+                if keys is None:
+                    postings[delete] = key
+                elif isinstance(keys, set):
+                    keys.add(key)
+                elif keys != key:
+                    postings[delete] = {keys, key}
+        self._count += 1
+
+    def remove(self, key):
+        for postings, deletes in self._affixes(key):
+            for delete in deletes:
+                keys = postings.get(delete)
+                if keys == key:
+                    del postings[delete]
+                elif isinstance(keys, set):
+                    keys.discard(key)
+                    if len(keys) == 1:
+                        postings[delete] = next(iter(keys))
+        self._count -= 1
+
+    def lookup(self, query, limit=5):
+        """Keys within max_distance of the query, closest first (then alphabetically)."""
+        sides = []
+        for postings, deletes in self._affixes(query):
+            found = [postings[d] for d in deletes if d in postings]
+            size = sum(len(keys) if isinstance(keys, set) else 1 for keys in found)
+            sides.append((size, found))
+        _, found = min(sides, key=lambda side: side[0])
+
+        candidates = set()
+        for keys in found:
+            if isinstance(keys, set):
+                candidates.update(keys)
+            else:
+                candidates.add(keys)
+
+        matches = []
+        for key in candidates:
+            distance = edit_distance(query, key, self.max_distance)
+            if distance <= self.max_distance:
+                matches.append((distance, key))
+        matches.sort()
+        return [key for _, key in matches[:limit]]
+
+
+def text_width(text):
+    """Width of a table cell: its longest line."""
+    if "\n" not in text:
+        return len(text)
+    return max(len(line) for line in text.split("\n"))
+
+
+class WidthIndex:
+    """
+    Column widths of a table with one row per key.
+
+    Counts how many rows have each width in each column, so the widest
+    cell is known without a pass over the rows, and a changed row only
+    moves its own counts.
+    """
+
+    def __init__(self, columns):
+        self._counts = [{} for _ in range(columns)]
+        self._rows = {}  # key -> widths of its row
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, key, row):
+        """Indexes the cells of `row` under `key`, replacing its old row."""
+        self.remove(key)
+        widths = tuple(text_width(cell) for cell in row)
+        self._rows[key] = widths
+        for counts, width in zip(self._counts, widths):
+            counts[width] = counts.get(width, 0) + 1
+
+    def remove(self, key):
+        widths = self._rows.pop(key, None)
+        if widths is None:
+            return
+        for counts, width in zip(self._counts, widths):
+            counts[width] -= 1
+            if not counts[width]:
+                del counts[width]
+
+    def widths(self):
+        """Widest cell of every column (0 for an empty table)."""
+        return [max(counts, default=0) for counts in self._counts]
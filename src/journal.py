@@ -0,0 +1,168 @@
+import json
+import os
+from models import AddressBook, NoteBook, Record, Note
+
+
+RECORD_OPS = (
+    "set_name",
+    "add_phone",
+    "edit_phone",
+    "remove_phone",
+    "set_email",
+    "remove_email",
+    "set_birthday",
+    "set_address",
+)
+
+
+def journal_path(filename):
+    """addressbook.bin -> addressbook.journal"""
+    return os.path.splitext(filename)[0] + ".journal"
+
+
+def _encode_contact_op(op, record, *args):
+    if op == "add_record":
+        return {"op": op, "record": record.to_dict()}
+    if op == "remove_record":
+        return {"op": op, "key": record.name.value.lower()}
+    if op == "set_name":
+        return {"op": op, "key": args[0].lower(), "args": [record.name.value]}
+    if op == "add_phone":
+        return {"op": op, "key": record.name.value.lower(), "args": [args[0]]}
+    if op == "edit_phone":
+        return {"op": op, "key": record.name.value.lower(), "args": list(args[:2])}
+    if op == "remove_phone":
+        return {"op": op, "key": record.name.value.lower(), "args": [args[0]]}
+    if op == "remove_email":
+        return {"op": op, "key": record.name.value.lower(), "args": []}
+    # set_email / set_birthday / set_address: the new value lives on the record
+    field = getattr(record, op[len("set_") :])
+    return {"op": op, "key": record.name.value.lower(), "args": [str(field)]}
+
+
+def _encode_note_op(op, key, note, *args):
+    if op == "add_note":
+        return {
+            "op": op,
+            "key": key,
+            "note": note.to_dict(),
+            "counter": note._book.counter,
+        }
+    if op == "edit_note":
+        return {"op": op, "key": key, "note": note.to_dict()}
+    return {"op": op, "key": key}
+
+
+def apply_entry(book, entry):
+    """Re-applies a single journal entry to an AddressBook or NoteBook."""
+    op = entry["op"]
+    if isinstance(book, NoteBook):
+        if op == "add_note":
+            book.add_note(entry["key"], Note.from_dict(entry["note"]))
+            book.counter = max(book.counter, entry.get("counter", 1))
+        elif op == "edit_note":
+            book.edit_note(entry["key"], entry["note"]["text"], entry["note"]["tags"])
+        elif op == "delete_note":
+            book.delete_note(entry["key"])
+        return
+
+    if op == "add_record":
+        book.add_record(Record.from_dict(entry["record"]))
+    elif op == "remove_record":
+        book.remove_record(entry["key"])
+    elif op in RECORD_OPS:
+        record = book.get_record(entry["key"])
+        if record is None:
+            raise KeyError(entry["key"])
+        getattr(record, op)(*entry.get("args", []))
+
+
+class Journal:
+    """
+    Append-only log of changes made to a book.
+
+    Every change is written as one JSON line and fsync'ed before the
+    call that made it returns, so a crash loses at most the operation
+    that was in flight. Each entry carries a sequence number; the
+    snapshot remembers the last sequence folded into it (``_journal_seq``),
+    so entries that survive an interrupted compaction are skipped on replay.
+    """
+
+    def __init__(self, book, snapshot_path):
+        self.book = book
+        self.snapshot_path = snapshot_path
+        self.path = journal_path(snapshot_path)
+        self.seq = getattr(book, "_journal_seq", 0)
+        self.pending = 0
+        self._file = None
+
+    def replay(self):
+        """Applies entries newer than the snapshot and cuts off a torn tail."""
+        if not os.path.exists(self.path):
+            return 0
+        applied = 0
+        valid_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_end += len(line)
+                if entry["seq"] <= self.seq:
+                    continue
+                try:
+                    apply_entry(self.book, entry)
+                except (KeyError, ValueError):
+                    pass
+                self.seq = entry["seq"]
+                self.pending += 1
+                applied += 1
+        if valid_end != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        self.book._journal_seq = self.seq
+        return applied
+
+    def attach(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.book.subscribe(self)
+
+    def detach(self):
+        self.book.unsubscribe(self)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __call__(self, op, *args):
+        if isinstance(self.book, AddressBook):
+            entry = _encode_contact_op(op, *args)
+        else:
+            entry = _encode_note_op(op, *args)
+        self.append(entry)
+
+    def append(self, entry):
+        self.seq += 1
+        entry["seq"] = self.seq
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending += 1
+        self.book._journal_seq = self.seq
+
+    def reset(self):
+        """Drops all entries once they have been folded into a snapshot."""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending = 0
+
+
+def find_journal(book):
+    for listener in getattr(book, "_listeners", []):
+        if isinstance(listener, Journal):
+            return listener
+    return None
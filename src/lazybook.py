@@ -0,0 +1,238 @@
+"""
+On-disk layout of a lazily loaded address book (addressbook.dat):
+
+    header   magic b"ABLZ", format version (u16), record codec version
+             (u16), index offset (u64), index length (u64)  little-endian
+    records  one contact per record, back to back, each encoded as a
+             one-record contacts block of binformat (that module's
+             VERSION is the codec version)
+    index    a string table of lowercased names, in the book's
+             iteration order, then the offset (u64) and length (u32)
+             columns of their records, as in binformat
+
+The file is memory-mapped; only the index is decoded at startup.
+Version 1 files (pickled records and index) are rewritten in the
+current format when they are opened.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from binformat import (
+    VERSION as CODEC_VERSION,
+    _StringTable,
+    _decode_contacts,
+    _encode_contacts,
+    _pack_array,
+    _unpack_array,
+    _unpack_table,
+)
+from models import AddressBook
+
+MAGIC = b"ABLZ"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQQ")
+HEADER_V1 = struct.Struct("<4sHQQ")
+
+
+def _encode_index(index):
+    table = _StringTable()
+    for key in index:
+        table.ref(key)
+    return b"".join(
+        [
+            table.pack(),
+            _pack_array("Q", [offset for offset, _ in index.values()]),
+            _pack_array("I", [length for _, length in index.values()]),
+        ]
+    )
+
+
+def _decode_index(buf):
+    keys, pos = _unpack_table(buf, 0)
+    offsets, pos = _unpack_array("Q", buf, pos)
+    lengths, pos = _unpack_array("I", buf, pos)
+    return dict(zip(keys, zip(offsets, lengths)))
+
+
+def write_lazy_book(book, filename):
+    """Writes any AddressBook in the lazy format, atomically."""
+    data = book.data
+    tmp_name = filename + ".tmp"
+    index = {}
+    with open(tmp_name, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        offset = HEADER.size
+        for key in data:
+            blob = data.raw(key) if isinstance(data, LazyRecordMap) else None
+            if blob is None:
+                blob = _encode_contacts([data[key]])
+            f.write(blob)
+            index[key] = (offset, len(blob))
+            offset += len(blob)
+        index_blob = _encode_index(index)
+        f.write(index_blob)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, CODEC_VERSION, offset, len(index_blob)))
+        f.flush()
+        os.fsync(f.fileno())
+    if isinstance(data, LazyRecordMap):
+        data.close()
+    os.replace(tmp_name, filename)
+
+
+def _upgrade(filename):
+    """Rewrites a version 1 file, if it is one, in the current format."""
+    with open(filename, "rb") as f:
+        header = f.read(HEADER_V1.size)
+        if len(header) < HEADER_V1.size:
+            return
+        magic, version, index_offset, index_length = HEADER_V1.unpack(header)
+        if magic != MAGIC or version != 1:
+            return
+        f.seek(index_offset)
+        index = pickle.loads(f.read(index_length))
+        book = AddressBook()
+        for key, (offset, length) in index.items():
+            f.seek(offset)
+            book.data[key] = pickle.loads(f.read(length))
+    write_lazy_book(book, filename)
+
+
+class LazyRecordMap(MutableMapping):
+    """
+    Mapping of lowercased name -> Record backed by a memory-mapped file.
+
+    Records are decoded on first access and kept in a bounded LRU cache.
+    Records that were added or changed since the file was written are
+    pinned in memory until the next save, so evicting never loses edits.
+    """
+
+    def __init__(self, owner, filename, cache_size=1024):
+        self._owner = owner
+        self.filename = filename
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pinned = {}
+        self.dirty = False
+        self._file = None
+        self._mm = None
+        self._open()
+
+    def _open(self):
+        self._file = open(self.filename, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, codec, index_offset, index_length = HEADER.unpack_from(
+            self._mm, 0
+        )
+        if magic != MAGIC or version != VERSION or codec > CODEC_VERSION:
+            raise ValueError(f"{self.filename} is not a supported address book file")
+        self._codec = codec
+        # key -> (offset, length) in the file, or None for records added since
+        self._keys = _decode_index(self._mm[index_offset : index_offset + index_length])
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+
+    def reopen(self):
+        """Re-reads the index after a save; pinned records become cached ones."""
+        self.close()
+        self._open()
+        for key, record in self._pinned.items():
+            self._remember(key, record)
+        self._pinned.clear()
+        self.dirty = False
+
+    def raw(self, key):
+        """Encoded bytes of an unchanged record, or None if it must be re-encoded."""
+        location = self._keys[key]
+        if location is None or key in self._pinned or self._codec != CODEC_VERSION:
+            return None
+        offset, length = location
+        return self._mm[offset : offset + length]
+
+    def _remember(self, key, record):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def pin(self, key, record):
+        self._cache.pop(key, None)
+        self._pinned[key] = record
+        self.dirty = True
+
+    def __getitem__(self, key):
+        record = self._pinned.get(key)
+        if record is not None:
+            return record
+        record = self._cache.get(key)
+        if record is not None:
+            self._cache.move_to_end(key)
+            return record
+        offset, length = self._keys[key]
+        (record,) = _decode_contacts(self._mm[offset : offset + length], self._codec)
+        record._book = self._owner
+        self._remember(key, record)
+        return record
+
+    def __setitem__(self, key, record):
+        self._keys.pop(key, None)
+        self._keys[key] = None
+        self.pin(key, record)
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self._pinned.pop(key, None)
+        self._cache.pop(key, None)
+        self.dirty = True
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class LazyAddressBook(AddressBook):
+    """AddressBook whose records are read from disk only when they are touched."""
+
+    def __init__(self, filename, cache_size=1024):
+        super().__init__()
+        _upgrade(filename)
+        self.data = LazyRecordMap(self, filename, cache_size)
+
+    def _record_changed(self, record, op, *args):
+        if op == "set_name":
+            self.data.pin(args[0].lower(), record)
+        else:
+            self.data.pin(record.name.value.lower(), record)
+        super()._record_changed(record, op, *args)
+
+    def snapshot(self):
+        # records are not kept in a dict that could be shared
+        return self
+
+    def column_widths(self):
+        # would read every record; the tables sample their first page instead
+        return None
+
+    def save(self):
+        """Rewrites the file if anything changed; returns the number of bytes written."""
+        if not self.data.dirty:
+            return 0
+        write_lazy_book(self, self.data.filename)
+        self.data.reopen()
+        return os.path.getsize(self.data.filename)
+
+    def __reduce__(self):
+        raise TypeError("LazyAddressBook is saved with save(), not pickled")
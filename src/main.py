@@ -1,15 +1,150 @@
-from commands import COMMANDS, show_help, greet, suggest_command, show_commands_table
-from models import AddressBook, NoteBook
-from utils import parse_input
-from storage import save_data, load_data, load_notebook
+import sys
+from commands import get_command, greet, suggest_command, show_commands_table
+from utils import answering, parse_input
 from colorama import Fore, Style, init
 
-init(autoreset=True)
 
+def parse_args(argv=None):
+    import argparse
 
-def main():
-    book = load_data()
-    notebook = load_notebook()
+    parser = argparse.ArgumentParser(description="Personal assistant bot")
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="run the commands from a JSON Lines file instead of the interactive loop",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="ADDRESS",
+        help="serve one shared book to many clients on HOST:PORT or unix:PATH",
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        help="run a single command and exit, without the greeting and the table",
+    )
+    parser.add_argument(
+        "args",
+        nargs=argparse.REMAINDER,
+        help="answers to the command's prompts, in order (e.g. find mira)",
+    )
+    return parser.parse_args(argv)
+
+
+class Books:
+    """
+    The address book and the notebook, each loaded from storage the first
+    time a command needs it and then watched by the saver. Later commands
+    get it refreshed with what other processes have saved meanwhile.
+    """
+
+    def __init__(self, saver=None):
+        self.saver = saver
+        self._books = {}
+
+    def get(self, name):
+        book = self._books.get(name)
+        if book is None:
+            from storage import load_data, load_notebook
+
+            book = load_data() if name == "book" else load_notebook()
+            if self.saver is not None:
+                self.saver.watch(book)
+            self._books[name] = book
+        else:
+            from storage import refresh
+
+            # another process may have saved the book since; one stat() if not
+            refresh(book)
+        return book
+
+    @property
+    def book(self):
+        return self.get("book")
+
+    @property
+    def notebook(self):
+        return self.get("notebook")
+
+
+def run_command(action, args, books):
+    """
+    Runs a registry entry with only the books it uses loaded; `args`
+    answer its prompts (see utils.answering).
+    """
+    uses = action["uses"]
+    book = books.book if "book" in uses else None
+    notebook = books.notebook if "notebook" in uses else None
+    with answering(args) as unused:
+        result = action["func"](args, book, notebook)
+    if unused:
+        print(Fore.RED + "Ignored arguments: " + " ".join(unused))
+    return result
+
+
+def run_once(command, args, books):
+    """One-shot mode: `main.py <command> [args]`; returns the exit code."""
+    action = get_command(command.lower())
+    if action is None:
+        print(suggest_command(command.lower()))
+        return 2
+    try:
+        result = run_command(action, args, books)
+        print(action["color"] + result)
+        return 0
+    except Exception as e:
+        print(Fore.RED + str(e))
+        return 1
+
+
+def export_metrics(saver):
+    """Writes the session's metrics to ASSISTANT_METRICS_FILE, if it is set."""
+    from config import METRICS_ENABLED, METRICS_FILE
+
+    if METRICS_ENABLED and METRICS_FILE:
+        from metrics import write_metrics
+
+        write_metrics(METRICS_FILE, saver)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # parsed only when there is something to parse: argparse is slow to import
+    options = parse_args(argv) if argv else None
+    init(autoreset=True)
+
+    if options and options.batch:
+        from batch import run_batch
+
+        books = Books()
+        failed = run_batch(options.batch, books.book, books.notebook)
+        sys.exit(1 if failed else 0)
+
+    from saver import BackgroundSaver
+
+    saver = BackgroundSaver()
+    books = Books(saver)
+    saver.start()
+
+    if options and options.serve:
+        from server import run_server
+
+        try:
+            run_server(options.serve, books.book, books.notebook, saver)
+        except KeyboardInterrupt:
+            print(Fore.GREEN + "\nServer stopped. Saving your data...")
+        finally:
+            saver.stop()
+            export_metrics(saver)
+        return
+
+    if options and options.command:
+        try:
+            code = run_once(options.command, options.args, books)
+        finally:
+            saver.stop()
+            export_metrics(saver)
+        sys.exit(code)
 
     print(greet())
     show_commands_table()
@@ -23,10 +158,10 @@ def main():
                 print(Fore.GREEN + "Session ended. Goodbye! 👋")
                 break
 
-            action = COMMANDS.get(command)
+            action = get_command(command)
             if action:
                 try:
-                    result = action["func"](args, book, notebook)
+                    result = run_command(action, args, books)
                     print(action["color"] + result)
                 except Exception as e:
                     print(Fore.RED + str(e))
@@ -36,8 +171,8 @@ def main():
     except KeyboardInterrupt:
         print(Fore.RED + "\nSession interrupted. Saving your data and exiting...")
     finally:
-        save_data(book)
-        save_data(notebook)
+        saver.stop()
+        export_metrics(saver)
 
 
 if __name__ == "__main__":
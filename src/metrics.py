@@ -0,0 +1,359 @@
+"""
+Instrumentation: per-command latency histograms and the time (and bytes)
+spent in storage and formatting.
+
+Commands are wrapped with `instrumented` when they are registered, hot
+functions with the `timed(section)` decorator. With ASSISTANT_METRICS=0
+both return the function unchanged, so there is no overhead at all.
+Sections that run while a command is running are also added to that
+command's breakdown; background saves show up as sections only.
+
+A command can be run under cProfile ("cpu") or tracemalloc ("memory"),
+see ASSISTANT_PROFILE and the `profile` command; the reports are written
+to PROFILE_DIR.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from cache import results
+from config import METRICS_ENABLED, PROFILE, PROFILE_DIR
+
+# Upper bounds of the latency buckets, in seconds (the last one is +Inf)
+BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+PROFILE_MODES = ("cpu", "memory")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as in Prometheus."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Estimated from the buckets by linear interpolation, like histogram_quantile()."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(BUCKETS, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(BUCKETS, self.counts)
+            },
+        }
+
+
+class Section:
+    """Calls, total time and bytes of one instrumented section."""
+
+    __slots__ = ("calls", "seconds", "bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def add(self, seconds, size):
+        self.calls += 1
+        self.seconds += seconds
+        self.bytes += size or 0
+
+    def to_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds, "bytes": self.bytes}
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}  # command -> Histogram
+        self.sections = {}  # section -> Section
+        self.breakdown = {}  # command -> {section -> Section}
+        self.profiles = dict(_parse_profile(PROFILE))  # command -> mode
+        self.started = time.time()
+        self._local = threading.local()
+
+    def current_command(self):
+        return getattr(self._local, "command", None)
+
+    def observe_command(self, name, seconds):
+        with self.lock:
+            histogram = self.commands.get(name)
+            if histogram is None:
+                histogram = self.commands[name] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_section(self, section, seconds, size=None):
+        command = self.current_command()
+        with self.lock:
+            entry = self.sections.get(section)
+            if entry is None:
+                entry = self.sections[section] = Section()
+            entry.add(seconds, size)
+            if command is not None:
+                sections = self.breakdown.setdefault(command, {})
+                entry = sections.get(section)
+                if entry is None:
+                    entry = sections[section] = Section()
+                entry.add(seconds, size)
+
+    def reset(self):
+        with self.lock:
+            self.commands.clear()
+            self.sections.clear()
+            self.breakdown.clear()
+            self.started = time.time()
+
+    def to_dict(self, saver=None):
+        from saver import active_saver
+
+        with self.lock:
+            data = {
+                "since": self.started,
+                "commands": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.commands.items()
+                },
+                "sections": {
+                    name: entry.to_dict() for name, entry in self.sections.items()
+                },
+                "breakdown": {
+                    command: {name: entry.to_dict() for name, entry in sections.items()}
+                    for command, sections in self.breakdown.items()
+                },
+            }
+        saver = saver or active_saver()
+        if saver is not None:
+            data["autosave"] = saver.stats()
+        if results.max_bytes:
+            data["cache"] = results.stats()
+        return data
+
+
+def _parse_profile(spec):
+    """ "find=cpu,all=memory" -> [("find", "cpu"), ("all", "memory")]"""
+    for item in spec.split(","):
+        command, _, mode = item.strip().partition("=")
+        if command:
+            yield command.strip().lower(), (mode.strip() or "cpu")
+
+
+metrics = Metrics()
+
+
+# ----------- Decorators -------------------
+
+
+def timed(section, size=None):
+    """
+    Adds the duration of every call to `section`. `size(result, *args)`
+    returns the bytes the call read or wrote, for storage sections.
+    """
+
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            metrics.observe_section(
+                section, elapsed, size(result, *args) if size else None
+            )
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def instrumented(name, func):
+    """Wraps a command function to record its latency (and profile it if asked)."""
+    if not METRICS_ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        local = metrics._local
+        outer = getattr(local, "command", None)
+        local.command = name
+        mode = metrics.profiles.get(name)
+        started = time.perf_counter()
+        try:
+            if mode is None:
+                return func(*args, **kwargs)
+            return _profiled(name, mode, func, args, kwargs)
+        finally:
+            metrics.observe_command(name, time.perf_counter() - started)
+            local.command = outer
+
+    return wrapper
+
+
+# ----------- Profiling -------------------
+
+
+def set_profile(command, mode):
+    """Turns profiling of a command on ("cpu" / "memory") or off (None)."""
+    if mode is None:
+        metrics.profiles.pop(command, None)
+    elif mode in PROFILE_MODES:
+        metrics.profiles[command] = mode
+    else:
+        raise ValueError(f"Unknown profile mode '{mode}'. Use: cpu, memory.")
+
+
+def _report_path(command, suffix):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{command}-{stamp}{suffix}")
+
+
+def _profiled(name, mode, func, args, kwargs):
+    if mode == "cpu":
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            path = _report_path(name, ".prof")
+            profiler.dump_stats(path)
+            with open(path + ".txt", "w", encoding="utf-8") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(
+                    30
+                )
+
+    import tracemalloc
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(10)
+    before = tracemalloc.take_snapshot()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+        with open(_report_path(name, ".memory.txt"), "w", encoding="utf-8") as f:
+            f.write(f"current {current} B, peak {peak} B\n\n")
+            for stat in after.compare_to(before, "lineno")[:30]:
+                f.write(f"{stat}\n")
+
+
+# ----------- Export -------------------
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def to_prometheus(data=None):
+    """Metrics in the Prometheus text exposition format."""
+    data = data or metrics.to_dict()
+    lines = [
+        "# HELP assistant_command_duration_seconds Command latency.",
+        "# TYPE assistant_command_duration_seconds histogram",
+    ]
+    for command, histogram in data["commands"].items():
+        label = f'command="{_label(command)}"'
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(
+                f'assistant_command_duration_seconds_bucket{{{label},le="{bound}"}} '
+                f"{cumulative}"
+            )
+        lines.append(
+            f"assistant_command_duration_seconds_sum{{{label}}} {histogram['sum']}"
+        )
+        lines.append(
+            f"assistant_command_duration_seconds_count{{{label}}} {histogram['count']}"
+        )
+
+    for metric, key, kind, help_text in (
+        ("assistant_section_calls_total", "calls", "counter", "Calls per section."),
+        ("assistant_section_seconds_total", "seconds", "counter", "Time per section."),
+        ("assistant_section_bytes_total", "bytes", "counter", "Bytes read or written."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for section, entry in data["sections"].items():
+            lines.append(f'{metric}{{section="{_label(section)}"}} {entry[key]}')
+
+    for key, value in data.get("autosave", {}).items():
+        lines.append(f"# TYPE assistant_autosave_{key}_total counter")
+        lines.append(f"assistant_autosave_{key}_total {value}")
+    for key, value in data.get("cache", {}).items():
+        if key in ("entries", "bytes"):
+            lines.append(f"# TYPE assistant_cache_{key} gauge")
+            lines.append(f"assistant_cache_{key} {value}")
+        else:
+            lines.append(f"# TYPE assistant_cache_{key}_total counter")
+            lines.append(f"assistant_cache_{key}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path, saver=None):
+    """Writes the metrics to `path`: Prometheus text for .prom/.txt, JSON otherwise."""
+    data = metrics.to_dict(saver)
+    if os.path.splitext(path)[1].lower() in (".prom", ".txt"):
+        text = to_prometheus(data)
+    else:
+        text = json.dumps(data, indent=2) + "\n"
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
@@ -1,22 +1,85 @@
+import threading
+import weakref
+from itertools import count
+from calendar import isleap
 from collections import UserDict
-from datetime import datetime, date, timedelta
-from validators import is_valid_phone, is_valid_email
+from collections.abc import Mapping
+from contextlib import nullcontext
+from datetime import date, timedelta
+from validators import (
+    normalize_phone,
+    parse_phone,
+    is_valid_email,
+    parse_date,
+    EMAIL_ERROR,
+    BIRTHDAY_FORMAT_ERROR,
+    BIRTHDAY_FUTURE_ERROR,
+)
+from indexes import (
+    NgramIndex,
+    BirthdayIndex,
+    TagIndex,
+    ValueIndex,
+    FuzzyIndex,
+    WidthIndex,
+)
+from fulltext import FullTextIndex
+from cache import results
+
+# Fields whose change counters (generations) stamp cached results
+CONTACT_FIELDS = ("name", "phones", "email", "birthday", "address")
+NOTE_FIELDS = ("text", "tags")
+SEARCH_FIELDS = ("name", "phones", "email", "address")
+# op -> fields it changes; adding or removing an entry changes them all
+_CHANGED_FIELDS = {
+    "set_name": ("name",),
+    "add_phone": ("phones",),
+    "edit_phone": ("phones",),
+    "remove_phone": ("phones",),
+    "set_email": ("email",),
+    "remove_email": ("email",),
+    "set_birthday": ("birthday",),
+    "set_address": ("address",),
+}
+_book_ids = count(1)
+
+
+def _restore_slots(obj, state):
+    """Restores a slotted object from either a dict or a (dict, slots) pickle state."""
+    if isinstance(state, tuple):
+        dict_state, slot_state = state
+        state = {**(dict_state or {}), **(slot_state or {})}
+    for name, value in state.items():
+        setattr(obj, name, value)
+
 
 # ----------- Field Base Class -------------
 
 
 class Field:
+    # Slotted to keep per-contact memory low; __setstate__ also accepts
+    # the __dict__ state found in pickles written before slots were added.
+    __slots__ = ("value",)
+
     def __init__(self, value=None):
         self.value = value
 
     def __str__(self):
         return str(self.value)
 
+    def __getstate__(self):
+        return {"value": self.value}
+
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+
 
 # ----------- Contact Fields ---------------
 
 
 class Name(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         if not value.strip():
             raise ValueError("Name cannot be empty.")
@@ -24,35 +87,37 @@ class Name(Field):
 
 
 class Phone(Field):
+    __slots__ = ()
+
     def __init__(self, value):
-        if not is_valid_phone(value):
-            raise ValueError(
-                "Invalid phone number. Use format: +XXXXXXXXX (8–12 digits), e.g. +380931112233"
-            )
-        super().__init__(value)
+        super().__init__(parse_phone(value))
 
 
 class Email(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         email = value.strip()
         if not is_valid_email(email):
-            raise ValueError("Invalid email format.")
+            raise ValueError(EMAIL_ERROR)
         super().__init__(email)
 
 
 class Birthday(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         if isinstance(value, str):
             try:
-                birthday_date = datetime.strptime(value, "%d.%m.%Y").date()
+                birthday_date = parse_date(value)
             except ValueError:
-                raise ValueError("Please enter the birthday in the format DD.MM.YYYY")
+                raise ValueError(BIRTHDAY_FORMAT_ERROR)
         elif isinstance(value, date):
             birthday_date = value
         else:
             raise TypeError("Birthday must be a string")
         if birthday_date > date.today():
-            raise ValueError("Birthday cannot be in the future.")
+            raise ValueError(BIRTHDAY_FUTURE_ERROR)
         super().__init__(birthday_date)
 
     def __str__(self):
@@ -60,108 +125,585 @@ class Birthday(Field):
 
 
 class Address(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         if not value.strip():
             raise ValueError("Address cannot be empty.")
         super().__init__(value.strip())
 
 
+def birthday_in_year(birthday, year):
+    """Birthday date in the given year; 29 February falls on the 28th in non-leap years."""
+    if birthday.month == 2 and birthday.day == 29 and not isleap(year):
+        return date(year, 2, 28)
+    return birthday.replace(year=year)
+
+
+def next_birthday(birthday, today):
+    """Nearest birthday on or after today."""
+    bday = birthday_in_year(birthday, today.year)
+    if bday < today:
+        bday = birthday_in_year(birthday, today.year + 1)
+    return bday
+
+
+def birthday_ranges(today, days):
+    """
+    Inclusive (month, day) ranges, in calendar order, that contain every
+    birthday falling within `days` days from today. Windows of a year or
+    more cover the whole calendar once, starting from today.
+    """
+    start = (today.month, today.day)
+    if days >= 365:
+        if start == (1, 1):
+            return [((1, 1), (12, 31))]
+        last_date = today - timedelta(days=1)
+        last = (last_date.month, last_date.day)
+        # 29 February birthdays are celebrated on the 28th in non-leap years
+        if last == (2, 28) and start != (2, 29):
+            last = (2, 29)
+        return [(start, (12, 31)), ((1, 1), last)]
+
+    end_date = today + timedelta(days=days)
+    end = (end_date.month, end_date.day)
+    if end == (2, 28) and not isleap(end_date.year):
+        end = (2, 29)
+    if end_date.year == today.year:
+        return [(start, end)]
+    return [(start, (12, 31)), ((1, 1), end)]
+
+
 # ----------- Contact Record ----------------
 
 
 class Record:
+    __slots__ = ("name", "phones", "birthday", "email", "address", "_book", "_row")
+
     def __init__(self, name):
         self.name = Name(name)
         self.phones = []
         self.birthday = None
         self.email = None
         self.address = None
+        self._book = None
+        self._row = None
+
+    def _notify(self, op, *args):
+        """Reports a change to the AddressBook that owns this record."""
+        self._row = None
+        if self._book is not None:
+            self._book._record_changed(self, op, *args)
+
+    def _changing(self):
+        """Held around every in-place change, see AddressBook._changing."""
+        if self._book is None:
+            return nullcontext()
+        return self._book._changing(self)
 
     def set_name(self, new_name: str):
-        self.name = Name(new_name)
+        name = Name(new_name)
+        if self._book is not None:
+            self._book._check_rename(self, name.value)
+        with self._changing():
+            old_name = self.name.value
+            self.name = name
+            self._notify("set_name", old_name)
+
+    def _find_phone(self, phone):
+        # files written before phones were normalized may hold the typed form
+        phone = normalize_phone(phone)
+        for i, p in enumerate(self.phones):
+            if normalize_phone(p.value) == phone:
+                return i
+        return None
 
     def add_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                raise ValueError(f"Phone {phone} already exists for this contact.")
+        field = Phone(phone)
+        if self._find_phone(field.value) is not None:
+            raise ValueError(f"Phone {phone} already exists for this contact.")
 
-        self.phones.append(Phone(phone))
+        with self._changing():
+            self.phones.append(field)
+            self._notify("add_phone", field.value)
 
     def edit_phone(self, old_phone, new_phone):
-        if old_phone == new_phone:
+        if normalize_phone(old_phone) == normalize_phone(new_phone):
             raise ValueError("New phone number must be different from the old one")
 
-        for i, p in enumerate(self.phones):
-            if p.value == old_phone:
-                self.phones[i] = Phone(new_phone)
-                return True
-
-        raise ValueError(f"Phone {old_phone} not found in record")
+        i = self._find_phone(old_phone)
+        if i is None:
+            raise ValueError(f"Phone {old_phone} not found in record")
+        field = Phone(new_phone)
+        if self._find_phone(field.value) is not None:
+            raise ValueError(f"Phone {new_phone} already exists for this contact.")
+        with self._changing():
+            old = self.phones[i].value
+            self.phones[i] = field
+            self._notify("edit_phone", old, field.value)
+        return True
 
     def remove_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
-                return True
-
-        raise ValueError(f"Phone {phone} not found in record")
+        i = self._find_phone(phone)
+        if i is None:
+            raise ValueError(f"Phone {phone} not found in record")
+        with self._changing():
+            old = self.phones.pop(i).value
+            self._notify("remove_phone", old)
+        return True
 
     def set_email(self, email):
-        self.email = Email(email)
+        field = Email(email)
+        with self._changing():
+            old = self.email
+            self.email = field
+            self._notify("set_email", old.value if old else None)
 
     def remove_email(self):
-        self.email = None
+        with self._changing():
+            old = self.email
+            self.email = None
+            self._notify("remove_email", old.value if old else None)
 
     def set_birthday(self, birthday):
-        self.birthday = Birthday(birthday)
+        field = Birthday(birthday)
+        with self._changing():
+            old = self.birthday
+            self.birthday = field
+            self._notify("set_birthday", old.value if old else None)
 
     def set_address(self, address):
-        self.address = Address(address)
+        field = Address(address)
+        with self._changing():
+            old = self.address
+            self.address = field
+            self._notify("set_address", old.value if old else None)
+
+    def copy(self):
+        """Detached copy of the record; the fields themselves are never changed in place."""
+        record = object.__new__(Record)
+        record.name = self.name
+        record.phones = list(self.phones)
+        record.birthday = self.birthday
+        record.email = self.email
+        record.address = self.address
+        record._book = None
+        record._row = self._row
+        return record
+
+    def to_dict(self):
+        """Plain representation used by the journal and other serializers."""
+        return {
+            "name": self.name.value,
+            "phones": [p.value for p in self.phones],
+            "email": self.email.value if self.email else None,
+            "birthday": str(self.birthday) if self.birthday else None,
+            "address": self.address.value if self.address else None,
+        }
+
+    @classmethod
+    def from_values(cls, name, phones=(), email=None, birthday=None, address=None):
+        """
+        Builds a record from values that already went through the bulk
+        validators (birthday as a date); the Field checks are skipped.
+        """
+        new = object.__new__
+        record = new(cls)
+        record.name = field = new(Name)
+        field.value = name
+        record.phones = []
+        for phone in phones:
+            field = new(Phone)
+            field.value = phone
+            record.phones.append(field)
+        record.email = record.birthday = record.address = None
+        if email:
+            record.email = field = new(Email)
+            field.value = email
+        if birthday:
+            record.birthday = field = new(Birthday)
+            field.value = birthday
+        if address:
+            record.address = field = new(Address)
+            field.value = address
+        record._book = None
+        record._row = None
+        return record
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls(data["name"])
+        for phone in data.get("phones") or []:
+            record.add_phone(phone)
+        if data.get("email"):
+            record.set_email(data["email"])
+        if data.get("birthday"):
+            record.set_birthday(data["birthday"])
+        if data.get("address"):
+            record.set_address(data["address"])
+        return record
+
+    def __getstate__(self):
+        return {
+            "name": self.name,
+            "phones": self.phones,
+            "birthday": self.birthday,
+            "email": self.email,
+            "address": self.address,
+        }
+
+    def __setstate__(self, state):
+        self.birthday = self.email = self.address = None
+        self.phones = []
+        _restore_slots(self, state)
+        self._book = None
+        self._row = None
+
+    def display_row(self):
+        """
+        (name, phones, email, address, birthday) as shown in the contact
+        tables, "-" for a missing value. Computed on first use and kept
+        until the record changes.
+        """
+        row = self._row
+        if row is None:
+            row = self._row = _display_row(self)
+        return row
 
     def get_info(self):
+        _, phones, _, _, birthday = self.display_row()
         info = f"Name: {self.name.value}\n"
         if self.phones:
-            info += "Phones: " + ", ".join(str(p) for p in self.phones) + "\n"
+            info += f"Phones: {phones}\n"
         if self.email:
             info += f"Email: {self.email.value}\n"
         if self.address:
             info += f"Address: {self.address.value}\n"
         if self.birthday:
-            info += f"Birthday: {self.birthday.value.strftime('%d.%m.%Y')}\n"
+            info += f"Birthday: {birthday}\n"
         return info.strip()
 
     def days_to_birthday(self):
         if not self.birthday:
             return None
         today = date.today()
-        next_birthday = self.birthday.value.replace(year=today.year)
-        if next_birthday < today:
-            next_birthday = next_birthday.replace(year=today.year + 1)
-        return (next_birthday - today).days
+        return (next_birthday(self.birthday.value, today) - today).days
 
     def __str__(self):
-        phones = ", ".join(str(p) for p in self.phones)
+        _, phones, _, _, birthday = self.display_row()
         parts = [
             f"Name: {self.name}",
-            f"Phones: {phones}" if phones else None,
+            f"Phones: {phones}" if self.phones else None,
             f"Email: {self.email}" if self.email else None,
-            f"Birthday: {self.birthday}" if self.birthday else None,
+            f"Birthday: {birthday}" if self.birthday else None,
             f"Address: {self.address}" if self.address else None,
         ]
         return " | ".join(p for p in parts if p)
 
 
+def _display_row(record):
+    phones = ", ".join(phone.value for phone in record.phones) if record.phones else "-"
+    email = record.email.value if record.email else "-"
+    address = record.address.value if record.address else "-"
+    birthday = record.birthday.value.strftime("%d.%m.%Y") if record.birthday else "-"
+    return (record.name.value.capitalize(), phones, email, address, birthday)
+
+
 # ----------- AddressBook -------------------
 
 
+def _search_texts(record):
+    """Lowercased fields that AddressBook.search matches against."""
+    texts = [record.name.value.lower()]
+    texts.extend(p.value.lower() for p in record.phones)
+    if record.email:
+        texts.append(record.email.value.lower())
+    if record.address:
+        texts.append(record.address.value.lower())
+    return texts
+
+
+class _Change:
+    """Context of one change to a book (see AddressBook._changing)."""
+
+    __slots__ = ("book", "item", "save_lock")
+
+    def __init__(self, book, item):
+        self.book = book
+        self.item = item
+        # set by a BackgroundSaver watching the book: a save waits for the
+        # change to finish, and the change for a running save
+        self.save_lock = book._save_lock
+
+    def __enter__(self):
+        book = self.book
+        if self.save_lock is not None:
+            self.save_lock.acquire()
+        book._lock.acquire()
+        if book._views:
+            try:
+                book._preserve(self.item)
+            except BaseException:
+                self.__exit__()
+                raise
+
+    def __exit__(self, *exc):
+        self.book._lock.release()
+        if self.save_lock is not None:
+            self.save_lock.release()
+
+
+# an index attribute while a background thread builds the index
+_BUILDING = object()
+
+
+def _build_in_background(book, name, build, update):
+    """
+    Builds the index stored in `book.<name>` in a background thread, from
+    a snapshot: a pass over every record must not hold up the command that
+    first needs the index. Changes made meanwhile are queued and applied
+    with `update`, the index's listener, when the index is installed.
+    Books without real snapshots (lazybook) are indexed right away.
+    """
+    with book._lock:
+        view = book.snapshot()
+        if view is book:
+            setattr(book, name, build(view))
+            book.subscribe(update)
+            return
+        setattr(book, name, _BUILDING)
+        queued = []
+
+        def queue(*event):
+            queued.append(event)
+
+        book.subscribe(queue)
+
+    def run():
+        index = None
+        try:
+            index = build(view)
+        finally:
+            with book._lock:
+                book.unsubscribe(queue)
+                setattr(book, name, index)
+                if index is not None:
+                    for event in queued:
+                        update(*event)
+                    book.subscribe(update)
+
+    thread_name = name.strip("_").replace("_", "-")
+    threading.Thread(target=run, name=thread_name, daemon=True).start()
+
+
+def _built_index(book, name, start):
+    """
+    book.<name> once it is built, else None; `start()` starts building it
+    on first use. Under the lock: the builder applies the queued changes
+    to the index after installing it.
+    """
+    with book._lock:
+        if getattr(book, name) is None:
+            start()
+        index = getattr(book, name)
+    return None if index is _BUILDING else index
+
+
+def _build_width_index(book, columns):
+    """Builds the book's WidthIndex in the background (see _build_in_background)."""
+
+    def build(view):
+        index = WidthIndex(columns)
+        for key, row in book._width_rows(view):
+            index.add(key, row)
+        return index
+
+    _build_in_background(book, "_width_index", build, book._update_width_index)
+
+
+class BookView(Mapping):
+    """
+    Read-only snapshot of a book, taken in O(1) with book.snapshot().
+
+    The view shares the book's dict until the book changes. The book then
+    leaves that dict to its views and goes on with a copy, and before it
+    changes a record or note in place the views get a copy of it, so a
+    view can be read from another thread while writers proceed. (A record
+    handed out just before the book changes it may show that change.)
+    Queries go through the book's indexes while the book has not changed
+    since the snapshot and scan the view once it has.
+    """
+
+    def __init__(self, book):
+        self._book = book
+        self.data = book.data
+        self.version = book._version
+        self._generations = dict(book._generations)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def snapshot(self):
+        return self
+
+    def generation(self, fields=None):
+        """The book's generations of `fields` when the view was taken."""
+        generations = self._generations
+        return tuple(generations[field] for field in fields or self._book.FIELDS)
+
+    def cache_key(self, *parts):
+        return self._book.cache_key(*parts)
+
+    def column_widths(self):
+        """The book's column widths, or None once it has changed since the snapshot."""
+        return self._indexed(self._book.column_widths)
+
+    def _indexed(self, query, *args):
+        """query(*args) if the book is still as the view saw it, otherwise None."""
+        book = self._book
+        with book._lock:
+            if book._version == self.version:
+                return query(*args)
+        return None
+
+
 class AddressBook(UserDict):
+    # Derived structures that are rebuilt after loading instead of pickled
+    _TRANSIENT = (
+        "_listeners",
+        "_search_index",
+        "_birthday_index",
+        "_phone_index",
+        "_email_index",
+        "_name_index",
+        "_width_index",
+        "_lock",
+        "_save_lock",
+        "_views",
+        "_version",
+        "_generations",
+        "_cache_id",
+    )
+    FIELDS = CONTACT_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        self._listeners = []
+        self._search_index = None
+        self._birthday_index = None
+        self._phone_index = None
+        self._email_index = None
+        self._name_index = None
+        self._width_index = None
+        self._lock = threading.RLock()
+        self._save_lock = None
+        self._views = weakref.WeakValueDictionary()  # id -> view
+        self._version = 0
+        self._generations = dict.fromkeys(CONTACT_FIELDS, 0)
+        self._cache_id = next(_book_ids)
+        super().__init__(*args, **kwargs)
+
+    def subscribe(self, listener):
+        """Registers a callable invoked as listener(op, record, *args) on every change."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _emit(self, op, record, *args):
+        self._version += 1
+        generations = self._generations
+        for field in _CHANGED_FIELDS.get(op, CONTACT_FIELDS):
+            generations[field] += 1
+        for listener in self._listeners:
+            listener(op, record, *args)
+
+    def generation(self, fields=CONTACT_FIELDS):
+        """
+        Change counters of `fields`: a result computed from these fields
+        stays valid as long as the tuple is the same (see cache.py).
+        """
+        generations = self._generations
+        return tuple(generations[field] for field in fields)
+
+    def cache_key(self, *parts):
+        """Key of a cached result of this book."""
+        return (self._cache_id, *parts)
+
+    def snapshot(self):
+        """Read-only view of the book as it is now, in O(1); see AddressBookView."""
+        with self._lock:
+            view = AddressBookView(self)
+            self._views[id(view)] = view
+        return view
+
+    def _changing(self, record=None):
+        """
+        Held around every change. While views are alive, the dict they
+        share is left to them and the book goes on with a copy (once per
+        snapshot), and a record about to change in place is replaced in
+        the views by a copy of itself.
+        """
+        return _Change(self, record)
+
+    def _preserve(self, record):
+        views = list(self._views.values())
+        if any(view.data is self.data for view in views):
+            self.data = dict(self.data)
+        if record is None:
+            return
+        key = record.name.value.lower()
+        frozen = None
+        for view in views:
+            if view.data.get(key) is record:
+                frozen = frozen or record.copy()
+                view.data[key] = frozen
+
+    def __setitem__(self, key, record):
+        with self._changing():
+            if key in self.data:
+                del self[key]
+            self.data[key] = record
+            record._book = self
+            self._emit("add_record", record)
+
+    def __delitem__(self, key):
+        with self._changing():
+            record = self.data.pop(key)
+            record._book = None
+            self._emit("remove_record", record)
+
+    def _check_rename(self, record, new_name):
+        new_key = new_name.lower()
+        if new_key != record.name.value.lower() and new_key in self.data:
+            raise ValueError(f"Contact '{new_name}' already exists.")
+
+    def _record_changed(self, record, op, *args):
+        if op == "set_name":
+            old_key = args[0].lower()
+            new_key = record.name.value.lower()
+            if old_key != new_key:
+                self.data[new_key] = self.data.pop(old_key)
+        self._emit(op, record, *args)
+
     def add_record(self, record):
         if not isinstance(record, Record):
             raise TypeError("Only Record instances can be added.")
         key = record.name.value.lower()
         if key in self.data:
             raise ValueError(f"Contact '{record.name.value}' already exists.")
-        self.data[key] = record
+        self[key] = record
 
     def get_record(self, name):
         return self.data.get(name.lower())
@@ -169,42 +711,324 @@ class AddressBook(UserDict):
     def remove_record(self, name):
         key = name.lower()
         if key in self.data:
-            del self.data[key]
+            del self[key]
         else:
             raise KeyError(f"No record found for name: {name}")
 
+    @staticmethod
+    def _build_search_index(view):
+        index = NgramIndex()
+        for key, record in view.data.items():
+            index.add(key, _search_texts(record))
+        return index
+
+    def _get_search_index(self):
+        """
+        The n-gram index, kept up to date once built; None while it is
+        built in the background after the first search.
+        """
+        return _built_index(
+            self,
+            "_search_index",
+            lambda: _build_in_background(
+                self,
+                "_search_index",
+                self._build_search_index,
+                self._update_search_index,
+            ),
+        )
+
+    def _update_search_index(self, op, record, *args):
+        index = self._search_index
+        key = record.name.value.lower()
+        if op == "remove_record":
+            index.remove(key)
+            return
+        if op == "set_name":
+            index.remove(args[0].lower())
+        index.add(key, _search_texts(record))
+
     def search(self, query):
-        result = []
-        query_lower = query.lower()
+        """Case-insensitive substring search over name, phones, email and address."""
+        keys = results.cached(
+            self.cache_key("search", query.lower()),
+            self.generation(SEARCH_FIELDS),
+            lambda: tuple(self._search_keys(query)),
+        )
+        return [self.data[key] for key in keys]
+
+    def _search_keys(self, query):
+        index = self._get_search_index()
+        if index is not None:
+            return index.search(query)
+        query = query.lower()
+        return [
+            key
+            for key, record in self.data.items()
+            if any(query in text for text in _search_texts(record))
+        ]
+
+    def _get_birthday_index(self):
+        if self._birthday_index is None:
+            index = BirthdayIndex()
+            for key, record in self.data.items():
+                if record.birthday:
+                    index.add(key, record.birthday.value)
+            self._birthday_index = index
+            self.subscribe(self._update_birthday_index)
+        return self._birthday_index
+
+    def _update_birthday_index(self, op, record, *args):
+        index = self._birthday_index
+        key = record.name.value.lower()
+        if op == "add_record":
+            if record.birthday:
+                index.add(key, record.birthday.value)
+        elif op == "remove_record":
+            if record.birthday:
+                index.remove(key, record.birthday.value)
+        elif op == "set_birthday":
+            if args[0] is not None:
+                index.remove(key, args[0])
+            index.add(key, record.birthday.value)
+        elif op == "set_name" and record.birthday:
+            index.remove(args[0].lower(), record.birthday.value)
+            index.add(key, record.birthday.value)
+
+    def _get_phone_index(self):
+        """Normalized phone -> keys; built on first use, then kept up to date."""
+        if self._phone_index is None:
+            index = ValueIndex()
+            for key, record in self.data.items():
+                for phone in record.phones:
+                    index.add(normalize_phone(phone.value), key)
+            self._phone_index = index
+            self.subscribe(self._update_phone_index)
+        return self._phone_index
+
+    def _update_phone_index(self, op, record, *args):
+        index = self._phone_index
+        key = record.name.value.lower()
+        if op == "add_phone":
+            index.add(normalize_phone(args[0]), key)
+        elif op == "remove_phone":
+            index.remove(normalize_phone(args[0]), key)
+        elif op == "edit_phone":
+            index.remove(normalize_phone(args[0]), key)
+            index.add(normalize_phone(args[1]), key)
+        elif op in ("add_record", "remove_record", "set_name"):
+            old_key = args[0].lower() if op == "set_name" else key
+            for phone in record.phones:
+                phone = normalize_phone(phone.value)
+                if op != "add_record":
+                    index.remove(phone, old_key)
+                if op != "remove_record":
+                    index.add(phone, key)
+
+    def _get_email_index(self):
+        """Case-folded email -> keys; built on first use, then kept up to date."""
+        if self._email_index is None:
+            index = ValueIndex()
+            for key, record in self.data.items():
+                if record.email:
+                    index.add(record.email.value.casefold(), key)
+            self._email_index = index
+            self.subscribe(self._update_email_index)
+        return self._email_index
+
+    def _update_email_index(self, op, record, *args):
+        index = self._email_index
+        key = record.name.value.lower()
+        email = record.email.value.casefold() if record.email else None
+        if op in ("set_email", "remove_email"):
+            if args[0] is not None:
+                index.remove(args[0].casefold(), key)
+            if email is not None:
+                index.add(email, key)
+        elif email is None:
+            return
+        elif op == "add_record":
+            index.add(email, key)
+        elif op == "remove_record":
+            index.remove(email, key)
+        elif op == "set_name":
+            index.remove(email, args[0].lower())
+            index.add(email, key)
+
+    def find_by_phone(self, phone):
+        """Contacts that have this phone number (exact match after normalization)."""
+        keys = self._get_phone_index().lookup(normalize_phone(phone))
+        return [self.data[key] for key in keys]
+
+    def find_by_email(self, email):
+        """Contacts with this email address, ignoring case."""
+        keys = self._get_email_index().lookup(email.strip().casefold())
+        return [self.data[key] for key in keys]
+
+    def duplicate_phones(self):
+        """{phone: [records]} for phone numbers listed on more than one contact."""
+        return {
+            phone: [self.data[key] for key in keys]
+            for phone, keys in self._get_phone_index().duplicates().items()
+        }
+
+    def _get_name_index(self):
+        """Typo-tolerant index of contact keys; built on first use, then kept up to date."""
+        if self._name_index is None:
+            index = FuzzyIndex()
+            for key in self.data:
+                index.add(key)
+            self._name_index = index
+            self.subscribe(self._update_name_index)
+        return self._name_index
+
+    def _update_name_index(self, op, record, *args):
+        index = self._name_index
+        key = record.name.value.lower()
+        if op == "add_record":
+            index.add(key)
+        elif op == "remove_record":
+            index.remove(key)
+        elif op == "set_name" and args[0].lower() != key:
+            index.remove(args[0].lower())
+            index.add(key)
+
+    def find_similar(self, name, limit=5):
+        """Contacts whose name is one typo away from `name`, closest first."""
+        keys = self._get_name_index().lookup(name.strip().lower(), limit)
+        return [self.data[key] for key in keys]
+
+    @staticmethod
+    def _width_rows(view):
+        # not record.display_row(): no need to keep every row
+        for key, record in view.data.items():
+            yield key, record._row or _display_row(record)
+
+    def _update_width_index(self, op, record, *args):
+        index = self._width_index
+        key = record.name.value.lower()
+        if op == "set_name":
+            index.remove(args[0].lower())
+        if op == "remove_record":
+            index.remove(key)
+        else:
+            index.add(key, record.display_row())
+
+    def column_widths(self):
+        """
+        Widest cell of every column of the contact table (see display_row),
+        or None until the width index has been built in the background.
+        """
+        index = _built_index(
+            self,
+            "_width_index",
+            lambda: _build_width_index(self, len(CONTACT_FIELDS)),
+        )
+        return None if index is None else index.widths()
+
+    def iter_upcoming_birthdays(self, days=7):
+        """Lazily yields upcoming birthdays within `days` days, nearest first."""
+        index = self._get_birthday_index()
+        today = date.today()
+        for start, end in birthday_ranges(today, days):
+            for key in index.iter_range(start, end):
+                record = self.data[key]
+                bday = next_birthday(record.birthday.value, today)
+                if (bday - today).days <= days:
+                    yield {
+                        "name": record.name.value,
+                        "congratulation_date": bday.strftime("%d.%m.%Y"),
+                    }
 
+    def get_upcoming_birthdays(self, days=7):
+        # cached as immutable rows: every caller gets dicts of its own
+        found = results.cached(
+            self.cache_key("birthdays", days, date.today()),
+            self.generation(("name", "birthday")),
+            lambda: tuple(
+                (item["name"], item["congratulation_date"])
+                for item in self.iter_upcoming_birthdays(days)
+            ),
+        )
+        return [{"name": name, "congratulation_date": when} for name, when in found]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._TRANSIENT:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._listeners = []
+        self._search_index = None
+        self._birthday_index = None
+        self._phone_index = None
+        self._email_index = None
+        self._name_index = None
+        self._width_index = None
+        self._lock = threading.RLock()
+        self._save_lock = None
+        self._views = weakref.WeakValueDictionary()
+        self._version = 0
+        self._generations = dict.fromkeys(CONTACT_FIELDS, 0)
+        self._cache_id = next(_book_ids)
         for record in self.data.values():
-            if query_lower in record.name.value.lower():
-                result.append(record)
-            elif any(query_lower in p.value.lower() for p in record.phones):
-                result.append(record)
-            elif record.email and query_lower in record.email.value.lower():
-                result.append(record)
-            elif record.address and query_lower in record.address.value.lower():
-                result.append(record)
+            record._book = self
+
+
+class AddressBookView(BookView):
+    def get_record(self, name):
+        return self.data.get(name.lower())
 
-        return result
+    def search(self, query):
+        found = self._indexed(self._book.search, query)
+        if found is not None:
+            return found
+        query = query.lower()
+        return [
+            record
+            for record in self.data.values()
+            if any(query in text for text in _search_texts(record))
+        ]
 
     def get_upcoming_birthdays(self, days=7):
+        found = self._indexed(self._book.get_upcoming_birthdays, days)
+        if found is not None:
+            return found
         today = date.today()
         upcoming = []
-        for record in self.data.values():
+        for key, record in self.data.items():
             if record.birthday:
-                bday = record.birthday.value.replace(year=today.year)
-                if bday < today:
-                    bday = bday.replace(year=today.year + 1)
-                if 0 <= (bday - today).days <= days:
-                    upcoming.append(
-                        {
-                            "name": record.name.value,
-                            "congratulation_date": bday.strftime("%d.%m.%Y"),
-                        }
-                    )
-        return upcoming
+                birthday = record.birthday.value
+                bday = next_birthday(birthday, today)
+                if (bday - today).days <= days:
+                    upcoming.append((bday, birthday.month, birthday.day, key, record))
+        upcoming.sort(key=lambda item: item[:4])
+        return [
+            {
+                "name": record.name.value,
+                "congratulation_date": bday.strftime("%d.%m.%Y"),
+            }
+            for bday, _, _, _, record in upcoming
+        ]
+
+    def iter_upcoming_birthdays(self, days=7):
+        return iter(self.get_upcoming_birthdays(days))
+
+    def duplicate_phones(self):
+        found = self._indexed(self._book.duplicate_phones)
+        if found is not None:
+            return found
+        owners = {}
+        for key, record in self.data.items():
+            for phone in record.phones:
+                owners.setdefault(normalize_phone(phone.value), {})[key] = record
+        return {
+            phone: list(records.values())
+            for phone, records in owners.items()
+            if len(records) > 1
+        }
 
 
 # ----------- Note & NotesBook ---------------
@@ -216,25 +1040,176 @@ class Note:
             raise ValueError("Note cannot be empty.")
         self.text = text.strip()
         self.tags = tags or []
+        self._book = None
+        self._key = None
+        self._row = None
 
     def edit(self, new_text=None, new_tags=None):
-        if new_text is not None:
-            if not new_text.strip():
-                raise ValueError("Note text cannot be empty")
-            self.text = new_text.strip()
-        if new_tags is not None:
-            self.tags = new_tags
+        if new_text is not None and not new_text.strip():
+            raise ValueError("Note text cannot be empty")
+        book = self._book
+        with book._changing(self) if book is not None else nullcontext():
+            old_text, old_tags = self.text, self.tags
+            if new_text is not None:
+                self.text = new_text.strip()
+            if new_tags is not None:
+                self.tags = new_tags
+            self._row = None
+            if book is not None:
+                book._note_changed(self, old_text, old_tags)
+
+    def copy(self):
+        """Detached copy of the note."""
+        note = Note.__new__(Note)
+        note.text = self.text
+        note.tags = list(self.tags)
+        note._book = None
+        note._key = self._key
+        note._row = self._row
+        return note
+
+    def display_row(self, key=None):
+        """
+        (id, text, tags) as shown in the note tables; computed on first
+        use and kept until the note changes.
+        """
+        key = self._key if key is None else key
+        row = self._row
+        if row is None or row[0] != key:
+            row = self._row = _note_row(key, self)
+        return row
+
+    def to_dict(self):
+        return {"text": self.text, "tags": list(self.tags)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["text"], list(data.get("tags") or []))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_book", None)
+        state.pop("_row", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._book = None
+        self._key = state.get("_key")
+        self._row = None
 
     def __str__(self):
         tag_str = f"[Tags: {', '.join(self.tags)}]" if self.tags else ""
         return f"{self.text}{tag_str}"
 
 
+def _note_row(key, note):
+    return (key, note.text, ", ".join(note.tags) if note.tags else "-")
+
+
 class NoteBook(UserDict):
+    # Derived structures that are rebuilt after loading instead of pickled
+    _TRANSIENT = (
+        "_listeners",
+        "_tag_index",
+        "_width_index",
+        "_lock",
+        "_save_lock",
+        "_views",
+        "_version",
+        "_generations",
+        "_cache_id",
+    )
+    FIELDS = NOTE_FIELDS
+
     def __init__(self):
+        self._listeners = []
+        self._tag_index = None
+        self._width_index = None
+        self._lock = threading.RLock()
+        self._save_lock = None
+        self._views = weakref.WeakValueDictionary()  # id -> view
+        self._version = 0
+        self._generations = dict.fromkeys(NOTE_FIELDS, 0)
+        self._cache_id = next(_book_ids)
+        # Unlike the other indexes, the full-text index is saved together
+        # with the notes (a section of notebook.bin, see binformat) so that
+        # it doesn't have to be rebuilt at startup.
+        self._fulltext = None
         super().__init__()
         self.counter = 1
 
+    def subscribe(self, listener):
+        """Registers a callable invoked as listener(op, key, note, *args) on every change."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _emit(self, op, key, note, *args):
+        self._version += 1
+        generations = self._generations
+        if op == "edit_note":
+            old_text, old_tags = args
+            if note.text != old_text:
+                generations["text"] += 1
+            if note.tags != old_tags:
+                generations["tags"] += 1
+        else:
+            generations["text"] += 1
+            generations["tags"] += 1
+        for listener in self._listeners:
+            listener(op, key, note, *args)
+
+    def generation(self, fields=NOTE_FIELDS):
+        """Change counters of `fields`, as AddressBook.generation."""
+        generations = self._generations
+        return tuple(generations[field] for field in fields)
+
+    def cache_key(self, *parts):
+        return (self._cache_id, *parts)
+
+    def snapshot(self):
+        """Read-only view of the notebook as it is now, in O(1); see NoteBookView."""
+        with self._lock:
+            view = NoteBookView(self)
+            self._views[id(view)] = view
+        return view
+
+    def _changing(self, note=None):
+        """Held around every change, as AddressBook._changing."""
+        return _Change(self, note)
+
+    def _preserve(self, note):
+        views = list(self._views.values())
+        if any(view.data is self.data for view in views):
+            self.data = dict(self.data)
+        if note is None:
+            return
+        frozen = None
+        for view in views:
+            if view.data.get(note._key) is note:
+                frozen = frozen or note.copy()
+                view.data[note._key] = frozen
+
+    def __setitem__(self, key, note):
+        with self._changing():
+            if key in self.data:
+                del self[key]
+            self.data[key] = note
+            note._book = self
+            note._key = key
+            self._emit("add_note", key, note)
+
+    def __delitem__(self, key):
+        with self._changing():
+            note = self.data.pop(key)
+            note._book = None
+            self._emit("delete_note", key, note)
+
+    def _note_changed(self, note, old_text, old_tags):
+        self._emit("edit_note", note._key, note, old_text, old_tags)
+
     def _generate_id(self):
         while True:
             note_id = f"note-{self.counter}"
@@ -244,11 +1219,11 @@ class NoteBook(UserDict):
             self.counter += 1
 
     def add_note(self, key, note: Note):
-        self.data[key] = note
+        self[key] = note
 
     def delete_note(self, key):
         if key in self.data:
-            del self.data[key]
+            del self[key]
         else:
             raise ValueError(f"Note '{key}' not found.")
 
@@ -258,32 +1233,175 @@ class NoteBook(UserDict):
         else:
             raise ValueError(f"Note '{key}' not found.")
 
+    def _get_tag_index(self):
+        """Builds the tag index on first use and keeps it up to date afterwards."""
+        if self._tag_index is None:
+            index = TagIndex()
+            for key, note in self.data.items():
+                index.add(key, note.tags)
+            self._tag_index = index
+            self.subscribe(self._update_tag_index)
+        return self._tag_index
+
+    def _update_tag_index(self, op, key, note, *args):
+        index = self._tag_index
+        if op == "add_note":
+            index.add(key, note.tags)
+        elif op == "delete_note":
+            index.remove(key, note.tags)
+        elif op == "edit_note":
+            index.retag(key, args[1], note.tags)
+
+    @staticmethod
+    def _width_rows(view):
+        for key, note in view.data.items():
+            yield key, _note_row(key, note)
+
+    def _update_width_index(self, op, key, note, *args):
+        if op == "delete_note":
+            self._width_index.remove(key)
+        else:
+            self._width_index.add(key, note.display_row(key))
+
+    def column_widths(self):
+        """Widths of the note table columns (see Note.display_row), as AddressBook's."""
+        index = _built_index(
+            self,
+            "_width_index",
+            lambda: _build_width_index(self, len(NOTE_FIELDS) + 1),
+        )
+        return None if index is None else index.widths()
+
+    @staticmethod
+    def _document(note):
+        return " ".join([note.text, *note.tags])
+
+    def _get_fulltext(self):
+        if self._fulltext is None:
+            index = FullTextIndex()
+            for key, note in self.data.items():
+                index.add(key, self._document(note))
+            self._fulltext = index
+            self.subscribe(self._update_fulltext)
+        return self._fulltext
+
+    def _update_fulltext(self, op, key, note, *args):
+        index = self._fulltext
+        if op == "delete_note":
+            index.remove(key, self._document(note))
+        elif op == "edit_note":
+            old_text, old_tags = args
+            index.remove(key, " ".join([old_text, *old_tags]))
+            index.add(key, self._document(note))
+        else:
+            index.add(key, self._document(note))
+
+    def search_ranked(self, query, limit=10):
+        """Full-text search over note text and tags, best `limit` matches first."""
+        found = results.cached(
+            self.cache_key("search_ranked", query, limit),
+            self.generation(),
+            lambda: tuple(self._get_fulltext().search(query, limit)),
+        )
+        return [(key, self.data[key], score) for key, score in found]
+
+    def find_by_tag(self, tag):
+        return [(key, self.data[key]) for key in self._get_tag_index().lookup(tag)]
+
+    def find_by_tags(self, tags, match_all=True):
+        """Notes having all of the tags (AND) or, with match_all=False, any of them (OR)."""
+        index = self._get_tag_index()
+        keys = index.lookup_all(tags) if match_all else index.lookup_any(tags)
+        return [(key, self.data[key]) for key in keys]
+
     def search_notes(self, query):
-        results = {}
+        keys = results.cached(
+            self.cache_key("search_notes", query),
+            self.generation(),
+            lambda: self._search_notes(query),
+        )
+        return {key: self.data[key] for key in keys}
+
+    def _search_notes(self, query):
         query_lower = query.lower()
-        for key, note in self.data.items():
-            if query_lower in note.text.lower() or any(
-                query_lower in tag.lower() for tag in note.tags
-            ):
-                results[key] = note
-        return results
+        tagged = self._get_tag_index().lookup_substring(query)
+        return tuple(
+            key
+            for key, note in self.data.items()
+            if key in tagged or query_lower in note.text.lower()
+        )
 
     def sort_notes_by_tag(self, tag):
-        tag_lower = tag.lower()
-
-        tagged = []
-        untagged = []
-
-        for note_id, note in self.data.items():
-            tags_lower = [t.lower() for t in note.tags]
-            if tag_lower in tags_lower:
-                tagged.append((note_id, note))
-            else:
-                untagged.append((note_id, note))
-
+        tagged = self.find_by_tag(tag)
+        tagged_keys = {key for key, _ in tagged}
+        untagged = [
+            (note_id, note)
+            for note_id, note in self.data.items()
+            if note_id not in tagged_keys
+        ]
         return tagged + untagged
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._TRANSIENT:
+            state.pop(name, None)
+        return state
+
     def __setstate__(self, state):
         self.__dict__.update(state)
         if "counter" not in self.__dict__:
             self.counter = 1
+        self._listeners = []
+        self._tag_index = None
+        self._width_index = None
+        self._lock = threading.RLock()
+        self._save_lock = None
+        self._views = weakref.WeakValueDictionary()
+        self._version = 0
+        self._generations = dict.fromkeys(NOTE_FIELDS, 0)
+        self._cache_id = next(_book_ids)
+        if self.__dict__.get("_fulltext") is None:
+            self._fulltext = None
+        else:
+            self.subscribe(self._update_fulltext)
+        for key, note in self.data.items():
+            note._book = self
+            note._key = key
+
+
+class NoteBookView(BookView):
+    def find_by_tag(self, tag):
+        found = self._indexed(self._book.find_by_tag, tag)
+        if found is not None:
+            return found
+        tag = tag.casefold()
+        return [
+            (key, note)
+            for key, note in self.data.items()
+            if any(t.casefold() == tag for t in note.tags)
+        ]
+
+    def find_by_tags(self, tags, match_all=True):
+        found = self._indexed(self._book.find_by_tags, tags, match_all)
+        if found is not None:
+            return found
+        wanted = {tag.casefold() for tag in tags}
+        matches = []
+        for key, note in self.data.items():
+            folded = {tag.casefold() for tag in note.tags}
+            if wanted and (wanted <= folded if match_all else wanted & folded):
+                matches.append((key, note))
+        return matches
+
+    def search_notes(self, query):
+        # a scan either way: no need to hold up the writers
+        query_lower = query.lower()
+        query_folded = query.casefold()
+        return {
+            key: note
+            for key, note in self.data.items()
+            if query_lower in note.text.lower()
+            or any(query_folded in tag.casefold() for tag in note.tags)
+        }
+
+    sort_notes_by_tag = NoteBook.sort_notes_by_tag
@@ -0,0 +1,202 @@
+import sys
+import threading
+import time
+from config import AUTOSAVE_INTERVAL_MS, AUTOSAVE_MAX_CHANGES
+
+_active = None
+
+# a save that failed is tried again after this many seconds
+RETRY_SECONDS = 5.0
+
+
+def active_saver():
+    """The BackgroundSaver installed by main(), or None when saves are synchronous."""
+    return _active
+
+
+class BackgroundSaver:
+    """
+    Coalesces saves of watched books into a background thread.
+
+    Every change to a watched book marks it dirty. A dirty book is saved
+    once `interval_ms` have passed since its first unsaved change, or
+    earlier if `max_changes` changes have piled up. Every change to a
+    watched book holds `lock` (see models._Change), so a save never sees
+    a book half-updated. A save that fails (disk full, ...) is reported
+    on stderr and the book stays dirty: it is tried again after
+    RETRY_SECONDS, and at the latest when the saver stops.
+    """
+
+    def __init__(
+        self,
+        save=None,
+        interval_ms=AUTOSAVE_INTERVAL_MS,
+        max_changes=AUTOSAVE_MAX_CHANGES,
+    ):
+        # storage is imported on the first save, not at startup
+        self._save_book = save
+        self.interval = interval_ms / 1000
+        self.max_changes = max_changes
+        self.lock = threading.RLock()
+        self._cond = threading.Condition()
+        # id(book) -> [book, changes, time of first change, retry not before]
+        self._dirty = {}
+        self._failing = set()  # id(book) of books whose last save failed
+        self._listeners = {}
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+
+        self.saves_performed = 0
+        self.saves_coalesced = 0
+        self.bytes_written = 0
+        self.saves_failed = 0
+        self.last_error = None
+
+    # ----- lifecycle -----
+
+    def start(self):
+        global _active
+        _active = self
+        self._thread.start()
+
+    def stop(self):
+        """Stops the thread and writes whatever is still dirty."""
+        global _active
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        for book, *_ in self._dirty.values():
+            print(
+                f"Autosave: the last changes to {_describe(book)} could not be saved.",
+                file=sys.stderr,
+            )
+        for book, listener in self._listeners.values():
+            book.unsubscribe(listener)
+            book._save_lock = None
+        self._listeners.clear()
+        if _active is self:
+            _active = None
+
+    # ----- dirty tracking -----
+
+    def watch(self, book):
+        def listener(*args):
+            self.mark_dirty(book)
+
+        book.subscribe(listener)
+        book._save_lock = self.lock
+        self._listeners[id(book)] = (book, listener)
+
+    def watches(self, book):
+        return id(book) in self._listeners
+
+    def mark_dirty(self, book):
+        with self._cond:
+            entry = self._dirty.get(id(book))
+            if entry is None:
+                self._dirty[id(book)] = [book, 1, time.monotonic(), 0.0]
+            else:
+                entry[1] += 1
+            self._cond.notify()
+
+    def mark_clean(self, book):
+        """Forgets pending changes of a book that has just been saved elsewhere."""
+        with self._cond:
+            self._dirty.pop(id(book), None)
+        self._failing.discard(id(book))
+
+    def _due_at(self, entry):
+        _, changes, first, retry_at = entry
+        due = first if changes >= self.max_changes else first + self.interval
+        return max(due, retry_at)
+
+    def _due(self):
+        now = time.monotonic()
+        return any(self._due_at(entry) <= now for entry in self._dirty.values())
+
+    def _timeout(self):
+        if not self._dirty:
+            return None
+        due = min(self._due_at(entry) for entry in self._dirty.values())
+        return max(0.0, due - time.monotonic())
+
+    def _take(self):
+        batch = list(self._dirty.values())
+        self._dirty = {}
+        return batch
+
+    # ----- saving -----
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not self._due():
+                    self._cond.wait(self._timeout())
+                if self._stopping:
+                    return
+                batch = self._take()
+            self._write(batch)
+
+    def _write(self, batch):
+        if batch and self._save_book is None:
+            from storage import save_data
+
+            self._save_book = save_data
+        with self.lock:
+            for entry in batch:
+                book, changes = entry[0], entry[1]
+                try:
+                    written = self._save_book(book)
+                except Exception as e:
+                    self._failed(entry, e)
+                    continue
+                if id(book) in self._failing:
+                    self._failing.discard(id(book))
+                    print(f"Autosave: {_describe(book)} saved again.", file=sys.stderr)
+                self.saves_performed += 1
+                self.saves_coalesced += changes - 1
+                self.bytes_written += written or 0
+
+    def _failed(self, entry, error):
+        """Puts a book whose save failed back into the dirty set, to be retried."""
+        book, changes, first, _ = entry
+        self.saves_failed += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if id(book) not in self._failing:
+            # once per run of failures, not on every retry
+            self._failing.add(id(book))
+            retry = "" if self._stopping else f"; retrying every {RETRY_SECONDS:g} s"
+            print(
+                f"Autosave: could not save {_describe(book)} ({self.last_error}){retry}.",
+                file=sys.stderr,
+            )
+        with self._cond:
+            pending = self._dirty.get(id(book))
+            if pending is None:
+                self._dirty[id(book)] = [book, changes, first, 0.0]
+                pending = self._dirty[id(book)]
+            else:
+                pending[1] += changes
+                pending[2] = min(pending[2], first)
+            pending[3] = time.monotonic() + RETRY_SECONDS
+
+    def flush(self):
+        """Saves every dirty book now; books that fail stay dirty."""
+        with self._cond:
+            batch = self._take()
+        self._write(batch)
+
+    def stats(self):
+        return {
+            "saves_performed": self.saves_performed,
+            "saves_coalesced": self.saves_coalesced,
+            "bytes_written": self.bytes_written,
+            "saves_failed": self.saves_failed,
+        }
+
+
+def _describe(book):
+    return "the notebook" if hasattr(book, "add_note") else "the address book"
@@ -0,0 +1,368 @@
+"""
+Server mode: one shared address book and notebook for many clients.
+
+    python src/main.py --serve 127.0.0.1:8765
+    python src/main.py --serve unix:/tmp/assistant.sock
+
+The protocol is JSON Lines, as in batch mode: every request is one JSON
+object with an "op" and its arguments, every response one line
+
+    {"op": "find", "query": "alice", "id": 1}
+    {"id": 1, "ok": true, "result": [{"name": "Alice", ...}]}
+    {"id": 2, "ok": false, "error": "Contact 'Bob' not found."}
+
+"id" is optional and echoed back. The operations that change data are
+those of batch mode (batch.OPERATIONS); the queries are the read-only
+counterparts of the interactive commands (QUERIES below), answered with
+plain data instead of tables.
+
+Requests are served on one event loop. Quick queries and all changes run
+directly on it, so a query never sees a change half-done. The queries
+that walk whole books run in worker threads on snapshots of the books
+(book.snapshot(), O(1)), so changes go on while they run; with lazy or
+SQLite storage, which has no snapshots, they run on the loop as well.
+Changes are persisted by the BackgroundSaver, as in the interactive CLI;
+while it is writing, changes wait for it off the loop and queries go on.
+"""
+
+import asyncio
+import json
+import signal
+import sys
+from functools import partial
+from itertools import islice
+from batch import OPERATIONS, execute, validate_operation, validate_values
+from metrics import instrumented
+
+DEFAULT_LIMIT = 50
+MAX_LINE = 1 << 20
+
+
+# ----------- Queries -------------------
+
+
+def _contact(book, name):
+    record = book.get_record(name)
+    if record is None:
+        raise KeyError(f"Contact '{name}' not found.")
+    return record
+
+
+def _page(items, args):
+    offset = args.get("offset") or 0
+    limit = args.get("limit") or DEFAULT_LIMIT
+    return list(islice(items, offset, offset + limit))
+
+
+def _notes(pairs):
+    return [dict(note.to_dict(), key=key) for key, note in pairs]
+
+
+def hello(book, notebook, args):
+    return "Hello! How can I assist you today?"
+
+
+def help_ops(book, notebook, args):
+    return {"changes": sorted(OPERATIONS), "queries": sorted(QUERIES)}
+
+
+def get_contact(book, notebook, args):
+    return _contact(book, args["name"]).to_dict()
+
+
+def show_phone(book, notebook, args):
+    return [phone.value for phone in _contact(book, args["name"]).phones]
+
+
+def show_birthday(book, notebook, args):
+    record = _contact(book, args["name"])
+    return str(record.birthday) if record.birthday else None
+
+
+def find_contacts(book, notebook, args):
+    return [record.to_dict() for record in _page(book.search(args["query"]), args)]
+
+
+def similar_contacts(book, notebook, args):
+    limit = args.get("limit") or 5
+    return [record.name.value for record in book.find_similar(args["name"], limit)]
+
+
+def lookup_contact(book, notebook, args):
+    value = args["value"]
+    found = book.find_by_email(value) if "@" in value else book.find_by_phone(value)
+    return [record.to_dict() for record in found]
+
+
+def upcoming_birthdays(book, notebook, args):
+    days = args.get("days")
+    return book.get_upcoming_birthdays(7 if days is None else days)
+
+
+def all_contacts(book, notebook, args):
+    contacts = [record.to_dict() for record in _page(book.values(), args)]
+    return {"total": len(book), "contacts": contacts}
+
+
+def duplicate_phones(book, notebook, args):
+    return {
+        phone: [record.name.value for record in records]
+        for phone, records in book.duplicate_phones().items()
+    }
+
+
+def all_notes(book, notebook, args):
+    return {
+        "total": len(notebook),
+        "notes": _notes(_page(notebook.data.items(), args)),
+    }
+
+
+def find_notes(book, notebook, args):
+    limit = args.get("limit") or 10
+    return [
+        dict(note.to_dict(), key=key, score=score)
+        for key, note, score in notebook.search_ranked(args["query"], limit)
+    ]
+
+
+def find_notes_by_tags(book, notebook, args):
+    found = notebook.find_by_tags(args["tags"], not args.get("any"))
+    return _notes(_page(found, args))
+
+
+def sort_notes(book, notebook, args):
+    return _notes(_page(notebook.sort_notes_by_tag(args["tag"]), args))
+
+
+def stats(book, notebook, args):
+    from metrics import metrics
+
+    return metrics.to_dict()
+
+
+# op -> (handler, required arguments, optional arguments, walks whole books)
+QUERIES = {
+    "hello": (hello, (), (), False),
+    "help": (help_ops, (), (), False),
+    "get": (get_contact, ("name",), (), False),
+    "phone": (show_phone, ("name",), (), False),
+    "show-birthday": (show_birthday, ("name",), (), False),
+    "find": (find_contacts, ("query",), ("offset", "limit"), True),
+    "similar": (similar_contacts, ("name",), ("limit",), False),
+    "lookup": (lookup_contact, ("value",), (), False),
+    "birthdays": (upcoming_birthdays, (), ("days",), False),
+    "all": (all_contacts, (), ("offset", "limit"), False),
+    "duplicates": (duplicate_phones, (), (), True),
+    "notes": (all_notes, (), ("offset", "limit"), False),
+    "find-note": (find_notes, ("query",), ("limit",), False),
+    "find-tag": (find_notes_by_tags, ("tags",), ("any", "offset", "limit"), False),
+    "sort-note": (sort_notes, ("tag",), ("offset", "limit"), True),
+    "stats": (stats, (), (), False),
+}
+
+INT_ARGUMENTS = ("offset", "limit", "days")
+BOOL_ARGUMENTS = ("any",)
+_RUN = {
+    op: instrumented(f"server:{op}", handler)
+    for op, (handler, _, _, _) in QUERIES.items()
+}
+
+
+def validate_query(entry):
+    """Checks a query's shape; returns an error message or None."""
+    _, required, optional, _ = QUERIES[entry["op"]]
+    for name in required:
+        if name not in entry:
+            return f"'{entry['op']}' needs '{name}'"
+    for name, value in entry.items():
+        if name in ("op", "id"):
+            continue
+        if name not in required and name not in optional:
+            return f"'{entry['op']}' does not take '{name}'"
+        if name in INT_ARGUMENTS:
+            if value is not None and (
+                not isinstance(value, int) or isinstance(value, bool) or value < 0
+            ):
+                return f"'{name}' must be a non-negative integer"
+        elif name in BOOL_ARGUMENTS:
+            if not isinstance(value, bool):
+                return f"'{name}' must be true or false"
+        elif name == "tags":
+            if not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                return "'tags' must be a list of strings"
+        elif not isinstance(value, str):
+            return f"'{name}' must be a string"
+    return None
+
+
+def warm_up(book, notebook):
+    """Builds the lazy indexes up front, so that no request pays for them."""
+    book.search("a")
+    book.find_by_phone("+0")
+    book.find_by_email("a@a.a")
+    book.find_similar("a")
+    book.get_upcoming_birthdays()
+    notebook.find_by_tag("a")
+    notebook.search_ranked("a")
+
+
+# ----------- Server -------------------
+
+
+def _wait_for(lock):
+    """Returns once `lock` is free (runs in a worker thread)."""
+    with lock:
+        pass
+
+
+class AssistantServer:
+    def __init__(self, book, notebook, saver=None):
+        self.book = book
+        self.notebook = notebook
+        self.saver = saver
+        self.sessions = set()
+        # changes queued behind a running save, kept in order
+        self._waiting = asyncio.Lock()
+        self._changes = {
+            op: instrumented(
+                f"server:{op}", partial(execute, book=book, notebook=notebook)
+            )
+            for op in OPERATIONS
+        }
+
+    async def handle(self, entry):
+        """Answers one request (a decoded JSON value); returns the response dict."""
+        request_id = entry.get("id") if isinstance(entry, dict) else None
+        op = entry.get("op") if isinstance(entry, dict) else None
+        try:
+            if op in QUERIES:
+                error = validate_query(entry)
+                if error:
+                    raise ValueError(error)
+                result = await self._query(op, entry)
+            else:
+                entry = {k: v for k, v in entry.items() if k != "id"} if op else entry
+                error = validate_operation(entry)
+                if error is None:
+                    errors = validate_values([(0, entry)])
+                    error = errors[0][1] if errors else None
+                if error:
+                    raise ValueError(error)
+                result = await self._change(op, entry)
+        except (KeyError, ValueError, TypeError) as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            response = {"ok": False, "error": message}
+        except Exception as e:
+            # a bug or a storage failure: answer it and keep the session
+            print(f"server: {op}: {e!r}", file=sys.stderr, flush=True)
+            response = {"ok": False, "error": f"internal error: {type(e).__name__}"}
+        else:
+            response = {"ok": True, "result": result}
+        if request_id is not None:
+            response["id"] = request_id
+        return response
+
+    def _snapshots(self):
+        """
+        Snapshots of both books for a worker thread, or None if a book is
+        its own snapshot (lazybook, sqlbook): those are read on the loop
+        only, and a SQLite connection cannot leave its thread at all.
+        """
+        book, notebook = self.book.snapshot(), self.notebook.snapshot()
+        if book is self.book or notebook is self.notebook:
+            return None
+        return book, notebook
+
+    async def _query(self, op, entry):
+        run = _RUN[op]
+        snapshots = self._snapshots() if QUERIES[op][3] else None
+        if snapshots is None:
+            # runs to completion on the loop: no change can interleave
+            return run(self.book, self.notebook, entry)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, run, *snapshots, entry)
+
+    async def _change(self, op, entry):
+        if self.saver is None:
+            return self._changes[op](entry)
+        lock = self.saver.lock
+        if not self._waiting.locked() and lock.acquire(blocking=False):
+            try:
+                return self._changes[op](entry)
+            finally:
+                lock.release()
+        # a save is running: wait for it without blocking the loop. The
+        # change itself takes the lock again (models._Change), so it must
+        # be held by the loop's thread, not by the worker that waited.
+        loop = asyncio.get_running_loop()
+        async with self._waiting:
+            while not lock.acquire(blocking=False):
+                await loop.run_in_executor(None, _wait_for, lock)
+            try:
+                return self._changes[op](entry)
+            finally:
+                lock.release()
+
+    async def session(self, reader, writer):
+        self.sessions.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    response = {"ok": False, "error": f"invalid JSON: {e}"}
+                else:
+                    response = await self.handle(entry)
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                # only wait when the client is not reading its responses
+                if writer.transport.get_write_buffer_size() > MAX_LINE:
+                    await writer.drain()
+        finally:
+            self.sessions.discard(writer)
+            writer.close()
+
+    async def serve(self, address):
+        """Serves on "host:port" or "unix:/path" until SIGTERM (or Ctrl+C)."""
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows: Ctrl+C only
+        if self._snapshots() is None:
+            warm_up(self.book, self.notebook)
+        else:
+            await loop.run_in_executor(None, warm_up, self.book, self.notebook)
+        if address.startswith("unix:"):
+            server = await asyncio.start_unix_server(
+                self.session, address[len("unix:") :], limit=MAX_LINE, backlog=4096
+            )
+        else:
+            host, _, port = address.rpartition(":")
+            server = await asyncio.start_server(
+                self.session,
+                host or "127.0.0.1",
+                int(port),
+                limit=MAX_LINE,
+                backlog=4096,
+            )
+        async with server:
+            print(f"Serving on {address}. Press Ctrl+C to stop.", flush=True)
+            await stopped.wait()
+            server.close()
+            for writer in list(self.sessions):
+                writer.close()
+
+
+def run_server(address, book, notebook, saver=None):
+    asyncio.run(AssistantServer(book, notebook, saver).serve(address))
@@ -0,0 +1,160 @@
+"""
+Several processes working on the same data directory.
+
+Saves take an exclusive advisory lock (fcntl.flock on a sibling .lock
+file, since the book file itself is replaced on every save), loads a
+shared one. Every saved file carries a generation number in its header,
+bumped by each save. A process remembers the generation and the stat()
+of the file it last read or wrote; when mtime, size or inode differ and
+the generation has moved on, another process has saved in the meantime
+and the file is merged into the book instead of being overwritten:
+
+- contacts and notes changed by this process since its last sync win;
+- everything else is taken from the file, touching only the entries
+  that actually differ, so the indexes are updated incrementally;
+- a note added here under an id that another process has used as well
+  gets a new id.
+
+Without fcntl (Windows) the locks do nothing.
+"""
+
+import os
+from contextlib import contextmanager
+from models import NoteBook
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def lock_path(filename):
+    """addressbook.bin -> addressbook.lock"""
+    return os.path.splitext(filename)[0] + ".lock"
+
+
+@contextmanager
+def file_lock(filename, exclusive=True):
+    """Holds an advisory lock on `filename` (through its .lock sibling)."""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(filename), "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_stamp(filename):
+    """(mtime, size, inode) of a file, or None if there is no such file."""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ChangeTracker:
+    """
+    Listener that remembers which entries of a book this process has
+    changed since it last read or wrote the file.
+    """
+
+    def __init__(self, book, filename, stamp):
+        self.book = book
+        self.filename = filename
+        self.stamp = stamp
+        self.changed = set()  # contact / note keys
+        self.added = set()  # note keys added here
+        self.merging = False
+
+    def __call__(self, op, *args):
+        if self.merging:
+            return
+        if isinstance(self.book, NoteBook):
+            key = args[0]
+            self.changed.add(key)
+            if op == "add_note":
+                self.added.add(key)
+            return
+        record = args[0]
+        self.changed.add(record.name.value.lower())
+        if op == "set_name":
+            self.changed.add(args[1].lower())
+
+    def synced(self, stamp):
+        """The file now holds everything this process has changed."""
+        self.stamp = stamp
+        self.changed.clear()
+        self.added.clear()
+
+
+def find_tracker(book):
+    for listener in getattr(book, "_listeners", []):
+        if isinstance(listener, ChangeTracker):
+            return listener
+    return None
+
+
+def _contact_values(record):
+    return (
+        record.name.value,
+        [phone.value for phone in record.phones],
+        record.email.value if record.email else None,
+        record.birthday.value if record.birthday else None,
+        record.address.value if record.address else None,
+    )
+
+
+def _note_values(note):
+    return (note.text, list(note.tags))
+
+
+def _rekey_clashing_notes(notebook, disk, tracker):
+    for key in sorted(tracker.added & disk.data.keys()):
+        note = notebook.data.get(key)
+        if note is None or _note_values(note) == _note_values(disk.data[key]):
+            continue
+        new_key = notebook._generate_id()
+        while new_key in disk.data:
+            new_key = notebook._generate_id()
+        del notebook[key]
+        notebook.add_note(new_key, note)
+        # the old id now belongs to the other process's note
+        tracker.changed.discard(key)
+        tracker.added.discard(key)
+
+
+def merge(book, disk, tracker):
+    """
+    Brings `book` up to date with `disk`, a fresh copy of its file, keeping
+    the entries changed here. Returns the number of entries taken from disk.
+    """
+    if isinstance(book, NoteBook):
+        book.counter = max(book.counter, disk.counter)
+        _rekey_clashing_notes(book, disk, tracker)
+        values = _note_values
+    else:
+        values = _contact_values
+
+    changed = tracker.changed
+    taken = 0
+    tracker.merging = True
+    try:
+        for key, item in disk.data.items():
+            if key in changed:
+                continue
+            mine = book.data.get(key)
+            if mine is None or values(mine) != values(item):
+                book[key] = item
+                taken += 1
+        gone = [key for key in book.data if key not in disk.data]
+        for key in gone:
+            if key not in changed:
+                del book[key]
+                taken += 1
+    finally:
+        tracker.merging = False
+    return taken
@@ -0,0 +1,585 @@
+"""
+SQLite storage engine for AddressBook and NoteBook.
+
+SqliteAddressBook and SqliteNoteBook keep the regular book interface,
+but their `data` mapping reads from and writes to the database. Records
+and notes are built on access. Every change to a record or note is
+written straight away in its own small transaction, so nothing needs
+to be saved at the end of a command.
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+from datetime import date
+from models import (
+    AddressBook,
+    NoteBook,
+    Record,
+    Note,
+    Name,
+    Phone,
+    Email,
+    Birthday,
+    Address,
+    birthday_ranges,
+    next_birthday,
+    CONTACT_FIELDS,
+    NOTE_FIELDS,
+)
+from fulltext import QUERY_RE, tokenize
+from validators import normalize_phone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id        INTEGER PRIMARY KEY,
+    key       TEXT NOT NULL UNIQUE,
+    name      TEXT NOT NULL,
+    email     TEXT,
+    address   TEXT,
+    birthday  INTEGER,              -- date ordinal
+    b_month   INTEGER,
+    b_day     INTEGER
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday ON contacts (b_month, b_day);
+
+CREATE TABLE IF NOT EXISTS phones (
+    id          INTEGER PRIMARY KEY,
+    contact_id  INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    phone       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_contact ON phones (contact_id);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+CREATE INDEX IF NOT EXISTS phones_normalized ON phones (py_phone(phone));
+CREATE INDEX IF NOT EXISTS contacts_email ON contacts (py_casefold(email));
+
+CREATE TABLE IF NOT EXISTS notes (
+    id    INTEGER PRIMARY KEY,
+    key   TEXT NOT NULL UNIQUE,
+    text  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS note_tags (
+    id       INTEGER PRIMARY KEY,
+    note_id  INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    tag      TEXT NOT NULL,
+    folded   TEXT NOT NULL          -- casefolded tag
+);
+CREATE INDEX IF NOT EXISTS note_tags_note ON note_tags (note_id);
+CREATE INDEX IF NOT EXISTS note_tags_folded ON note_tags (folded);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5 (body, tokenize = 'unicode61');
+
+CREATE TABLE IF NOT EXISTS meta (
+    name   TEXT PRIMARY KEY,
+    value  INTEGER NOT NULL
+);
+"""
+
+SELECT_CONTACT = """
+SELECT c.id, c.name, c.email, c.address, c.birthday,
+       (SELECT group_concat(phone, char(31))
+          FROM (SELECT phone FROM phones WHERE contact_id = c.id ORDER BY id))
+  FROM contacts c
+"""
+
+SELECT_NOTE = """
+SELECT n.id, n.key, n.text,
+       (SELECT group_concat(tag, char(31))
+          FROM (SELECT tag FROM note_tags WHERE note_id = n.id ORDER BY id))
+  FROM notes n
+"""
+
+
+class BatchConnection(sqlite3.Connection):
+    """
+    Connection whose `with conn:` blocks can be folded into one transaction.
+
+    Inside `with conn.batch():` the per-change transactions used by the
+    books neither commit nor roll back; everything is committed once
+    when the outermost batch ends.
+    """
+
+    batch_depth = 0
+
+    @contextmanager
+    def batch(self):
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+        if not self.batch_depth:
+            self.commit()
+
+    def __enter__(self):
+        return self if self.batch_depth else super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.batch_depth:
+            return False
+        return super().__exit__(exc_type, exc, tb)
+
+
+def connect(path):
+    conn = sqlite3.connect(path, factory=BatchConnection)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    # SQLite's lower() only folds ASCII; use Python's to match the in-memory books
+    conn.create_function(
+        "py_lower",
+        1,
+        lambda s: s.lower() if s is not None else None,
+        deterministic=True,
+    )
+    # Used by the exact phone / email lookup indexes
+    conn.create_function(
+        "py_casefold",
+        1,
+        lambda s: s.casefold() if s is not None else None,
+        deterministic=True,
+    )
+    conn.create_function("py_phone", 1, normalize_phone, deterministic=True)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _field(cls, value):
+    field = cls.__new__(cls)
+    field.value = value
+    return field
+
+
+# ----------- Contacts -------------------
+
+
+class SqlRecordMap(MutableMapping):
+    """Mapping of lowercased name -> Record stored in the contacts table."""
+
+    def __init__(self, owner, conn):
+        self._owner = owner
+        self.conn = conn
+
+    def _record(self, row):
+        _, name, email, address, birthday, phones = row
+        record = Record.__new__(Record)
+        record.name = _field(Name, name)
+        record.phones = (
+            [_field(Phone, p) for p in phones.split("\x1f")] if phones else []
+        )
+        record.email = _field(Email, email) if email else None
+        record.address = _field(Address, address) if address else None
+        record.birthday = (
+            _field(Birthday, date.fromordinal(birthday)) if birthday else None
+        )
+        record._book = self._owner
+        record._row = None
+        return record
+
+    def query(self, where="", params=()):
+        rows = self.conn.execute(f"{SELECT_CONTACT} {where}", params)
+        return [self._record(row) for row in rows]
+
+    def __getitem__(self, key):
+        records = self.query("WHERE c.key = ?", (key,))
+        if not records:
+            raise KeyError(key)
+        return records[0]
+
+    def __setitem__(self, key, record):
+        birthday = record.birthday.value if record.birthday else None
+        with self.conn:
+            self.conn.execute("DELETE FROM contacts WHERE key = ?", (key,))
+            cursor = self.conn.execute(
+                "INSERT INTO contacts (key, name, email, address, birthday, b_month, b_day)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    record.name.value,
+                    record.email.value if record.email else None,
+                    record.address.value if record.address else None,
+                    birthday.toordinal() if birthday else None,
+                    birthday.month if birthday else None,
+                    birthday.day if birthday else None,
+                ),
+            )
+            self.conn.executemany(
+                "INSERT INTO phones (contact_id, phone) VALUES (?, ?)",
+                [(cursor.lastrowid, p.value) for p in record.phones],
+            )
+
+    def __delitem__(self, key):
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM contacts WHERE key = ?", (key,))
+        if not cursor.rowcount:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        row = self.conn.execute("SELECT 1 FROM contacts WHERE key = ?", (key,))
+        return row.fetchone() is not None
+
+    def __iter__(self):
+        rows = self.conn.execute("SELECT key FROM contacts ORDER BY id")
+        return (key for (key,) in rows)
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM contacts").fetchone()[0]
+
+    def values(self):
+        # lazy, so that a paged listing only builds the records it shows
+        rows = self.conn.execute(f"{SELECT_CONTACT} ORDER BY c.id")
+        return (self._record(row) for row in rows)
+
+    def items(self):
+        return ((r.name.value.lower(), r) for r in self.values())
+
+
+def data_version(conn):
+    """Changes whenever another connection commits to the database."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+class SqliteAddressBook(AddressBook):
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+        self.data = SqlRecordMap(self, conn)
+
+    def snapshot(self):
+        # every query already reads one consistent state of the database
+        return self
+
+    def column_widths(self):
+        # would read every row; the tables sample their first page instead
+        return None
+
+    def generation(self, fields=CONTACT_FIELDS):
+        # other processes write to the database too
+        return super().generation(fields) + (data_version(self.conn),)
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def _record_changed(self, record, op, *args):
+        key = record.name.value.lower()
+        contact = "(SELECT id FROM contacts WHERE key = ?)"
+        with self.conn:
+            if op == "set_name":
+                self.conn.execute(
+                    "UPDATE contacts SET key = ?, name = ? WHERE key = ?",
+                    (key, record.name.value, args[0].lower()),
+                )
+            elif op == "add_phone":
+                self.conn.execute(
+                    f"INSERT INTO phones (contact_id, phone) VALUES ({contact}, ?)",
+                    (key, args[0]),
+                )
+            elif op == "edit_phone":
+                self.conn.execute(
+                    f"UPDATE phones SET phone = ? WHERE contact_id = {contact} AND phone = ?",
+                    (args[1], key, args[0]),
+                )
+            elif op == "remove_phone":
+                self.conn.execute(
+                    f"DELETE FROM phones WHERE contact_id = {contact} AND phone = ?",
+                    (key, args[0]),
+                )
+            elif op in ("set_email", "remove_email"):
+                email = record.email.value if record.email else None
+                self.conn.execute(
+                    "UPDATE contacts SET email = ? WHERE key = ?", (email, key)
+                )
+            elif op == "set_address":
+                self.conn.execute(
+                    "UPDATE contacts SET address = ? WHERE key = ?",
+                    (record.address.value, key),
+                )
+            elif op == "set_birthday":
+                birthday = record.birthday.value
+                self.conn.execute(
+                    "UPDATE contacts SET birthday = ?, b_month = ?, b_day = ?"
+                    " WHERE key = ?",
+                    (birthday.toordinal(), birthday.month, birthday.day, key),
+                )
+        self._emit(op, record, *args)
+
+    def search(self, query):
+        """Same substring semantics as AddressBook.search, evaluated in SQLite."""
+        return self.data.query(
+            """
+            WHERE instr(c.key, :q)
+               OR instr(py_lower(c.email), :q)
+               OR instr(py_lower(c.address), :q)
+               OR EXISTS (SELECT 1 FROM phones p
+                           WHERE p.contact_id = c.id AND instr(py_lower(p.phone), :q))
+            ORDER BY c.id
+            """,
+            {"q": query.lower()},
+        )
+
+    def find_by_phone(self, phone):
+        return self.data.query(
+            "WHERE c.id IN (SELECT contact_id FROM phones WHERE py_phone(phone) = ?)"
+            " ORDER BY c.id",
+            (normalize_phone(phone),),
+        )
+
+    def find_by_email(self, email):
+        return self.data.query(
+            "WHERE py_casefold(c.email) = ? ORDER BY c.id",
+            (email.strip().casefold(),),
+        )
+
+    def duplicate_phones(self):
+        rows = self.conn.execute(
+            """
+            SELECT py_phone(phone), group_concat(contact_id) FROM phones
+             GROUP BY py_phone(phone)
+            HAVING count(DISTINCT contact_id) > 1
+            """
+        ).fetchall()
+        duplicates = {}
+        for phone, ids in rows:
+            id_list = ", ".join(str(int(i)) for i in set(ids.split(",")))
+            duplicates[phone] = self.data.query(
+                f"WHERE c.id IN ({id_list}) ORDER BY c.id"
+            )
+        return duplicates
+
+    def iter_upcoming_birthdays(self, days=7):
+        today = date.today()
+        for start, end in birthday_ranges(today, days):
+            records = self.data.query(
+                "WHERE (c.b_month, c.b_day) BETWEEN (?, ?) AND (?, ?)"
+                " ORDER BY c.b_month, c.b_day, c.key",
+                (*start, *end),
+            )
+            for record in records:
+                bday = next_birthday(record.birthday.value, today)
+                if (bday - today).days <= days:
+                    yield {
+                        "name": record.name.value,
+                        "congratulation_date": bday.strftime("%d.%m.%Y"),
+                    }
+
+
+# ----------- Notes -------------------
+
+
+class SqlNoteMap(MutableMapping):
+    """Mapping of note id -> Note stored in the notes table."""
+
+    def __init__(self, owner, conn):
+        self._owner = owner
+        self.conn = conn
+
+    def _note(self, row):
+        _, key, text, tags = row
+        note = Note.__new__(Note)
+        note.text = text
+        note.tags = tags.split("\x1f") if tags else []
+        note._book = self._owner
+        note._key = key
+        note._row = None
+        return note
+
+    def query(self, where="", params=()):
+        rows = self.conn.execute(f"{SELECT_NOTE} {where}", params)
+        return [(row[1], self._note(row)) for row in rows]
+
+    def __getitem__(self, key):
+        notes = self.query("WHERE n.key = ?", (key,))
+        if not notes:
+            raise KeyError(key)
+        return notes[0][1]
+
+    def write_tags(self, note_id, tags):
+        self.conn.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+        self.conn.executemany(
+            "INSERT INTO note_tags (note_id, tag, folded) VALUES (?, ?, ?)",
+            [(note_id, tag, tag.casefold()) for tag in tags],
+        )
+
+    def write_fts(self, note_id, note):
+        self.conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+        self.conn.execute(
+            "INSERT INTO notes_fts (rowid, body) VALUES (?, ?)",
+            (note_id, " ".join([note.text, *note.tags])),
+        )
+
+    def __setitem__(self, key, note):
+        with self.conn:
+            self._delete(key)
+            cursor = self.conn.execute(
+                "INSERT INTO notes (key, text) VALUES (?, ?)", (key, note.text)
+            )
+            self.write_tags(cursor.lastrowid, note.tags)
+            self.write_fts(cursor.lastrowid, note)
+
+    def _delete(self, key):
+        row = self.conn.execute("SELECT id FROM notes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        self.conn.execute("DELETE FROM notes_fts WHERE rowid = ?", row)
+        self.conn.execute("DELETE FROM notes WHERE id = ?", row)
+        return True
+
+    def __delitem__(self, key):
+        with self.conn:
+            if not self._delete(key):
+                raise KeyError(key)
+
+    def __contains__(self, key):
+        row = self.conn.execute("SELECT 1 FROM notes WHERE key = ?", (key,))
+        return row.fetchone() is not None
+
+    def __iter__(self):
+        rows = self.conn.execute("SELECT key FROM notes ORDER BY id")
+        return (key for (key,) in rows)
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM notes").fetchone()[0]
+
+    def items(self):
+        rows = self.conn.execute(f"{SELECT_NOTE} ORDER BY n.id")
+        return ((row[1], self._note(row)) for row in rows)
+
+    def values(self):
+        return (note for _, note in self.items())
+
+
+def _fts_query(query):
+    """Translates the FullTextIndex query syntax into an FTS5 MATCH expression."""
+    parts = []
+    for phrase, word in QUERY_RE.findall(query):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                parts.append('"' + " ".join(terms) + '"')
+        elif word.endswith("*") and tokenize(word):
+            parts.append(f'"{tokenize(word)[0]}"*')
+        else:
+            parts.extend(f'"{term}"' for term in tokenize(word))
+    return " AND ".join(parts)
+
+
+class SqliteNoteBook(NoteBook):
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+        self.data = SqlNoteMap(self, conn)
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('note_counter', 1)")
+
+    def snapshot(self):
+        return self
+
+    def column_widths(self):
+        return None
+
+    def generation(self, fields=NOTE_FIELDS):
+        return super().generation(fields) + (data_version(self.conn),)
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def _generate_id(self):
+        with self.conn:
+            (counter,) = self.conn.execute(
+                "SELECT value FROM meta WHERE name = 'note_counter'"
+            ).fetchone()
+            while f"note-{counter}" in self.data:
+                counter += 1
+            self.conn.execute(
+                "UPDATE meta SET value = ? WHERE name = 'note_counter'", (counter + 1,)
+            )
+        self.counter = counter + 1
+        return f"note-{counter}"
+
+    def _note_changed(self, note, old_text, old_tags):
+        row = self.conn.execute("SELECT id FROM notes WHERE key = ?", (note._key,))
+        (note_id,) = row.fetchone()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE notes SET text = ? WHERE id = ?", (note.text, note_id)
+            )
+            self.data.write_tags(note_id, note.tags)
+            self.data.write_fts(note_id, note)
+        self._emit("edit_note", note._key, note, old_text, old_tags)
+
+    def search_notes(self, query):
+        return dict(
+            self.data.query(
+                """
+                WHERE instr(py_lower(n.text), :q)
+                   OR EXISTS (SELECT 1 FROM note_tags t
+                               WHERE t.note_id = n.id AND instr(py_lower(t.tag), :q))
+                ORDER BY n.id
+                """,
+                {"q": query.lower()},
+            )
+        )
+
+    def search_ranked(self, query, limit=10):
+        match = _fts_query(query)
+        if not match:
+            return []
+        rows = self.conn.execute(
+            """
+            SELECT n.key, -bm25(notes_fts) AS score
+              FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+             WHERE notes_fts MATCH ?
+             ORDER BY score DESC
+             LIMIT ?
+            """,
+            (match, limit),
+        ).fetchall()
+        return [(key, self.data[key], score) for key, score in rows]
+
+    def find_by_tag(self, tag):
+        return self.find_by_tags([tag])
+
+    def find_by_tags(self, tags, match_all=True):
+        folded = sorted({tag.casefold() for tag in tags})
+        if not folded:
+            return []
+        marks = ", ".join("?" * len(folded))
+        having = f"HAVING count(DISTINCT folded) = {len(folded)}" if match_all else ""
+        return self.data.query(
+            f"""
+            WHERE n.id IN (SELECT note_id FROM note_tags
+                            WHERE folded IN ({marks})
+                            GROUP BY note_id {having})
+            ORDER BY n.id
+            """,
+            folded,
+        )
+
+    def sort_notes_by_tag(self, tag):
+        tagged = self.find_by_tag(tag)
+        untagged = self.data.query(
+            "WHERE n.id NOT IN (SELECT note_id FROM note_tags WHERE folded = ?)"
+            " ORDER BY n.id",
+            (tag.casefold(),),
+        )
+        return tagged + untagged
+
+
+def import_books(conn, book, notebook):
+    """Copies in-memory books into an empty database."""
+    contacts = SqliteAddressBook(conn)
+    for key, record in book.data.items():
+        contacts.data[key] = record
+    notes = SqliteNoteBook(conn)
+    for key, note in notebook.data.items():
+        notes.data[key] = note
+    with conn:
+        conn.execute(
+            "UPDATE meta SET value = ? WHERE name = 'note_counter'", (notebook.counter,)
+        )
@@ -1,30 +1,293 @@
+import os
 import pickle
+import sys
+from contextlib import ExitStack, contextmanager
 from models import AddressBook, NoteBook
+from config import (
+    STORAGE_MODE,
+    JOURNAL_COMPACT_THRESHOLD,
+    LAZY_CACHE_SIZE,
+    SQLITE_PATH,
+)
+from journal import Journal, find_journal
+from metrics import timed
+from binformat import MAGIC, read_book, read_meta, write_book
+from shared import ChangeTracker, file_lock, file_stamp, find_tracker, merge
 
+ADDRESSBOOK_FILE = "addressbook.bin"
+NOTEBOOK_FILE = "notebook.bin"
 
-def save_data(obj):
+
+# The lazy and SQLite backends are imported only in their storage modes;
+# until their module is loaded no book can be one of theirs.
+
+
+def _is_sqlite(obj):
+    sqlbook = sys.modules.get("sqlbook")
+    return sqlbook is not None and isinstance(
+        obj, (sqlbook.SqliteAddressBook, sqlbook.SqliteNoteBook)
+    )
+
+
+def _is_lazy(obj):
+    lazybook = sys.modules.get("lazybook")
+    return lazybook is not None and isinstance(obj, lazybook.LazyAddressBook)
+
+
+def _filename_for(obj):
     if isinstance(obj, AddressBook):
-        filename = "addressbook.pkl"
+        return ADDRESSBOOK_FILE
     elif isinstance(obj, NoteBook):
-        filename = "notebook.pkl"
-    else:
-        raise TypeError("Unsupported object type for saving")
+        return NOTEBOOK_FILE
+    raise TypeError("Unsupported object type for saving")
+
+
+def _file_size(filename):
+    return os.path.getsize(filename) if os.path.exists(filename) else 0
+
+
+def _write_snapshot(obj, filename):
+    """Writes the binary container under a temporary name and atomically moves it into place."""
+    write_book(obj, filename)
+    return os.path.getsize(filename)
+
+
+def _read_snapshot(filename, factory):
+    """
+    Reads a book from the binary container, or from a pickle file written
+    by older versions. If only the old .pkl sibling exists it is migrated
+    to the binary format once and left in place as a backup.
+    """
+    if not os.path.exists(filename):
+        legacy = os.path.splitext(filename)[0] + ".pkl"
+        if legacy == filename or not os.path.exists(legacy):
+            return factory()
+        with open(legacy, "rb") as f:
+            book = pickle.load(f)
+        write_book(book, filename)
+        return book
 
-    with open(filename, "wb") as f:
-        pickle.dump(obj, f)
+    with open(filename, "rb") as f:
+        is_binary = f.read(len(MAGIC)) == MAGIC
+    if is_binary:
+        return read_book(filename)
+    with open(filename, "rb") as f:
+        return pickle.load(f)
 
 
-def load_data(filename="addressbook.pkl"):
+def _disk_generation(filename):
     try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return AddressBook()
+        return read_meta(filename).get("generation", 0)
+    except (OSError, ValueError):
+        # missing, or a pickle written by older versions
+        return 0
+
+
+def _pull(obj, tracker):
+    """
+    Merges the book's file into it if another process has saved it since
+    this one last read or wrote it; returns True if it had. The caller
+    holds the file lock.
+    """
+    stamp = file_stamp(tracker.filename)
+    if stamp == tracker.stamp or stamp is None:
+        return False
+    generation = _disk_generation(tracker.filename)
+    if generation == getattr(obj, "_generation", 0):
+        tracker.stamp = stamp
+        return False
+    merge(obj, _read_snapshot(tracker.filename, type(obj)), tracker)
+    obj._generation = generation
+    tracker.stamp = stamp
+    return True
+
+
+def _forget_merged_changes(obj):
+    # Entries taken from the file are already saved; the saver must not
+    # write them back (and wake up the other processes) once more.
+    from saver import active_saver
+
+    saver = active_saver()
+    if saver is not None:
+        saver.mark_clean(obj)
+
+
+def _save_shared(obj, filename):
+    """Writes the snapshot under the exclusive lock, merging in other processes' saves first."""
+    tracker = find_tracker(obj)
+    with file_lock(filename):
+        if tracker is None:
+            obj._generation = _disk_generation(filename) + 1
+        elif _pull(obj, tracker):
+            _forget_merged_changes(obj)
+        obj._generation = getattr(obj, "_generation", 0) + 1
+        written = _write_snapshot(obj, filename)
+        if tracker is not None:
+            tracker.synced(file_stamp(filename))
+    return written
+
+
+def refresh(obj):
+    """
+    Takes in whatever other processes have saved to the book's file since
+    this process last read or wrote it; returns True if anything was merged.
+    Costs one stat() when nothing has changed.
+    """
+    tracker = find_tracker(obj)
+    if tracker is None or file_stamp(tracker.filename) == tracker.stamp:
+        return False
+    with file_lock(tracker.filename, exclusive=False):
+        merged = _pull(obj, tracker)
+    if merged and not tracker.changed:
+        _forget_merged_changes(obj)
+    return merged
+
+
+@timed("storage.save", size=lambda written, obj: written)
+def save_data(obj):
+    """Persists a book; returns the number of bytes written (0 if nothing was)."""
+    if _is_sqlite(obj):
+        # every change has already been committed
+        return 0
+
+    if _is_lazy(obj):
+        return obj.save()
 
+    journal = find_journal(obj)
+    if journal is not None:
+        # Changes are already on disk in the journal; only fold it into
+        # the snapshot once it gets long enough to slow down startup.
+        if journal.pending >= JOURNAL_COMPACT_THRESHOLD:
+            return compact(obj)
+        return 0
 
-def load_notebook(filename="notebook.pkl"):
+    return _save_shared(obj, _filename_for(obj))
+
+
+@timed("storage.save", size=lambda written, obj: written)
+def compact(obj):
+    """Folds the journal into the snapshot regardless of its length."""
+    journal = find_journal(obj)
+    if journal is None:
+        return _save_shared(obj, _filename_for(obj))
+    written = _write_snapshot(obj, journal.snapshot_path)
+    journal.reset()
+    return written
+
+
+@contextmanager
+def _bulk_book(obj):
+    if _is_sqlite(obj):
+        with obj.conn.batch():
+            yield
+        return
+
+    journal = find_journal(obj)
+    if journal is None:
+        try:
+            yield
+        finally:
+            save_data(obj)
+        return
+
+    # One snapshot is cheaper than an fsync'ed journal line per change
+    obj.unsubscribe(journal)
     try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return NoteBook()
+        yield
+    finally:
+        obj.subscribe(journal)
+        compact(obj)
+
+
+@contextmanager
+def bulk(*books):
+    """
+    Suspends per-change persistence for bulk operations on the books;
+    everything is written once when the block exits.
+    """
+    from saver import active_saver
+
+    with ExitStack() as stack:
+        for obj in books:
+            stack.enter_context(_bulk_book(obj))
+        yield
+    saver = active_saver()
+    if saver is not None:
+        for obj in books:
+            saver.mark_clean(obj)
+
+
+def _load_snapshot(filename, factory):
+    """
+    Reads the snapshot under the shared file lock; in the default storage
+    mode the book then keeps track of its changes for merging with other
+    processes (see shared.py).
+    """
+    # creating the file (first run, migration from .pkl) is a write
+    with file_lock(filename, exclusive=not os.path.exists(filename)):
+        book = _read_snapshot(filename, factory)
+        stamp = file_stamp(filename)
+    book = _open_journal(book, filename)
+    if STORAGE_MODE == "binary":
+        book.subscribe(ChangeTracker(book, filename, stamp))
+    return book
+
+
+def _open_journal(book, filename):
+    journal = Journal(book, filename)
+    journal.replay()
+    if STORAGE_MODE == "journal":
+        journal.attach()
+    return book
+
+
+def _load_lazy(filename):
+    """Opens addressbook.dat, converting the regular snapshot on first use."""
+    from lazybook import LazyAddressBook, write_lazy_book
+
+    lazy_name = os.path.splitext(filename)[0] + ".dat"
+    if not os.path.exists(lazy_name):
+        write_lazy_book(_read_snapshot(filename, AddressBook), lazy_name)
+    return LazyAddressBook(lazy_name, LAZY_CACHE_SIZE)
+
+
+_sqlite_conn = None
+
+
+def _open_sqlite():
+    """Shared connection for both books; a new database is filled from the snapshots."""
+    global _sqlite_conn
+    if _sqlite_conn is None:
+        from sqlbook import connect, import_books
+
+        is_new = not os.path.exists(SQLITE_PATH)
+        _sqlite_conn = connect(SQLITE_PATH)
+        if is_new:
+            import_books(
+                _sqlite_conn,
+                _read_snapshot(ADDRESSBOOK_FILE, AddressBook),
+                _read_snapshot(NOTEBOOK_FILE, NoteBook),
+            )
+    return _sqlite_conn
+
+
+@timed(
+    "storage.load", size=lambda book, filename=ADDRESSBOOK_FILE: _file_size(filename)
+)
+def load_data(filename=ADDRESSBOOK_FILE):
+    if STORAGE_MODE == "sqlite":
+        from sqlbook import SqliteAddressBook
+
+        return SqliteAddressBook(_open_sqlite())
+    if STORAGE_MODE == "lazy":
+        return _load_lazy(filename)
+    return _load_snapshot(filename, AddressBook)
+
+
+@timed("storage.load", size=lambda book, filename=NOTEBOOK_FILE: _file_size(filename))
+def load_notebook(filename=NOTEBOOK_FILE):
+    if STORAGE_MODE == "sqlite":
+        from sqlbook import SqliteNoteBook
+
+        return SqliteNoteBook(_open_sqlite())
+    return _load_snapshot(filename, NoteBook)
@@ -0,0 +1,484 @@
+"""
+Streaming import and export of contacts and notes.
+
+    contacts    .csv, .jsonl, .vcf (vCard 3.0)
+    notes       .jsonl, .md
+
+Files are processed as generator pipelines: reader -> chunks -> bulk
+validation (validators.validate_columns) -> insert, so memory use does
+not depend on the file size. Rows
+that fail validation are written, with their line number and the
+reason, to an error sidecar file next to the input (``<file>.errors.jsonl``).
+The books are saved once, after the last chunk.
+
+CSV columns: name, phones (separated by ";"), email, birthday (DD.MM.YYYY),
+address. JSON Lines use the same keys, with phones as a list; notes use
+"key", "text" and "tags". In Markdown every note starts with a
+``## <key>`` heading, optionally followed by a ``Tags: a, b`` line; a
+text line that would read as either, or starts with a backslash, is
+written with a backslash in front.
+"""
+
+import csv
+import gc
+import json
+import os
+from itertools import islice
+from models import Record, Note
+from storage import bulk
+from validators import validate_column
+
+CHUNK_SIZE = 50000
+CONTACT_COLUMNS = ("name", "phones", "email", "birthday", "address")
+
+CONTACT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+CONTACT_FORMATS.update({".vcf": "vcard", ".vcard": "vcard"})
+NOTE_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".md": "markdown"}
+NOTE_FORMATS[".markdown"] = "markdown"
+
+
+class RowError(ValueError):
+    """A row that could not be read; carries the raw data for the sidecar."""
+
+    def __init__(self, message, data=None):
+        super().__init__(message)
+        self.data = data
+
+
+def detect_format(path, formats):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in formats:
+        supported = ", ".join(sorted(formats))
+        raise ValueError(f"Unsupported file type '{ext}'. Use one of: {supported}")
+    return formats[ext]
+
+
+def errors_path(path):
+    return path + ".errors.jsonl"
+
+
+# ----------- Contact readers -------------------
+# Every reader yields (line number, row dict or RowError).
+
+
+def read_contacts_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip().lower() for name in header]
+    positions = [
+        header.index(column) if column in header else None for column in CONTACT_COLUMNS
+    ]
+    for values in reader:
+        if not values:
+            continue
+        name, phones, email, birthday, address = [
+            values[i] if i is not None and i < len(values) else "" for i in positions
+        ]
+        yield reader.line_num, {
+            "name": name,
+            "phones": [p for p in phones.replace(",", ";").split(";") if p.strip()],
+            "email": email or None,
+            "birthday": birthday or None,
+            "address": address or None,
+        }
+
+
+def read_jsonl(f):
+    for lineno, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield lineno, RowError(f"invalid JSON: {e}", line.rstrip("\n"))
+            continue
+        if not isinstance(row, dict):
+            yield lineno, RowError("expected a JSON object", row)
+            continue
+        yield lineno, row
+
+
+def _unfold(f):
+    """Joins folded vCard lines; yields (line number, logical line)."""
+    current, start = None, 0
+    for lineno, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, lineno
+    if current is not None:
+        yield start, current
+
+
+def _split_escaped(value, sep):
+    parts, current, escaped = [], [], False
+    for ch in value:
+        if escaped:
+            current.append({"n": "\n", "N": "\n"}.get(ch, ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == sep:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def _vcard_date(value):
+    digits = value.replace("-", "")
+    if len(digits) != 8 or not digits.isdigit():
+        raise RowError(f"unsupported BDAY '{value}'", value)
+    return f"{digits[6:8]}.{digits[4:6]}.{digits[0:4]}"
+
+
+def read_vcards(f):
+    row, start = None, 0
+    for lineno, line in _unfold(f):
+        if not line.strip():
+            continue
+        head, _, value = line.partition(":")
+        prop = head.split(";")[0].split(".")[-1].upper()
+        if prop == "BEGIN" and value.upper() == "VCARD":
+            row = {"name": "", "phones": []}
+            start = lineno
+        elif row is None:
+            continue
+        elif prop == "END":
+            yield start, row
+            row = None
+        elif prop == "FN":
+            row["name"] = _split_escaped(value, None)[0]
+        elif prop == "N" and not row["name"]:
+            family, given = (_split_escaped(value, ";") + [""])[:2]
+            row["name"] = " ".join(p for p in (given, family) if p)
+        elif prop == "TEL":
+            row["phones"].append(value)
+        elif prop == "EMAIL" and not row.get("email"):
+            row["email"] = value
+        elif prop == "BDAY":
+            try:
+                row["birthday"] = _vcard_date(value)
+            except RowError as e:
+                yield start, e
+                row = None
+        elif prop == "ADR" and not row.get("address"):
+            parts = [p.strip() for p in _split_escaped(value, ";") if p.strip()]
+            row["address"] = ", ".join(parts)
+
+
+CONTACT_READERS = {
+    "csv": read_contacts_csv,
+    "jsonl": read_jsonl,
+    "vcard": read_vcards,
+}
+
+
+# ----------- Note readers -------------------
+
+
+def read_notes_markdown(f):
+    row, start = None, 0
+    for lineno, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if line.startswith("## "):
+            if row is not None:
+                yield start, row
+            row = {"key": line[3:].strip(), "text": [], "tags": []}
+            start = lineno
+        elif row is None:
+            continue
+        elif not row["text"] and not row["tags"] and line.startswith("Tags:"):
+            row["tags"] = [t.strip() for t in line[5:].split(",") if t.strip()]
+        else:
+            row["text"].append(line[1:] if line.startswith("\\") else line)
+    if row is not None:
+        yield start, row
+
+
+NOTE_READERS = {"jsonl": read_jsonl, "markdown": read_notes_markdown}
+
+
+# ----------- Validation -------------------
+
+
+def _scatter(kind, rows, size):
+    """Validates one optional column; returns per-row values and errors."""
+    owners = [i for i, row in enumerate(rows) if row.get(kind)]
+    values = [None] * size
+    errors = [None] * size
+    checked, failed = validate_column(kind, [str(rows[i][kind]) for i in owners])
+    for i, value, error in zip(owners, checked, failed):
+        values[i] = value
+        errors[i] = error
+    return values, errors
+
+
+def records_from_rows(chunk):
+    """
+    Validates a chunk of (line number, row) pairs column by column with
+    the bulk validators; yields (line number, row, Record or RowError).
+    """
+    rows = [row for _, row in chunk if not isinstance(row, RowError)]
+    size = len(rows)
+    names, name_errors = validate_column(
+        "name", [str(row.get("name") or "") for row in rows]
+    )
+
+    phone_owners, raw_phones = [], []
+    for i, row in enumerate(rows):
+        phones = row.get("phones") or []
+        for phone in [phones] if isinstance(phones, str) else phones:
+            phone_owners.append(i)
+            raw_phones.append(str(phone))
+    phones = [[] for _ in range(size)]
+    phone_errors = [None] * size
+    checked, failed = validate_column("phone", raw_phones)
+    for i, phone, error in zip(phone_owners, checked, failed):
+        if error:
+            phone_errors[i] = phone_errors[i] or error
+        elif phone in phones[i]:
+            phone_errors[i] = phone_errors[i] or "The same phone is listed twice."
+        else:
+            phones[i].append(phone)
+
+    emails, email_errors = _scatter("email", rows, size)
+    birthdays, birthday_errors = _scatter("birthday", rows, size)
+    addresses, address_errors = _scatter("address", rows, size)
+
+    i = 0
+    for lineno, row in chunk:
+        if isinstance(row, RowError):
+            yield lineno, row.data, row
+            continue
+        # the first failing field wins, in the order Record sets them
+        error = (
+            name_errors[i]
+            or phone_errors[i]
+            or email_errors[i]
+            or birthday_errors[i]
+            or address_errors[i]
+        )
+        if error:
+            yield lineno, row, RowError(error, row)
+        else:
+            yield lineno, row, Record.from_values(
+                names[i], phones[i], emails[i], birthdays[i], addresses[i]
+            )
+        i += 1
+
+
+def note_from_row(row):
+    text = row.get("text") or ""
+    if isinstance(text, list):
+        text = "\n".join(text)
+    tags = [str(tag) for tag in row.get("tags") or []]
+    return row.get("key") or None, Note(str(text), tags)
+
+
+def notes_from_rows(chunk):
+    for lineno, row in chunk:
+        if isinstance(row, RowError):
+            yield lineno, row.data, row
+            continue
+        try:
+            yield lineno, row, note_from_row(row)
+        except (ValueError, TypeError) as e:
+            yield lineno, row, RowError(str(e), row)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class _ErrorLog:
+    """Error sidecar, created on the first rejected row."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def write(self, lineno, error):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8")
+        entry = {"line": lineno, "error": str(error), "data": error.data}
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _import(path, book, reader, build, insert, chunk_size):
+    errors = _ErrorLog(errors_path(path))
+    if os.path.exists(errors.path):
+        os.remove(errors.path)
+    imported = 0
+    # As in binformat.read_book: the import only creates objects that are
+    # kept, so the cyclic GC would just rescan them over and over.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, encoding="utf-8", newline="") as f, bulk(book):
+            for chunk in _chunks(reader(f), chunk_size):
+                for lineno, row, item in build(chunk):
+                    if not isinstance(item, RowError):
+                        try:
+                            insert(item)
+                            imported += 1
+                            continue
+                        except ValueError as e:
+                            item = RowError(str(e), row)
+                    errors.write(lineno, item)
+    finally:
+        errors.close()
+        if gc_was_enabled:
+            gc.enable()
+    return imported, errors.count
+
+
+def import_contacts(book, path, fmt=None, chunk_size=CHUNK_SIZE):
+    """Imports contacts from a file; returns (imported, rejected)."""
+    reader = CONTACT_READERS[fmt or detect_format(path, CONTACT_FORMATS)]
+    return _import(path, book, reader, records_from_rows, book.add_record, chunk_size)
+
+
+def import_notes(notebook, path, fmt=None, chunk_size=CHUNK_SIZE):
+    """Imports notes; notes without a key, or whose key is taken, get a new one."""
+    reader = NOTE_READERS[fmt or detect_format(path, NOTE_FORMATS)]
+
+    def insert(item):
+        key, note = item
+        if not key or key in notebook.data:
+            key = notebook._generate_id()
+        notebook.add_note(key, note)
+
+    return _import(path, notebook, reader, notes_from_rows, insert, chunk_size)
+
+
+# ----------- Writers -------------------
+# Writers are generators of text chunks, so exports stream as well.
+
+
+def contacts_to_csv(records):
+    class _Line:
+        def write(self, text):
+            self.text = text
+
+    line = _Line()
+    writer = csv.writer(line, lineterminator="\n")
+    writer.writerow(CONTACT_COLUMNS)
+    yield line.text
+    for record in records:
+        data = record.to_dict()
+        data["phones"] = ";".join(data["phones"])
+        writer.writerow([data[column] or "" for column in CONTACT_COLUMNS])
+        yield line.text
+
+
+def contacts_to_jsonl(records):
+    for record in records:
+        yield json.dumps(record.to_dict(), ensure_ascii=False) + "\n"
+
+
+def _vcard_escape(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+    )
+
+
+def _fold(line, limit=75):
+    """Folds a content line at `limit` octets without splitting UTF-8 sequences."""
+    if len(line.encode("utf-8")) <= limit:
+        return line + "\r\n"
+    parts, current, size = [], [], 0
+    for ch in line:
+        width = len(ch.encode("utf-8"))
+        if size + width > limit:
+            parts.append("".join(current))
+            current, size = [" "], 1
+        current.append(ch)
+        size += width
+    parts.append("".join(current))
+    return "\r\n".join(parts) + "\r\n"
+
+
+def contacts_to_vcard(records):
+    for record in records:
+        name = _vcard_escape(record.name.value)
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{name}", f"N:{name};;;;"]
+        lines.extend(f"TEL;TYPE=CELL:{p.value}" for p in record.phones)
+        if record.email:
+            lines.append(f"EMAIL;TYPE=INTERNET:{record.email.value}")
+        if record.birthday:
+            lines.append(f"BDAY:{record.birthday.value.isoformat()}")
+        if record.address:
+            lines.append(f"ADR;TYPE=HOME:;;{_vcard_escape(record.address.value)};;;;")
+        lines.append("END:VCARD")
+        yield "".join(_fold(line) for line in lines)
+
+
+def notes_to_jsonl(items):
+    for key, note in items:
+        yield json.dumps({"key": key, **note.to_dict()}, ensure_ascii=False) + "\n"
+
+
+def _markdown_line(line):
+    """A text line as it is written, escaped if it could be misread."""
+    if line.startswith(("## ", "Tags:", "\\")):
+        return "\\" + line
+    return line
+
+
+def notes_to_markdown(items):
+    for key, note in items:
+        parts = [f"## {key}\n"]
+        if note.tags:
+            parts.append(f"Tags: {', '.join(note.tags)}\n")
+        parts.extend(_markdown_line(line) + "\n" for line in note.text.split("\n"))
+        parts.append("\n")
+        yield "".join(parts)
+
+
+CONTACT_WRITERS = {
+    "csv": contacts_to_csv,
+    "jsonl": contacts_to_jsonl,
+    "vcard": contacts_to_vcard,
+}
+NOTE_WRITERS = {"jsonl": notes_to_jsonl, "markdown": notes_to_markdown}
+
+
+def _export(path, chunks):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(chunks)
+    os.replace(tmp_path, path)
+
+
+def export_contacts(book, path, fmt=None):
+    """Writes all contacts to a file; returns how many were written."""
+    writer = CONTACT_WRITERS[fmt or detect_format(path, CONTACT_FORMATS)]
+    contacts = book.snapshot()
+    _export(path, writer(contacts.values()))
+    return len(contacts)
+
+
+def export_notes(notebook, path, fmt=None):
+    writer = NOTE_WRITERS[fmt or detect_format(path, NOTE_FORMATS)]
+    notes = notebook.snapshot()
+    _export(path, writer(notes.items()))
+    return len(notes)
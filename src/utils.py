@@ -1,9 +1,43 @@
+import shlex
+from contextlib import contextmanager
 from validators import normalize_phone
 
+# answers to the prompts of the running command, see answering()
+_answers = []
+
 
 def parse_input(user_input):
-    """Parses only the command from user's input, ignoring arguments."""
-    return user_input.strip().lower(), []
+    """Splits user's input into the command and its arguments ("quoted words" stay whole)."""
+    try:
+        parts = shlex.split(user_input)
+    except ValueError:
+        parts = user_input.split()
+    if not parts:
+        return "", []
+    return parts[0].lower(), parts[1:]
+
+
+@contextmanager
+def answering(args):
+    """
+    Answers the command's prompts with `args`, in order, before asking the
+    user: `find mira` searches right away. Yields the list of the
+    arguments not used yet.
+    """
+    global _answers
+    outer = _answers
+    _answers = list(args)
+    try:
+        yield _answers
+    finally:
+        _answers = outer
+
+
+def ask(prompt):
+    """input(), unless the command line already gave the answer."""
+    if _answers:
+        return _answers.pop(0)
+    return input(prompt)
 
 
 def input_error(func):
@@ -23,9 +57,14 @@ def input_error(func):
 def autosave(func):
     def wrapper(book_or_notebook, *args, **kwargs):
         from storage import save_data
+        from saver import active_saver
 
         result = func(book_or_notebook, *args, **kwargs)
-        save_data(book_or_notebook)
+        saver = active_saver()
+        # A running BackgroundSaver already knows about the change and
+        # will write it in the background together with its neighbours.
+        if saver is None or not saver.watches(book_or_notebook):
+            save_data(book_or_notebook)
         return result
 
     return wrapper
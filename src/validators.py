@@ -1,9 +1,25 @@
+import os
 import re
+from datetime import date, datetime
 
 
 PHONE_REGEX = r"^\+\d{8,12}$"
 EMAIL_REGEX = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
 
+PHONE_RE = re.compile(PHONE_REGEX)
+EMAIL_RE = re.compile(EMAIL_REGEX)
+
+PHONE_ERROR = (
+    "Invalid phone number. Use format: +XXXXXXXXX (8–12 digits), e.g. +380931112233"
+)
+EMAIL_ERROR = "Invalid email format."
+BIRTHDAY_FORMAT_ERROR = "Please enter the birthday in the format DD.MM.YYYY"
+BIRTHDAY_FUTURE_ERROR = "Birthday cannot be in the future."
+
+# Columns shorter than this are validated in the calling process
+PARALLEL_THRESHOLD = 50000
+WORKERS = os.cpu_count() or 1
+
 
 def normalize_phone(value: str) -> str:
     value = value.strip()
@@ -12,11 +28,170 @@ def normalize_phone(value: str) -> str:
     return "".join(filter(str.isdigit, value))
 
 
+def parse_phone(value: str) -> str:
+    """The form phones are stored in (normalized); ValueError if invalid."""
+    phone = normalize_phone(value)
+    if not PHONE_RE.fullmatch(phone):
+        raise ValueError(PHONE_ERROR)
+    return phone
+
+
 def is_valid_phone(value: str) -> bool:
     """Validates normalized phone number format"""
     normalized = normalize_phone(value)
-    return re.fullmatch(PHONE_REGEX, normalized)
+    return PHONE_RE.fullmatch(normalized)
 
 
 def is_valid_email(value):
-    return re.fullmatch(EMAIL_REGEX, value)
+    return EMAIL_RE.fullmatch(value)
+
+
+def parse_date(value: str) -> date:
+    """Parses DD.MM.YYYY; much faster than strptime for the common zero-padded form."""
+    if (
+        len(value) == 10
+        and value[2] == "."
+        and value[5] == "."
+        and value[:2].isdigit()
+        and value[3:5].isdigit()
+        and value[6:].isdigit()
+    ):
+        return date(int(value[6:]), int(value[3:5]), int(value[:2]))
+    return datetime.strptime(value, "%d.%m.%Y").date()
+
+
+# ----------- Bulk validation -------------------
+# Each function takes a column of raw values and returns (values, errors):
+# the normalized values and, per row, None or an error message. Rows with
+# an error have None as their value.
+
+
+def validate_phones(values):
+    normalized, errors = [], []
+    fullmatch = PHONE_RE.fullmatch
+    for value in values:
+        # most values are already in the normalized form
+        if fullmatch(value):
+            normalized.append(value)
+            errors.append(None)
+            continue
+        phone = normalize_phone(value)
+        if fullmatch(phone):
+            normalized.append(phone)
+            errors.append(None)
+        else:
+            normalized.append(None)
+            errors.append(PHONE_ERROR)
+    return normalized, errors
+
+
+def validate_emails(values):
+    normalized, errors = [], []
+    fullmatch = EMAIL_RE.fullmatch
+    for value in values:
+        email = value.strip()
+        if fullmatch(email):
+            normalized.append(email)
+            errors.append(None)
+        else:
+            normalized.append(None)
+            errors.append(EMAIL_ERROR)
+    return normalized, errors
+
+
+def validate_birthdays(values, today=None):
+    """Birthdays come back as date objects."""
+    today = today or date.today()
+    parsed, errors = [], []
+    # A column holds few distinct dates compared to its length
+    seen = {}
+    for value in values:
+        result = seen.get(value)
+        if result is None:
+            try:
+                birthday = parse_date(value.strip())
+            except ValueError:
+                result = (None, BIRTHDAY_FORMAT_ERROR)
+            else:
+                if birthday > today:
+                    result = (None, BIRTHDAY_FUTURE_ERROR)
+                else:
+                    result = (birthday, None)
+            seen[value] = result
+        parsed.append(result[0])
+        errors.append(result[1])
+    return parsed, errors
+
+
+def _validate_required(values, message):
+    stripped, errors = [], []
+    for value in values:
+        value = value.strip()
+        stripped.append(value or None)
+        errors.append(None if value else message)
+    return stripped, errors
+
+
+def validate_names(values):
+    return _validate_required(values, "Name cannot be empty.")
+
+
+def validate_addresses(values):
+    return _validate_required(values, "Address cannot be empty.")
+
+
+VALIDATORS = {
+    "name": validate_names,
+    "phone": validate_phones,
+    "email": validate_emails,
+    "birthday": validate_birthdays,
+    "address": validate_addresses,
+}
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+
+        _executor = ProcessPoolExecutor(WORKERS)
+    return _executor
+
+
+def _validate_slice(kind, values):
+    return VALIDATORS[kind](values)
+
+
+def validate_column(kind, values, parallel=None):
+    """
+    Validates a column of raw values of one kind (see VALIDATORS).
+
+    Columns of PARALLEL_THRESHOLD values or more are split across a
+    process pool, unless `parallel` says otherwise.
+    """
+    values = list(values)
+    if parallel is None:
+        parallel = len(values) >= PARALLEL_THRESHOLD and WORKERS > 1
+    if not parallel:
+        return VALIDATORS[kind](values)
+
+    pool = _pool()
+    size = -(-len(values) // WORKERS)
+    slices = [values[i : i + size] for i in range(0, len(values), size)]
+    normalized, errors = [], []
+    for part_values, part_errors in pool.map(
+        _validate_slice, [kind] * len(slices), slices
+    ):
+        normalized.extend(part_values)
+        errors.extend(part_errors)
+    return normalized, errors
+
+
+def validate_columns(columns, parallel=None):
+    """Validates {kind: values} columns; returns {kind: (values, errors)}."""
+    return {
+        kind: validate_column(kind, values, parallel)
+        for kind, values in columns.items()
+    }